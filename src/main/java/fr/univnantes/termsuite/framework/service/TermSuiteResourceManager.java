@@ -30,6 +30,30 @@ public class TermSuiteResourceManager {
 	
 	private static final Logger LOGGER = LoggerFactory.getLogger(TermSuiteResourceManager.class);
 	
+	/*
+	 * Process-wide resource cache, keyed by resource type and URL. Disabled
+	 * by default: each pipeline loads its own resources. Long-lived JVMs
+	 * running many pipelines (see TermSuiteWorker) enable it so that language
+	 * resources are loaded once per JVM.
+	 */
+	private static final Map<String, Object> sharedResources = new ConcurrentHashMap<>();
+	
+	private static volatile boolean sharedCacheEnabled = false;
+	
+	public static void setSharedCacheEnabled(boolean enabled) {
+		sharedCacheEnabled = enabled;
+		if(!enabled)
+			sharedResources.clear();
+	}
+	
+	public static boolean isSharedCacheEnabled() {
+		return sharedCacheEnabled;
+	}
+	
+	public static int getSharedCacheSize() {
+		return sharedResources.size();
+	}
+	
 	@Inject
 	private ResourceConfig config;
 
@@ -74,7 +98,11 @@ public class TermSuiteResourceManager {
 		try {
 			resourceMutex.acquire();
 			if(!loadedResources.containsKey(resourceType)) {
-				loadedResources.put(resourceType, loadResource(resourceType));
+				if(sharedCacheEnabled) {
+					String key = resourceType.name() + "@" + getResourceURL(resourceType);
+					loadedResources.put(resourceType, sharedResources.computeIfAbsent(key, k -> loadResource(resourceType)));
+				} else
+					loadedResources.put(resourceType, loadResource(resourceType));
 			}
 			Object resource = loadedResources.get(resourceType);
 			resourceMutex.release();
@@ -0,0 +1,143 @@
+package fr.univnantes.termsuite.tools;
+
+import java.io.BufferedReader;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Map;
+
+import com.fasterxml.jackson.databind.JsonNode;
+import com.fasterxml.jackson.databind.ObjectMapper;
+
+import fr.univnantes.termsuite.api.TermSuite;
+import fr.univnantes.termsuite.framework.service.TermSuiteResourceManager;
+
+/**
+ *
+ * Long-lived terminology extraction worker.
+ *
+ * Keeps one JVM warm across many extractions: classes are loaded and
+ * JIT-compiled once, and language resources are shared between runs
+ * through {@link TermSuiteResourceManager}'s process-wide cache.
+ *
+ * Protocol: one JSON request per line on stdin, one JSON response per
+ * line on stdout. Logs and any other console output go to stderr.
+ *
+ * <pre>
+ * {"id": "1", "command": "extract", "args": ["-c", "corpus/", "-l", "en", "--json", "out.json"]}
+ * {"id": "1", "status": "ok", "elapsed_ms": 5230, "jobs": 1}
+ *
+ * {"id": "2", "command": "preprocess", "args": ["-c", "corpus/", "-l", "en", "-t", "tagger/", "--json", "prepared.json"]}
+ * {"id": "2", "status": "ok", "elapsed_ms": 4120, "jobs": 2}
+ *
+ * {"id": "3", "command": "ping"}
+ * {"id": "3", "status": "ok", "jobs": 2, "heap_used": 812345678, "heap_max": 4294967296}
+ *
+ * {"id": "4", "command": "shutdown"}
+ * </pre>
+ *
+ * The arguments of an <code>extract</code> command are those of
+ * {@link TerminologyExtractorCLI}, those of a <code>preprocess</code>
+ * command are those of {@link PreprocessorCLI}.
+ *
+ * @see TerminologyExtractorCLI
+ * @see PreprocessorCLI
+ */
+public class TermSuiteWorker { // NO_UCD (public entry point)
+
+	private static final String CMD_EXTRACT = "extract";
+	private static final String CMD_PREPROCESS = "preprocess";
+	private static final String CMD_PING = "ping";
+	private static final String CMD_SHUTDOWN = "shutdown";
+
+	private final ObjectMapper mapper = new ObjectMapper();
+	private final PrintStream protocol;
+	private int jobs = 0;
+
+	public TermSuiteWorker(PrintStream protocol) {
+		this.protocol = protocol;
+	}
+
+	public static void main(String[] args) throws IOException {
+		// Reserve stdout for the protocol, console logging goes to stderr
+		PrintStream protocol = new PrintStream(System.out, true, StandardCharsets.UTF_8.name());
+		System.setOut(System.err);
+
+		TermSuiteResourceManager.setSharedCacheEnabled(true);
+		new TermSuiteWorker(protocol).serve(
+				new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8)));
+	}
+
+	public void serve(BufferedReader in) throws IOException {
+		Map<String, Object> ready = new LinkedHashMap<>();
+		ready.put("status", "ready");
+		ready.put("version", TermSuite.currentVersion());
+		respond(ready);
+
+		String line;
+		while((line = in.readLine()) != null) {
+			if(line.trim().isEmpty())
+				continue;
+			Map<String, Object> response = new LinkedHashMap<>();
+			boolean shutdown = false;
+			try {
+				JsonNode request = mapper.readTree(line);
+				response.put("id", request.path("id").asText(null));
+				String command = request.path("command").asText(CMD_EXTRACT);
+				if(CMD_EXTRACT.equals(command))
+					launch(new TerminologyExtractorCLI(), request, response);
+				else if(CMD_PREPROCESS.equals(command))
+					launch(new PreprocessorCLI(), request, response);
+				else if(CMD_PING.equals(command))
+					ping(response);
+				else if(CMD_SHUTDOWN.equals(command)) {
+					response.put("status", "ok");
+					shutdown = true;
+				} else {
+					response.put("status", "error");
+					response.put("error", "Unknown command: " + command);
+				}
+			} catch(Exception e) {
+				response.put("status", "error");
+				response.put("error", e.getMessage() == null ? e.getClass().getName() : e.getMessage());
+			}
+			respond(response);
+			if(shutdown)
+				return;
+		}
+	}
+
+	private void launch(CommandLineClient client, JsonNode request, Map<String, Object> response) {
+		List<String> args = new ArrayList<>();
+		for(JsonNode arg:request.path("args"))
+			args.add(arg.asText());
+
+		long start = System.currentTimeMillis();
+		try {
+			client.launch(args.toArray(new String[args.size()]));
+			response.put("status", "ok");
+		} finally {
+			jobs++;
+			response.put("elapsed_ms", System.currentTimeMillis() - start);
+			response.put("jobs", jobs);
+		}
+	}
+
+	private void ping(Map<String, Object> response) {
+		Runtime runtime = Runtime.getRuntime();
+		response.put("status", "ok");
+		response.put("jobs", jobs);
+		response.put("cached_resources", TermSuiteResourceManager.getSharedCacheSize());
+		response.put("heap_used", runtime.totalMemory() - runtime.freeMemory());
+		response.put("heap_max", runtime.maxMemory());
+	}
+
+	private void respond(Map<String, Object> response) throws IOException {
+		protocol.println(mapper.writeValueAsString(response));
+		protocol.flush();
+	}
+}
@@ -1,22 +1,42 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Request
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request, Header
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
 import os
+import time
 import uuid
+import asyncio
 import json
+import base64
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Optional
+from typing import List, Optional
 
 from app.models import (
     ExtractionRequest, ExtractionResponse, JobStatusResponse,
-    UploadResponse, JobStatus
+    UploadResponse, JobStatus, TermEntry, TermPage, TermSort, SortOrder,
+    Suggestion, AutocompleteResponse, UploadFileType, UploadSessionRequest,
+    UploadSessionResponse, UploadChunkResponse
+)
+from app.pipeline import (
+    termsuite_service, tmx_parser, excel_exporter, file_handler, result_cache,
+    jobs, memory_budget, retention, deduplicator, JOB_RUNNER, process_extraction, get_tmx_index
+)
+from app.services.tmx_index import TMXIndex
+from app.services.term_matcher import TermMatcher
+from app.services.term_store import TermStore
+from app.services.job_executor import JobExecutor
+from app.services.job_queue import JobQueue
+from app.services.job_events import JobEventBroker
+from app.services.job_store import MemoryJobStore, job_db_path
+from app.utils.file_handler import UPLOAD_CHUNK
+from app.utils.zip_ingest import ZipLimitError
+from app.utils.streaming import (
+    csv_chunks, json_chunks, ndjson_chunks, streaming_download, sse_message, sse_response
 )
-from app.services.termsuite import TermSuiteService
-from app.services.tmx_parser import TMXParser
-from app.services.excel_export import ExcelExporter
-from app.utils.file_handler import FileHandler
 
 app = FastAPI(
     title="TermSuite API",
@@ -39,14 +59,100 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Servicios
-termsuite_service = TermSuiteService()
-tmx_parser = TMXParser()
-excel_exporter = ExcelExporter()
-file_handler = FileHandler()
+# Ejecutor local de trabajos (JOB_RUNNER=local) o cola de los workers (JOB_RUNNER=queue)
+job_executor = JobExecutor(lock_dir=file_handler.data_dir / 'runners')
+job_queue = None
+if JOB_RUNNER == 'queue':
+    if isinstance(jobs, MemoryJobStore):
+        raise Exception("JOB_RUNNER=queue necesita un estado compartido (JOB_STORE=sqlite)")
+    job_queue = JobQueue(job_db_path(file_handler.data_dir))
+
+# Extracción de corpus ZIP fuera de la petición (ZIP_INGEST_JOBS a la vez;
+# cada una reparte sus documentos en ZIP_INGEST_WORKERS hilos)
+zip_ingest_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('ZIP_INGEST_JOBS', '2')),
+    thread_name_prefix='zip-ingest-job'
+)
+
+# Avisos de cambios de trabajos para /api/jobs/{job_id}/events
+job_events = JobEventBroker()
+jobs.add_listener(job_events.publish)
+
+# Traducciones alternativas conservadas por término en coincidencias parciales
+MAX_PARTIAL_MATCHES = 5
+
+# Términos que se leen del índice de una vez al exportar
+EXPORT_BLOCK = 10000
+
+# Tamaño máximo de página en la consulta de términos
+MAX_TERMS_PAGE = 1000
+
+# Máximo de sugerencias de autocompletado
+MAX_SUGGESTIONS = 50
+
+# Segundos entre relecturas del estado en los flujos de eventos (cambios
+# escritos por otros procesos, p. ej. los workers de JOB_RUNNER=queue)
+EVENTS_POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', '1.0'))
+
+# Segundos sin eventos tras los que se envía un comentario keep-alive
+EVENTS_KEEPALIVE = float(os.getenv('EVENTS_KEEPALIVE', '15'))
+
+# Trabajos pendientes o en curso que se revisan al arrancar (JOB_RUNNER=local)
+RECOVER_JOBS_LIMIT = 10000
+
+# Separación mínima entre eventos de progreso de un mismo trabajo
+EVENTS_MIN_INTERVAL = 0.25
+
+# Orden de la consulta de términos -> columna del almacén
+TERM_SORT_COLUMNS = {
+    TermSort.FREQUENCY: 'freq',
+    TermSort.SPECIFICITY: 'spec',
+    TermSort.DOC_FREQUENCY: 'dfreq',
+    TermSort.ALPHABETICAL: 'term'
+}
+
 
-# Estado de trabajos en memoria (en producción usar Redis/DB)
-jobs: Dict[str, dict] = {}
+@app.on_event("startup")
+async def start_storage_maintenance():
+    """Recoger blobs a medias, borrar subidas caducadas y arrancar el barrido de retención"""
+    await run_in_threadpool(file_handler.blob_store.gc)
+    await run_in_threadpool(file_handler.upload_sessions.expire)
+    retention.start()
+
+
+@app.on_event("startup")
+def fail_orphaned_jobs():
+    """
+    Marcar como fallidos los trabajos locales cuyo proceso ya no existe
+
+    Con JOB_RUNNER=local cada trabajo corre en los hilos del proceso que lo
+    aceptó (campo runner); si ese proceso murió o se reinició, el trabajo
+    no va a avanzar. Con JOB_RUNNER=queue los recupera la cola.
+    """
+    if job_queue is not None or isinstance(jobs, MemoryJobStore):
+        return
+    for status in (JobStatus.PENDING, JobStatus.PROCESSING):
+        for job in jobs.list(status.value, RECOVER_JOBS_LIMIT):
+            runner = job.get("runner")
+            if runner and job_executor.owner_alive(runner):
+                continue
+            jobs.update(
+                job["job_id"],
+                status=JobStatus.FAILED,
+                error="El servidor se reinició antes de terminar el trabajo",
+                message="Error: el servidor se reinició antes de terminar el trabajo"
+            )
+
+
+@app.on_event("shutdown")
+def shutdown_executor():
+    """Detener el pool de trabajos y los workers JVM al parar la aplicación"""
+    job_executor.shutdown()
+    zip_ingest_executor.shutdown(wait=False, cancel_futures=True)
+    retention.stop()
+    deduplicator.shutdown()
+    termsuite_service.shutdown()
+    jobs.close()
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -64,8 +170,20 @@ async def api_info():
         "endpoints": {
             "upload_tmx": "/api/upload-tmx",
             "upload_corpus": "/api/upload-corpus",
+            "uploads": "/api/uploads",
+            "upload_chunk": "/api/uploads/{upload_id}/chunks/{index}",
+            "upload_complete": "/api/uploads/{upload_id}/complete",
+            "corpus_ingest": "/api/corpus/{corpus_id}/ingest",
             "extract": "/api/extract",
             "status": "/api/status/{job_id}",
+            "jobs": "/api/jobs",
+            "events": "/api/jobs/{job_id}/events",
+            "workers": "/api/workers",
+            "cache": "/api/cache",
+            "storage": "/api/storage",
+            "terms": "/api/jobs/{job_id}/terms",
+            "autocomplete_job": "/api/jobs/{job_id}/autocomplete",
+            "autocomplete_tmx": "/api/tmx/{tmx_id}/autocomplete",
             "export": "/api/export/excel/{job_id}",
             "export_tmx": "/api/export/tmx-excel/{tmx_id}"
         }
@@ -89,111 +207,90 @@ async def upload_tmx(
         raise HTTPException(status_code=400, detail="Solo se permiten archivos .tmx")
     
     file_id = str(uuid.uuid4())
-    file_path = file_handler.save_upload(file_id, file, "tmx")
+    upload = await file_handler.save_upload(file_id, file, "tmx")
+    return await register_tmx_upload(file_id, file.filename, upload, language)
+
+
+async def register_tmx_upload(file_id: str, filename: str, upload: dict, language: str = None) -> UploadResponse:
+    """
+    Validar una subida TMX ya guardada y construir su índice
+    
+    Args:
+        file_id: ID del TMX
+        filename: Nombre original
+        upload: Datos de la subida (ver FileHandler.save_stream)
+        language: Idioma del que informar (opcional)
+    """
+    file_path = upload["path"]
+    if upload["format"] not in ('tmx', 'xml'):
+        file_handler.discard_upload(file_id, "tmx", file_path)
+        raise HTTPException(
+            status_code=400,
+            detail=f"El archivo no es un TMX (formato detectado: {upload['format']})"
+        )
     
-    # Parsear TMX para obtener idiomas disponibles y términos
+    # Construir el índice del TMX (una sola pasada sobre el XML)
     try:
-        # Obtener idiomas disponibles en el TMX
-        available_languages = tmx_parser.get_available_languages(file_path)
+        index = await run_in_threadpool(
+            TMXIndex.build,
+            file_path,
+            file_handler.get_path("tmx", f"{file_id}.index"),
+            tmx_parser,
+            language=language
+        )
+        available_languages = index.available_languages
         
-        # Si se especificó idioma, extraer términos
+        # Si se especificó idioma, informar de sus términos
         if language:
-            terms = tmx_parser.parse(file_path, language=language)
-            terms_freq = tmx_parser.parse_with_frequency(file_path, language=language)
-            
-            # Guardar términos parseados con información del idioma y frecuencias
-            terms_data = {
-                "language": language,
-                "terms": terms,
-                "frequencies": terms_freq,
-                "total": len(terms),
-                "total_occurrences": sum(terms_freq.values()),
-                "available_languages": available_languages
-            }
-            terms_path = file_handler.get_path("tmx", f"{file_id}_terms.json")
-            with open(terms_path, 'w', encoding='utf-8') as f:
-                json.dump(terms_data, f, ensure_ascii=False, indent=2)
-            
+            total = index.stats(language)["total"]
             lang_msg = f" del idioma '{language}'"
-            message = f"TMX subido exitosamente. {len(terms)} términos{lang_msg} encontrados."
+            message = f"TMX subido exitosamente. {total} términos{lang_msg} encontrados."
         else:
-            # Solo guardar idiomas disponibles
-            terms_data = {
-                "available_languages": available_languages
-            }
-            terms_path = file_handler.get_path("tmx", f"{file_id}_terms.json")
-            with open(terms_path, 'w', encoding='utf-8') as f:
-                json.dump(terms_data, f, ensure_ascii=False, indent=2)
-            
             message = f"TMX subido exitosamente. Idiomas disponibles: {', '.join(available_languages)}"
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error al parsear TMX: {str(e)}")
     
+    retention.record(f"tmx/{file_id}", 'upload', file_path)
+    retention.record(f"tmx/{file_id}", 'tmx_index', file_handler.get_path("tmx", f"{file_id}.index"))
+    
     return UploadResponse(
         file_id=file_id,
-        filename=file.filename,
-        size=os.path.getsize(file_path),
-        message=message
+        filename=filename,
+        size=upload["size"],
+        message=message,
+        sha256=upload["sha256"],
+        format=upload["format"],
+        deduplicated=upload["deduplicated"]
     )
 
 
 @app.get("/api/tmx-languages/{tmx_id}")
 async def get_tmx_languages(tmx_id: str):
     """Obtener idiomas disponibles en un TMX subido"""
-    tmx_terms_path = file_handler.get_path("tmx", f"{tmx_id}_terms.json")
-    if not tmx_terms_path.exists():
-        raise HTTPException(status_code=404, detail="TMX no encontrado")
-    
-    with open(tmx_terms_path, 'r', encoding='utf-8') as f:
-        tmx_data = json.load(f)
-    
-    available_languages = tmx_data.get('available_languages', [])
+    index = await run_in_threadpool(open_tmx_index, tmx_id)
     
     return {
         "tmx_id": tmx_id,
-        "available_languages": available_languages
+        "available_languages": index.available_languages
     }
 
 
 @app.post("/api/extract-tmx-language")
-async def extract_tmx_language(tmx_id: str, language: str):
+def extract_tmx_language(tmx_id: str, language: str):
     """Extraer términos de un TMX para un idioma específico"""
-    # Buscar archivo TMX
-    tmx_dir = file_handler.uploads_dir / 'tmx'
-    tmx_file_path = None
-    
-    if tmx_dir.exists():
-        for file in tmx_dir.glob(f"{tmx_id}*"):
-            if file.suffix == '.tmx':
-                tmx_file_path = file
-                break
+    index = open_tmx_index(tmx_id)
     
-    if not tmx_file_path or not tmx_file_path.exists():
-        raise HTTPException(status_code=404, detail="TMX no encontrado")
-    
-    # Extraer términos del idioma especificado
+    # El índice ya contiene todos los idiomas: solo cambia el idioma activo
     try:
-        terms = tmx_parser.parse(str(tmx_file_path), language=language)
-        terms_freq = tmx_parser.parse_with_frequency(str(tmx_file_path), language=language)
-        
-        # Actualizar archivo de términos
-        terms_data = {
-            "language": language,
-            "terms": terms,
-            "frequencies": terms_freq,
-            "total": len(terms),
-            "total_occurrences": sum(terms_freq.values())
-        }
-        terms_path = file_handler.get_path("tmx", f"{tmx_id}_terms.json")
-        with open(terms_path, 'w', encoding='utf-8') as f:
-            json.dump(terms_data, f, ensure_ascii=False, indent=2)
+        index.set_language(language)
+        total = index.stats(language)["total"]
         
         return {
             "success": True,
             "language": language,
-            "total_terms": len(terms),
-            "message": f"{len(terms)} términos del idioma '{language}' extraídos"
+            "total_terms": total,
+            "message": f"{total} términos del idioma '{language}' extraídos"
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
@@ -210,53 +307,249 @@ async def upload_corpus(file: UploadFile = File(...)):
         )
     
     corpus_id = str(uuid.uuid4())
-    file_path = file_handler.save_upload(corpus_id, file, "corpus")
+    upload = await file_handler.save_upload(corpus_id, file, "corpus")
+    return await register_corpus_upload(corpus_id, file.filename, upload)
+
+
+async def register_corpus_upload(corpus_id: str, filename: str, upload: dict) -> UploadResponse:
+    """
+    Validar una subida de corpus ya guardada y prepararlo para extraer
+    
+    Args:
+        corpus_id: ID del corpus
+        filename: Nombre original (.txt o .zip)
+        upload: Datos de la subida (ver FileHandler.save_stream)
+    """
+    file_path = upload["path"]
     
-    # Si es ZIP, extraer
-    if file.filename.endswith('.zip'):
-        file_handler.extract_zip(file_path, corpus_id)
+    # El contenido debe corresponder a la extensión
+    is_zip = filename.endswith('.zip')
+    if (upload["format"] == 'zip') != is_zip or upload["format"] in ('gzip', 'binary'):
+        file_handler.discard_upload(corpus_id, "corpus", file_path)
+        raise HTTPException(
+            status_code=400,
+            detail=f"El contenido no corresponde a un archivo {Path(filename).suffix} "
+                   f"(formato detectado: {upload['format']})"
+        )
+    
+    if is_zip:
+        # Límites del ZIP (solo su directorio central); la extracción sigue
+        # en segundo plano y su estado está en /api/corpus/{id}/ingest
+        try:
+            await run_in_threadpool(file_handler.check_zip, file_path, corpus_id)
+        except ZipLimitError as e:
+            file_handler.discard_upload(corpus_id, "corpus", file_path)
+            raise HTTPException(status_code=400, detail=str(e))
+        retention.record(f"corpus/{corpus_id}", 'upload', file_path)
+        retention.record(f"corpus/{corpus_id}", 'ingest', file_handler.ingest_report_path(corpus_id))
+        zip_ingest_executor.submit(ingest_corpus, corpus_id, file_path)
+        message = "Corpus subido. Extrayendo los documentos del ZIP..."
+        ingest_status = "processing"
+    else:
+        # Un .txt se enlaza en su directorio de corpus
+        corpus_path = await run_in_threadpool(file_handler.get_corpus_path, corpus_id)
+        retention.record(f"corpus/{corpus_id}", 'upload', file_path)
+        retention.record(f"corpus/{corpus_id}", 'corpus', corpus_path)
+        message = "Corpus subido exitosamente"
+        ingest_status = None
     
     return UploadResponse(
         file_id=corpus_id,
-        filename=file.filename,
-        size=os.path.getsize(file_path),
-        message="Corpus subido exitosamente"
+        filename=filename,
+        size=upload["size"],
+        message=message,
+        sha256=upload["sha256"],
+        format=upload["format"],
+        deduplicated=upload["deduplicated"],
+        ingest_status=ingest_status
     )
 
 
-@app.post("/api/extract", response_model=ExtractionResponse)
-async def extract_terms(
-    request: ExtractionRequest,
-    background_tasks: BackgroundTasks
+def ingest_corpus(corpus_id: str, zip_path: Path):
+    """Extraer un corpus ZIP (en el pool de ingesta; el error queda en su informe)"""
+    try:
+        file_handler.extract_zip(zip_path, corpus_id)
+    except Exception:
+        return
+    finally:
+        retention.record(f"corpus/{corpus_id}", 'ingest', file_handler.ingest_report_path(corpus_id))
+    retention.record(f"corpus/{corpus_id}", 'corpus', file_handler.corpus_dir / corpus_id)
+
+
+@app.get("/api/corpus/{corpus_id}/ingest")
+async def get_corpus_ingest(corpus_id: str, files: bool = True):
+    """
+    Estado de la extracción de un corpus ZIP
+    
+    Args:
+        corpus_id: ID del corpus
+        files: Incluir las estadísticas de cada documento
+    """
+    report = await run_in_threadpool(file_handler.ingest_report, corpus_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="No hay extracción ZIP para este corpus")
+    if not files:
+        report.pop("files", None)
+    return report
+
+
+# Extensiones admitidas por tipo de subida
+UPLOAD_EXTENSIONS = {
+    UploadFileType.TMX: ('.tmx',),
+    UploadFileType.CORPUS: ('.txt', '.zip')
+}
+
+
+@app.post("/api/uploads", response_model=UploadSessionResponse)
+async def create_upload(request: UploadSessionRequest):
+    """
+    Abrir una subida reanudable por bloques
+    
+    El archivo se envía en bloques de `chunk_size` bytes (el último puede
+    ser menor) con PUT /api/uploads/{upload_id}/chunks/{index}, en
+    cualquier orden y en paralelo; tras un corte, GET /api/uploads/{upload_id}
+    dice qué bloques faltan. POST /api/uploads/{upload_id}/complete lo
+    convierte en un TMX o corpus como los de /api/upload-tmx y
+    /api/upload-corpus (con el mismo ID).
+    """
+    extensions = UPLOAD_EXTENSIONS[request.file_type]
+    if not request.filename.endswith(extensions):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Solo se permiten archivos {' o '.join(extensions)}"
+        )
+    try:
+        return await run_in_threadpool(
+            file_handler.upload_sessions.create,
+            request.file_type.value,
+            request.filename,
+            request.size,
+            request.chunk_size,
+            request.sha256
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload(upload_id: str):
+    """Estado de una subida reanudable: bloques recibidos y caducidad"""
+    try:
+        return await run_in_threadpool(file_handler.upload_sessions.status, upload_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Subida no encontrada")
+
+
+@app.put("/api/uploads/{upload_id}/chunks/{index}", response_model=UploadChunkResponse)
+async def upload_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    x_chunk_sha256: Optional[str] = Header(None)
 ):
+    """
+    Escribir un bloque en su posición (index × chunk_size)
+    
+    El cuerpo son los bytes del bloque. Con la cabecera X-Chunk-SHA256 el
+    bloque se rechaza si no coincide; el SHA-256 calculado se devuelve
+    siempre. Repetir un bloque lo sobrescribe.
+    """
+    try:
+        writer = await run_in_threadpool(file_handler.upload_sessions.open_chunk, upload_id, index)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Subida no encontrada")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        # Escribir en el pool de hilos por tramos de UPLOAD_CHUNK bytes
+        buffer = bytearray()
+        async for data in request.stream():
+            buffer += data
+            if len(buffer) >= UPLOAD_CHUNK:
+                await run_in_threadpool(writer.write, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(writer.write, bytes(buffer))
+    except ValueError as e:
+        await run_in_threadpool(writer.abort)
+        raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        await run_in_threadpool(writer.abort)
+        raise
+    
+    try:
+        chunk = await run_in_threadpool(writer.close, x_chunk_sha256)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return UploadChunkResponse(upload_id=upload_id, **chunk)
+
+
+@app.post("/api/uploads/{upload_id}/complete", response_model=UploadResponse)
+async def complete_upload(upload_id: str, language: str = None):
+    """
+    Finalizar una subida reanudable
+    
+    Args:
+        upload_id: ID de la subida (pasa a ser el del TMX o corpus)
+        language: Solo TMX: idioma del que informar, como en /api/upload-tmx
+    """
+    try:
+        upload = await run_in_threadpool(file_handler.finalize_upload, upload_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Subida no encontrada")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if upload["file_type"] == UploadFileType.TMX.value:
+        return await register_tmx_upload(upload_id, upload["filename"], upload, language)
+    return await register_corpus_upload(upload_id, upload["filename"], upload)
+
+
+@app.delete("/api/uploads/{upload_id}")
+async def cancel_upload(upload_id: str):
+    """Cancelar una subida reanudable y liberar su espacio"""
+    await run_in_threadpool(file_handler.upload_sessions.remove, upload_id)
+    return {"upload_id": upload_id, "deleted": True}
+
+
+@app.post("/api/extract", response_model=ExtractionResponse)
+def extract_terms(request: ExtractionRequest):
     """Extraer términos del corpus"""
     job_id = str(uuid.uuid4())
     
+    # Un corpus ZIP tiene que haber terminado de extraerse
+    report = file_handler.ingest_report(request.corpus_id)
+    if report is not None and report["status"] == 'processing':
+        raise HTTPException(status_code=409, detail="El corpus aún se está extrayendo del ZIP")
+    if report is not None and report["status"] == 'failed':
+        raise HTTPException(status_code=400, detail=f"La extracción del ZIP falló: {report['error']}")
+    
     # Validar que existe el corpus
     corpus_path = file_handler.get_corpus_path(request.corpus_id)
     if not corpus_path.exists():
         raise HTTPException(status_code=404, detail="Corpus no encontrado")
+    retention.touch(f"corpus/{request.corpus_id}")
     
     # Validar TMX si se especifica
     if request.use_tmx and request.tmx_id:
-        tmx_terms_path = file_handler.get_path("tmx", f"{request.tmx_id}_terms.json")
-        if not tmx_terms_path.exists():
-            raise HTTPException(status_code=404, detail="TMX no encontrado")
+        open_tmx_index(request.tmx_id)
     
     # Crear trabajo
-    jobs[job_id] = {
+    jobs.create(job_id, {
         "status": JobStatus.PENDING,
         "progress": 0,
         "message": "Trabajo en cola",
-        "request": request.dict()
-    }
+        "request": request.dict(),
+        "runner": job_executor.owner if job_queue is None else None
+    })
     
-    # Ejecutar en background
-    background_tasks.add_task(
-        process_extraction,
-        job_id,
-        request
-    )
+    if job_queue is not None:
+        # Lo procesará un worker (python -m app.worker)
+        job_queue.enqueue(job_id, request.dict())
+    else:
+        # Encolar en el pool de trabajos (fuera del event loop)
+        job_executor.submit(job_id, process_extraction, job_id, request)
     
     return ExtractionResponse(
         job_id=job_id,
@@ -266,29 +559,269 @@ async def extract_terms(
 
 
 @app.get("/api/status/{job_id}", response_model=JobStatusResponse)
-async def get_job_status(job_id: str):
+def get_job_status(job_id: str):
     """Obtener estado del trabajo"""
-    if job_id not in jobs:
+    job = jobs.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Trabajo no encontrado")
     
-    job = jobs[job_id]
-    return JobStatusResponse(
+    return job_status_response(job_id, job)
+
+
+@app.get("/api/jobs/{job_id}/dedup")
+def get_job_dedup(job_id: str):
+    """
+    Informe completo de duplicados de un trabajo (el estado solo lleva un
+    resumen con una muestra de los documentos eliminados)
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    summary = job.get("dedup")
+    if summary is None:
+        raise HTTPException(status_code=404, detail="El trabajo no eliminó duplicados")
+    
+    corpus_id = job["request"]["corpus_id"]
+    report_path = deduplicator.report_path(file_handler.corpus_dir / corpus_id, summary["threshold"])
+    if not report_path.exists():
+        # Borrado por la retención: queda el resumen
+        return summary
+    retention.touch(f"corpus/{corpus_id}")
+    return FileResponse(report_path, media_type="application/json")
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """
+    Flujo Server-Sent Events con el estado de un trabajo
+
+    Emite `status` en cada cambio de estado y `progress` en cada avance,
+    ambos con el mismo JSON que /api/status/{job_id}, y termina tras
+    completed o failed. /api/status/{job_id} sigue disponible para los
+    clientes que no puedan mantener la conexión abierta.
+    """
+    if await run_in_threadpool(jobs.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+
+    def snapshot() -> Optional[dict]:
+        # Lecturas de SQLite (estado, posición en cola y en memoria): en el
+        # pool de hilos, un bloqueo de la base no para el event loop
+        job = jobs.get(job_id)
+        if job is None:
+            return None
+        return json.loads(job_status_response(job_id, job).json())
+
+    async def events():
+        changed = job_events.subscribe(job_id)
+        try:
+            yield b"retry: 3000\n\n"
+            last, last_status = None, None
+            last_sent = time.monotonic()
+            while not await request.is_disconnected():
+                data = await run_in_threadpool(snapshot)
+                if data is None:
+                    return
+                if data != last:
+                    kind = 'status' if data["status"] != last_status else 'progress'
+                    yield sse_message(kind, data)
+                    last, last_status = data, data["status"]
+                    last_sent = time.monotonic()
+                    if last_status in (JobStatus.COMPLETED, JobStatus.FAILED):
+                        return
+                    # Agrupar las ráfagas de progreso
+                    await asyncio.sleep(EVENTS_MIN_INTERVAL)
+                elif time.monotonic() - last_sent >= EVENTS_KEEPALIVE:
+                    yield b": keepalive\n\n"
+                    last_sent = time.monotonic()
+                await job_events.wait(changed, EVENTS_POLL_INTERVAL)
+        finally:
+            job_events.unsubscribe(job_id, changed)
+
+    return sse_response(events())
+
+
+@app.get("/api/jobs", response_model=List[JobStatusResponse])
+def list_jobs(
+    status: Optional[JobStatus] = None,
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Trabajos más recientes primero, opcionalmente filtrados por estado"""
+    return [
+        job_status_response(job["job_id"], job)
+        for job in jobs.list(status.value if status else None, limit)
+    ]
+
+
+@app.get("/api/workers")
+def get_workers():
+    """Estado del pool de trabajos, de la cola de workers, de la memoria y de los workers JVM"""
+    return {
+        "runner": JOB_RUNNER,
+        "jobs": job_executor.stats(),
+        "queue": job_queue.stats() if job_queue is not None else None,
+        "memory": memory_budget.stats(),
+        "event_streams": job_events.stats(),
+        "jvm_pool": termsuite_service.pool.stats() if termsuite_service.pool else None
+    }
+
+
+@app.get("/api/cache")
+def get_cache_stats():
+    """Estado de la caché de resultados de TermSuite"""
+    return result_cache.stats()
+
+
+@app.get("/api/storage")
+def get_storage_stats():
+    """Uso del disco: blobs deduplicados, subidas reanudables y retención de artefactos"""
+    return {
+        "blobs": file_handler.blob_store.stats(),
+        "upload_sessions": file_handler.upload_sessions.stats(),
+        "retention": retention.stats()
+    }
+
+
+@app.get("/api/jobs/{job_id}/terms", response_model=TermPage)
+def get_job_terms(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_TERMS_PAGE),
+    cursor: Optional[str] = None,
+    sort_by: TermSort = TermSort.FREQUENCY,
+    sort_order: Optional[SortOrder] = None,
+    min_frequency: Optional[int] = None,
+    max_frequency: Optional[int] = None,
+    min_doc_frequency: Optional[int] = None,
+    max_doc_frequency: Optional[int] = None,
+    min_specificity: Optional[float] = None,
+    max_specificity: Optional[float] = None,
+    in_tmx: Optional[bool] = None,
+    contains: Optional[str] = None
+):
+    """
+    Consultar los términos de un trabajo por páginas
+
+    Se lee del almacén columnar del trabajo: cada orden tiene su
+    permutación precalculada, así que una página cuesta lo que su tamaño.
+    El orden por defecto es descendente salvo el alfabético. next_cursor
+    codifica la consulta completa: basta con pasarlo como cursor para
+    pedir la página siguiente.
+    """
+    if cursor:
+        query = _decode_cursor(cursor)
+        offset = query["offset"]
+        sort_by = TermSort(query["sort_by"])
+        sort_order = SortOrder(query["sort_order"])
+        filters = {name: tuple(bounds) for name, bounds in query["filters"].items()}
+        contains = query.get("contains")
+    else:
+        if sort_order is None:
+            sort_order = SortOrder.ASC if sort_by == TermSort.ALPHABETICAL else SortOrder.DESC
+        filters = {
+            'freq': (min_frequency, max_frequency),
+            'dfreq': (min_doc_frequency, max_doc_frequency),
+            'spec': (min_specificity, max_specificity),
+            'in_tmx': (in_tmx, in_tmx)
+        }
+        filters = {
+            name: bounds for name, bounds in filters.items()
+            if any(bound is not None for bound in bounds)
+        }
+
+    store = get_job_store(job_id)
+    total, rows = store.query(
+        sort_by=TERM_SORT_COLUMNS[sort_by],
+        descending=sort_order == SortOrder.DESC,
+        offset=offset,
+        limit=limit,
+        filters=filters,
+        contains=contains
+    )
+
+    fields = ('term', 'freq', 'dfreq', 'spec', 'pattern', 'in_tmx')
+    terms = [
+        TermEntry(
+            term=term,
+            frequency=freq,
+            doc_frequency=dfreq,
+            specificity=spec,
+            pattern=pattern,
+            in_tmx=flag
+        )
+        for term, freq, dfreq, spec, pattern, flag in store.iter_rows(fields, order=rows)
+    ]
+
+    next_cursor = None
+    if offset + len(terms) < total:
+        next_cursor = _encode_cursor({
+            "offset": offset + len(terms),
+            "sort_by": sort_by.value,
+            "sort_order": sort_order.value,
+            "filters": filters,
+            "contains": contains
+        })
+
+    return TermPage(
         job_id=job_id,
-        status=job["status"],
-        progress=job.get("progress", 0),
-        message=job.get("message", ""),
-        result_file=job.get("result_file"),
-        error=job.get("error")
+        total=total,
+        offset=offset,
+        limit=limit,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        next_cursor=next_cursor,
+        terms=terms
+    )
+
+
+@app.get("/api/jobs/{job_id}/autocomplete", response_model=AutocompleteResponse)
+def autocomplete_job_terms(
+    job_id: str,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS)
+):
+    """Sugerir términos del resultado de un trabajo (prefijo primero, luego subcadena)"""
+    store = get_job_store(job_id)
+    ids = store.search_index().suggest(q, store.column('freq'), limit)
+    return AutocompleteResponse(
+        query=q,
+        suggestions=[
+            Suggestion(term=term, frequency=freq)
+            for term, freq in store.iter_rows(('term', 'freq'), order=ids)
+        ]
+    )
+
+
+@app.get("/api/tmx/{tmx_id}/autocomplete", response_model=AutocompleteResponse)
+def autocomplete_tmx_terms(
+    tmx_id: str,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS),
+    language: Optional[str] = None
+):
+    """Sugerir términos de una memoria TMX (por defecto, del idioma activo)"""
+    index = open_tmx_index(tmx_id)
+    search = index.search_index(language)
+    if search is None:
+        return AutocompleteResponse(query=q, suggestions=[])
+
+    positions = search.suggest(q, index.view_frequencies(language), limit)
+    selected = index.term_columns(positions, language)
+    return AutocompleteResponse(
+        query=q,
+        suggestions=[
+            Suggestion(term=term, frequency=freq)
+            for term, freq in zip(selected['term'], selected['freq'])
+        ]
     )
 
 
 @app.get("/api/export/excel/{job_id}")
-async def export_excel(job_id: str):
+def export_excel(job_id: str):
     """Exportar resultados a Excel"""
-    if job_id not in jobs:
+    job = jobs.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Trabajo no encontrado")
     
-    job = jobs[job_id]
     if job["status"] != JobStatus.COMPLETED:
         raise HTTPException(
             status_code=400, 
@@ -298,6 +831,7 @@ async def export_excel(job_id: str):
     excel_path = file_handler.get_path("outputs", f"{job_id}.xlsx")
     if not excel_path.exists():
         raise HTTPException(status_code=404, detail="Archivo Excel no encontrado")
+    retention.touch(f"job/{job_id}")
     
     return FileResponse(
         path=excel_path,
@@ -307,7 +841,7 @@ async def export_excel(job_id: str):
 
 
 @app.get("/api/export/tmx-excel/{tmx_id}")
-async def export_tmx_to_excel(
+def export_tmx_to_excel(
     tmx_id: str,
     min_frequency: Optional[int] = None,
     top_n: Optional[int] = None,
@@ -319,7 +853,8 @@ async def export_tmx_to_excel(
     columns: Optional[str] = None,
     exclude_numbers: bool = False,
     contains: Optional[str] = None,
-    include_translation: bool = False
+    include_translation: bool = False,
+    compress: bool = False
 ):
     """
     Exportar términos de TMX directamente a Excel con opciones de filtrado
@@ -332,162 +867,108 @@ async def export_tmx_to_excel(
         max_words: Máximo número de palabras (ej: 5)
         sort_by: Ordenar por: frequency, alphabetical, length, words
         sort_order: Orden: asc o desc
-        format: Formato de salida: excel, csv, json
+        format: Formato de salida: excel, csv, json, ndjson
         columns: Columnas a incluir (separadas por coma)
         exclude_numbers: Excluir términos con números
         contains: Filtrar términos que contengan este texto
         include_translation: Incluir traducción si está disponible
+        compress: Comprimir la descarga en gzip (csv, json, ndjson)
     """
-    # Verificar que existe el TMX
-    tmx_terms_path = file_handler.get_path("tmx", f"{tmx_id}_terms.json")
-    if not tmx_terms_path.exists():
-        raise HTTPException(status_code=404, detail="TMX no encontrado")
-    
-    # Cargar términos del TMX
-    with open(tmx_terms_path, 'r', encoding='utf-8') as f:
-        tmx_data = json.load(f)
-    
-    # Extraer términos (compatible con formato nuevo y antiguo)
-    if isinstance(tmx_data, dict):
-        terms_list = tmx_data.get('terms', [])
-        frequencies = tmx_data.get('frequencies', {})
-        language = tmx_data.get('language', 'unknown')
-        total_occurrences = tmx_data.get('total_occurrences', 0)
-    else:
-        terms_list = tmx_data
-        frequencies = {}
-        language = 'unknown'
-        total_occurrences = 0
-    
-    # Crear estructura para Excel
-    terms_for_excel = []
-    for term in terms_list:
-        freq = frequencies.get(term, 1)
-        word_count = len(term.split())
-        
-        # Aplicar filtros
-        # Filtro de frecuencia mínima
-        if min_frequency and freq < min_frequency:
-            continue
-        
-        # Filtro de palabras
-        if min_words and word_count < min_words:
-            continue
-        if max_words and word_count > max_words:
-            continue
-        
-        # Filtro de números
-        if exclude_numbers and any(char.isdigit() for char in term):
-            continue
-        
-        # Filtro de contenido
-        if contains and contains.lower() not in term.lower():
-            continue
-        
-        terms_for_excel.append({
-            'Término': term,
-            'Frecuencia': freq,
-            'Longitud': len(term),
-            'Palabras': word_count,
-            'Idioma': language
-        })
+    # Abrir índice del TMX
+    index = open_tmx_index(tmx_id)
     
-    # Ordenar según parámetros
-    if sort_by == "frequency":
-        terms_for_excel.sort(key=lambda x: x['Frecuencia'], reverse=(sort_order == "desc"))
-    elif sort_by == "alphabetical":
-        terms_for_excel.sort(key=lambda x: x['Término'].lower(), reverse=(sort_order == "desc"))
-    elif sort_by == "length":
-        terms_for_excel.sort(key=lambda x: x['Longitud'], reverse=(sort_order == "desc"))
-    elif sort_by == "words":
-        terms_for_excel.sort(key=lambda x: x['Palabras'], reverse=(sort_order == "desc"))
+    language = index.language or 'unknown'
     
-    # Aplicar top_n después de ordenar
-    if top_n:
-        terms_for_excel = terms_for_excel[:top_n]
-    
-    # Agregar número después de filtrar y ordenar
-    for idx, item in enumerate(terms_for_excel, 1):
-        item['Número'] = idx
+    # Filtrar y ordenar sobre las columnas del índice (vectorizado)
+    positions = index.select(
+        min_frequency=min_frequency,
+        min_words=min_words,
+        max_words=max_words,
+        exclude_numbers=exclude_numbers,
+        contains=contains,
+        sort_by=sort_by,
+        descending=(sort_order == "desc"),
+        top_n=top_n
+    )
     
     # Si no hay términos después de filtrar
-    if not terms_for_excel:
+    if len(positions) == 0:
         raise HTTPException(
             status_code=404, 
             detail="No se encontraron términos con los filtros aplicados"
         )
     
-    # Incluir traducción si se solicita
+    def term_blocks():
+        # Términos seleccionados por bloques, en el orden de positions
+        for start in range(0, len(positions), EXPORT_BLOCK):
+            block = index.term_columns(positions[start:start + EXPORT_BLOCK])
+            yield from zip(block['term'], block['freq'], block['length'], block['words'])
+    
+    # Columnas de cada fila (el número va después de filtrar y ordenar)
+    all_cols = ['Término', 'Frecuencia', 'Longitud', 'Palabras', 'Idioma', 'Número']
+    
+    # Incluir traducción si se solicita: una pasada por los pares del TMX
+    # antes de generar filas; solo se guardan las traducciones encontradas
+    translate = None
     if include_translation:
-        # Buscar el archivo TMX original en uploads/tmx/
-        tmx_dir = file_handler.uploads_dir / 'tmx'
-        tmx_file_path = None
-        
-        # Buscar archivo con el ID
-        if tmx_dir.exists():
-            for file in tmx_dir.glob(f"{tmx_id}*"):
-                if file.suffix == '.tmx':
-                    tmx_file_path = file
-                    break
-        
-        if tmx_file_path and tmx_file_path.exists():
+        if index.language:
             try:
-                # Pasar el idioma para identificar correctamente source y target
-                translations = tmx_parser.parse_with_translations(str(tmx_file_path), source_lang=language)
-                
-                # Crear diccionario de traducciones exactas
+                # Términos buscados (normalizados a minúsculas)
+                matcher = TermMatcher(term.lower() for term, _, _, _ in term_blocks())
                 trans_dict_exact = {}
-                # Crear lista de segmentos para búsqueda parcial
-                trans_segments = []
                 
-                for trans in translations:
-                    source = trans.get('source', '').strip()
-                    target = trans.get('target', '').strip()
-                    if source and target:
-                        # Guardar traducción exacta
-                        trans_dict_exact[source.lower()] = target
-                        # Guardar para búsqueda parcial
-                        trans_segments.append({
-                            'source': source,
-                            'target': target,
-                            'source_lower': source.lower()
-                        })
+                def segments():
+                    # Una sola pasada por los pares del índice (idioma activo como origen)
+                    for source, target in index.translations():
+                        source_lower = source.lower()
+                        # Coincidencia exacta (el último par gana)
+                        if matcher.pattern_id(source_lower) >= 0:
+                            trans_dict_exact[source_lower] = target
+                        yield source_lower, target
+                
+                # Coincidencias parciales de todos los términos a la vez
+                partial_matches = matcher.match_segments(segments(), limit=MAX_PARTIAL_MATCHES)
+                all_cols += ['Traducción', 'Tipo Match', 'Coincidencias', 'Otras traducciones']
                 
-                # Agregar traducción a cada término
-                for item in terms_for_excel:
-                    term = item['Término']
-                    term_lower = term.lower()
+                def translate(item):
+                    term_lower = item['Término'].lower()
                     
                     # 1. Buscar coincidencia exacta
                     if term_lower in trans_dict_exact:
                         item['Traducción'] = trans_dict_exact[term_lower]
                         item['Tipo Match'] = 'Exacto'
+                        item['Coincidencias'] = partial_matches.get(matcher.pattern_id(term_lower), (1, []))[0]
+                        item['Otras traducciones'] = ''
+                    elif matcher.pattern_id(term_lower) in partial_matches:
+                        # 2. Coincidencia parcial: segmentos ordenados por puntuación
+                        count, targets = partial_matches[matcher.pattern_id(term_lower)]
+                        item['Traducción'] = f"[Segmento] {targets[0]}"
+                        item['Tipo Match'] = 'Parcial'
+                        item['Coincidencias'] = count
+                        item['Otras traducciones'] = ' | '.join(targets[1:])
                     else:
-                        # 2. Buscar en segmentos (coincidencia parcial)
-                        found = False
-                        for seg in trans_segments:
-                            if term_lower in seg['source_lower']:
-                                # Encontrado en un segmento
-                                item['Traducción'] = f"[Segmento] {seg['target']}"
-                                item['Tipo Match'] = 'Parcial'
-                                found = True
-                                break
-                        
-                        if not found:
-                            item['Traducción'] = ''
-                            item['Tipo Match'] = 'No encontrado'
+                        item['Traducción'] = ''
+                        item['Tipo Match'] = 'No encontrado'
+                        item['Coincidencias'] = 0
+                        item['Otras traducciones'] = ''
                 
             except Exception as e:
                 # Si hay error al parsear traducciones, agregar columna vacía
-                for item in terms_for_excel:
-                    item['Traducción'] = f'Error: {str(e)}'
+                error = f'Error: {str(e)}'
+                all_cols += ['Traducción', 'Tipo Match']
+                
+                def translate(item):
+                    item['Traducción'] = error
                     item['Tipo Match'] = 'Error'
         else:
-            # Si no se encuentra el archivo TMX, agregar columna vacía
-            for item in terms_for_excel:
+            # Sin idioma activo no hay origen para los pares
+            all_cols.append('Traducción')
+            
+            def translate(item):
                 item['Traducción'] = 'TMX no encontrado'
     
     # Seleccionar columnas si se especifica
+    output_cols = all_cols
     if columns:
         selected_cols = [col.strip().capitalize() for col in columns.split(',')]
         # Mapeo de nombres de columnas
@@ -498,78 +979,59 @@ async def export_tmx_to_excel(
             'Words': 'Palabras',
             'Language': 'Idioma',
             'Translation': 'Traducción',
+            'Matches': 'Coincidencias',
             'Number': 'Número'
         }
         # Convertir nombres en inglés a español
         selected_cols = [col_mapping.get(col, col) for col in selected_cols]
         # Filtrar solo columnas existentes
-        available_cols = list(terms_for_excel[0].keys()) if terms_for_excel else []
-        selected_cols = [col for col in selected_cols if col in available_cols]
+        selected_cols = [col for col in all_cols if col in selected_cols]
         if selected_cols:
-            terms_for_excel = [{k: v for k, v in item.items() if k in selected_cols} 
-                              for item in terms_for_excel]
-    
-    import pandas as pd
-    df = pd.DataFrame(terms_for_excel)
-    
-    # Exportar según formato
-    if format == "json":
-        output_filename = f"tmx_{tmx_id}.json"
-        output_path = file_handler.get_path("outputs", output_filename)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(terms_for_excel, f, ensure_ascii=False, indent=2)
-        return FileResponse(
-            path=output_path,
-            filename=f"terminos_tmx_{language}.json",
-            media_type="application/json"
-        )
-    
-    elif format == "csv":
-        output_filename = f"tmx_{tmx_id}.csv"
-        output_path = file_handler.get_path("outputs", output_filename)
-        df.to_csv(output_path, index=False, encoding='utf-8-sig')
-        return FileResponse(
-            path=output_path,
-            filename=f"terminos_tmx_{language}.csv",
-            media_type="text/csv"
-        )
-    
-    # Formato Excel (por defecto)
-    excel_filename = f"tmx_{tmx_id}.xlsx"
-    excel_path = file_handler.get_path("outputs", excel_filename)
-    
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment
+            output_cols = selected_cols
     
-    # Crear Excel con formato
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Términos TMX"
-    
-    # Estilos
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True, size=11)
+    def term_rows():
+        # Filas generadas según se envían: nunca está el resultado entero en memoria
+        for number, (term, freq, length, word_count) in enumerate(term_blocks(), 1):
+            item = {
+                'Término': term,
+                'Frecuencia': freq,
+                'Longitud': length,
+                'Palabras': word_count,
+                'Idioma': language,
+                'Número': number
+            }
+            if translate is not None:
+                translate(item)
+            if output_cols is not all_cols:
+                item = {k: v for k, v in item.items() if k in output_cols}
+            yield item
     
-    # Escribir encabezados
-    for col_idx, column in enumerate(df.columns, 1):
-        cell = ws.cell(row=1, column=col_idx, value=column)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+    # CSV / JSON / NDJSON: se generan mientras se envían, sin archivo temporal
+    if format in ("csv", "json", "ndjson"):
+        filename = f"terminos_tmx_{language}.{format}"
+        if format == "csv":
+            chunks = csv_chunks(output_cols, term_rows())
+            return streaming_download(chunks, filename, "text/csv; charset=utf-8", compress)
+        if format == "ndjson":
+            return streaming_download(
+                ndjson_chunks(term_rows()), filename, "application/x-ndjson", compress
+            )
+        return streaming_download(
+            json_chunks(term_rows()), filename, "application/json", compress
+        )
     
-    # Escribir datos
-    for row_idx, row in enumerate(df.values, 2):
-        for col_idx, value in enumerate(row, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=value)
-            cell.alignment = Alignment(vertical='center')
+    # Formato Excel (por defecto): archivo propio de la petición (dos
+    # exportaciones del mismo TMX no se pisan), borrado tras enviarlo; si el
+    # proceso cae, el gc del BlobStore lo recoge al arrancar
+    excel_path = file_handler.blob_store.temp_path(f"tmx_{tmx_id}.{uuid.uuid4().hex}.xlsx")
     
     # Reordenar columnas para mejor visualización
     preferred_order = ['Número', 'Término', 'Frecuencia', 'Longitud', 'Palabras', 'Idioma', 'Traducción']
-    existing_cols = [col for col in preferred_order if col in df.columns]
-    other_cols = [col for col in df.columns if col not in existing_cols]
-    df = df[existing_cols + other_cols]
+    existing_cols = [col for col in preferred_order if col in output_cols]
+    other_cols = [col for col in output_cols if col not in existing_cols]
+    ordered_cols = existing_cols + other_cols
     
-    # Ajustar anchos dinámicamente
+    # Anchos por columna
     column_widths = {
         'Número': 10,
         'Término': 50,
@@ -577,88 +1039,112 @@ async def export_tmx_to_excel(
         'Longitud': 12,
         'Palabras': 12,
         'Idioma': 12,
-        'Traducción': 50
+        'Traducción': 50,
+        'Coincidencias': 14,
+        'Otras traducciones': 50
     }
     
-    for idx, col in enumerate(df.columns, 1):
-        col_letter = chr(64 + idx)  # A, B, C, etc.
-        width = column_widths.get(col, 15)
-        ws.column_dimensions[col_letter].width = width
-    
-    # Congelar primera fila
-    ws.freeze_panes = 'A2'
-    
-    # Guardar
-    wb.save(excel_path)
+    # Escribir en streaming, fila a fila desde los términos filtrados
+    try:
+        excel_exporter.write_rows(
+            str(excel_path),
+            "Términos TMX",
+            [(col, column_widths.get(col, 15)) for col in ordered_cols],
+            ([item.get(col) for col in ordered_cols] for item in term_rows())
+        )
+    except BaseException:
+        excel_path.unlink(missing_ok=True)
+        raise
     
     return FileResponse(
         path=excel_path,
         filename=f"terminos_tmx_{language}.xlsx",
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        background=BackgroundTask(excel_path.unlink, missing_ok=True)
     )
 
 
-async def process_extraction(job_id: str, request: ExtractionRequest):
-    """Procesar extracción de términos (background task)"""
+def open_tmx_index(tmx_id: str) -> TMXIndex:
+    """Índice de un TMX subido, o 404 (puede indexar el TMX: fuera del event loop)"""
     try:
-        jobs[job_id]["status"] = JobStatus.PROCESSING
-        jobs[job_id]["progress"] = 10
-        jobs[job_id]["message"] = "Iniciando TermSuite..."
-        
-        # Ejecutar TermSuite
-        corpus_path = file_handler.get_corpus_path(request.corpus_id)
-        output_json = file_handler.get_path("outputs", f"{job_id}.json")
-        
-        jobs[job_id]["progress"] = 30
-        jobs[job_id]["message"] = "Extrayendo términos..."
-        
-        termsuite_service.extract_terms(
-            corpus_path=str(corpus_path),
-            output_path=str(output_json),
-            language=request.language.value,
-            min_frequency=request.min_frequency
-        )
-        
-        jobs[job_id]["progress"] = 70
-        jobs[job_id]["message"] = "Procesando resultados..."
-        
-        # Cargar resultados
-        with open(output_json, 'r', encoding='utf-8') as f:
-            results = json.load(f)
-        
-        # Filtrar con TMX si se especifica
-        if request.use_tmx and request.tmx_id:
-            tmx_terms_path = file_handler.get_path("tmx", f"{request.tmx_id}_terms.json")
-            with open(tmx_terms_path, 'r', encoding='utf-8') as f:
-                tmx_data = json.load(f)
-            # Extraer lista de términos (compatible con formato antiguo y nuevo)
-            tmx_terms = tmx_data.get('terms', tmx_data) if isinstance(tmx_data, dict) else tmx_data
-            results = filter_with_tmx(results, tmx_terms)
-        
-        jobs[job_id]["progress"] = 90
-        jobs[job_id]["message"] = "Generando Excel..."
-        
-        # Exportar a Excel
-        excel_path = file_handler.get_path("outputs", f"{job_id}.xlsx")
-        excel_exporter.export(results, str(excel_path))
-        
-        jobs[job_id]["status"] = JobStatus.COMPLETED
-        jobs[job_id]["progress"] = 100
-        jobs[job_id]["message"] = "Extracción completada"
-        jobs[job_id]["result_file"] = f"{job_id}.xlsx"
-        
-    except Exception as e:
-        jobs[job_id]["status"] = JobStatus.FAILED
-        jobs[job_id]["error"] = str(e)
-        jobs[job_id]["message"] = f"Error: {str(e)}"
+        return get_tmx_index(tmx_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="TMX no encontrado")
 
 
-def filter_with_tmx(results: dict, tmx_terms: list) -> dict:
-    """Filtrar resultados marcando términos que están en TMX"""
-    tmx_set = set(term.lower() for term in tmx_terms)
+def job_status_response(job_id: str, job: dict) -> JobStatusResponse:
+    """Respuesta de estado de un trabajo"""
+    message = job.get("message", "")
     
-    if "terms" in results:
-        for term in results["terms"]:
-            term["in_tmx"] = term.get("groupingKey", "").lower() in tmx_set
+    # Informar de la posición si el trabajo espera un hueco en el pool o en la
+    # cola, o que le toque memoria
+    if job_queue is not None:
+        position = job_queue.position(job_id)
+    else:
+        position = job_executor.queue_position(job_id)
+    if position is None and job["status"] == JobStatus.PENDING:
+        position = memory_budget.position(job_id)
+    if job["status"] == JobStatus.PENDING and position:
+        message = f"{message} (posición {position})"
     
-    return results
+    return JobStatusResponse(
+        job_id=job_id,
+        status=job["status"],
+        progress=job.get("progress", 0),
+        message=message,
+        result_file=job.get("result_file"),
+        error=job.get("error"),
+        stage=job.get("stage"),
+        documents_processed=job.get("documents_processed"),
+        documents_total=job.get("documents_total"),
+        docs_per_second=job.get("docs_per_second"),
+        mb_per_second=job.get("mb_per_second"),
+        updated_at=job.get("updated_at"),
+        cached=job.get("cached"),
+        memory_mb=job.get("memory_mb"),
+        dedup=job.get("dedup")
+    )
+
+
+def get_job_store(job_id: str) -> TermStore:
+    """
+    Abrir el almacén de términos de un trabajo terminado
+
+    El almacén se sirve aunque el trabajo ya no figure en el almacén de
+    trabajos (p. ej. con JOB_STORE=memory tras un reinicio).
+    """
+    job = jobs.get(job_id)
+    if job is not None and job["status"] != JobStatus.COMPLETED:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El trabajo está en estado: {job['status']}"
+        )
+
+    store_dir = file_handler.get_path("outputs", f"{job_id}.terms")
+    if not TermStore.exists(store_dir):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    retention.touch(f"job/{job_id}")
+    return TermStore(store_dir)
+
+
+def _encode_cursor(query: dict) -> str:
+    data = json.dumps(query, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor: str) -> dict:
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        query = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        TermSort(query["sort_by"])
+        SortOrder(query["sort_order"])
+        if not isinstance(query["offset"], int) or query["offset"] < 0:
+            raise ValueError(query["offset"])
+        for name, bounds in query["filters"].items():
+            if name not in ('freq', 'dfreq', 'spec', 'in_tmx') or len(bounds) != 2:
+                raise ValueError(name)
+        if not isinstance(query.get("contains") or '', str):
+            raise ValueError(query["contains"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor no válido")
+    return query
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from enum import Enum
 
 
@@ -19,6 +19,23 @@ class Language(str, Enum):
     PT = "pt"
 
 
+class TermSort(str, Enum):
+    FREQUENCY = "frequency"
+    SPECIFICITY = "specificity"
+    DOC_FREQUENCY = "doc_frequency"
+    ALPHABETICAL = "alphabetical"
+
+
+class SortOrder(str, Enum):
+    ASC = "asc"
+    DESC = "desc"
+
+
+class UploadFileType(str, Enum):
+    TMX = "tmx"
+    CORPUS = "corpus"
+
+
 class ExtractionRequest(BaseModel):
     corpus_id: str = Field(..., description="ID del corpus subido")
     language: Language = Field(..., description="Idioma del corpus")
@@ -26,6 +43,14 @@ class ExtractionRequest(BaseModel):
     max_terms: Optional[int] = Field(default=None, description="Número máximo de términos")
     use_tmx: bool = Field(default=False, description="Usar memoria TMX para filtrado")
     tmx_id: Optional[str] = Field(default=None, description="ID de la memoria TMX")
+    dedup: Optional[bool] = Field(
+        default=None,
+        description="Eliminar documentos duplicados y casi duplicados antes de extraer (por defecto CORPUS_DEDUP)"
+    )
+    dedup_threshold: Optional[float] = Field(
+        default=None, ge=0.5, le=1.0,
+        description="Similitud estimada a partir de la cual dos documentos son casi duplicados (por defecto DEDUP_THRESHOLD)"
+    )
 
 
 class ExtractionResponse(BaseModel):
@@ -41,6 +66,15 @@ class JobStatusResponse(BaseModel):
     message: str
     result_file: Optional[str] = None
     error: Optional[str] = None
+    stage: Optional[str] = None
+    documents_processed: Optional[int] = None
+    documents_total: Optional[int] = None
+    docs_per_second: Optional[float] = None
+    mb_per_second: Optional[float] = None
+    updated_at: Optional[str] = None
+    cached: Optional[bool] = None
+    memory_mb: Optional[int] = None
+    dedup: Optional[Dict[str, Any]] = None
 
 
 class UploadResponse(BaseModel):
@@ -48,6 +82,38 @@ class UploadResponse(BaseModel):
     filename: str
     size: int
     message: str
+    sha256: Optional[str] = None
+    format: Optional[str] = None
+    deduplicated: Optional[bool] = None
+    ingest_status: Optional[str] = None
+
+
+class UploadSessionRequest(BaseModel):
+    file_type: UploadFileType = Field(..., description="Tipo de archivo (tmx o corpus)")
+    filename: str = Field(..., description="Nombre original (.tmx, .txt o .zip)")
+    size: int = Field(..., gt=0, description="Tamaño total en bytes")
+    chunk_size: Optional[int] = Field(default=None, description="Bytes por bloque (todos menos el último)")
+    sha256: Optional[str] = Field(default=None, description="SHA-256 del archivo completo (se comprueba al finalizar)")
+
+
+class UploadSessionResponse(BaseModel):
+    upload_id: str
+    file_type: UploadFileType
+    filename: str
+    size: int
+    chunk_size: int
+    chunks: int
+    received: List[int]
+    received_bytes: int
+    status: str
+    expires_at: float
+
+
+class UploadChunkResponse(BaseModel):
+    upload_id: str
+    index: int
+    size: int
+    sha256: str
 
 
 class TermEntry(BaseModel):
@@ -57,3 +123,24 @@ class TermEntry(BaseModel):
     specificity: float
     pattern: str
     in_tmx: bool = False
+
+
+class TermPage(BaseModel):
+    job_id: str
+    total: int
+    offset: int
+    limit: int
+    sort_by: TermSort
+    sort_order: SortOrder
+    next_cursor: Optional[str] = None
+    terms: List[TermEntry]
+
+
+class Suggestion(BaseModel):
+    term: str
+    frequency: int
+
+
+class AutocompleteResponse(BaseModel):
+    query: str
+    suggestions: List[Suggestion]
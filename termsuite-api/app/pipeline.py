@@ -0,0 +1,280 @@
+import json
+import os
+import threading
+
+from app.models import ExtractionRequest, JobStatus
+from app.services.termsuite import TermSuiteService
+from app.services.tmx_parser import TMXParser
+from app.services.tmx_index import TMXIndex
+from app.services.term_store import TermStore
+from app.services.excel_export import ExcelExporter
+from app.services.job_store import create_job_store, job_db_path
+from app.services.admission import MemoryBudget, ReservationCancelled
+from app.services.dedup import CorpusDeduplicator, job_summary
+from app.services.retention import RetentionService
+from app.services.result_cache import ResultCache
+from app.utils.file_handler import FileHandler
+from app.utils.terms import term_label
+
+
+# Servicios compartidos por la API y los workers (app.worker)
+file_handler = FileHandler()
+tmx_parser = TMXParser()
+excel_exporter = ExcelExporter()
+result_cache = ResultCache(file_handler.cache_dir)
+deduplicator = CorpusDeduplicator()
+
+# Estado de trabajos (SQLite compartido por todos los procesos; ver JOB_STORE)
+jobs = create_job_store(file_handler.data_dir)
+
+# Presupuesto de memoria de las JVM en el host (común a la API y los workers)
+memory_budget = MemoryBudget(job_db_path(file_handler.data_dir))
+termsuite_service = TermSuiteService(memory_budget)
+
+# Índice de artefactos del directorio de datos (TTLs y presupuesto de disco)
+retention = RetentionService(job_db_path(file_handler.data_dir), file_handler, jobs)
+
+# Dónde se ejecutan las extracciones: local (hilos de la API) o queue (app.worker)
+JOB_RUNNER = os.getenv('JOB_RUNNER', 'local').lower()
+
+
+class ExtractionCancelled(Exception):
+    """El trabajo se canceló (p. ej. el worker perdió su alquiler en la cola)"""
+
+
+def process_extraction(job_id: str, request: ExtractionRequest, cancel: threading.Event = None) -> bool:
+    """
+    Procesar extracción de términos (en un hilo del JobExecutor o en un worker)
+
+    Args:
+        job_id: ID del trabajo
+        request: Parámetros de la extracción
+        cancel: Evento opcional; si se activa se matan las JVM, se para en la
+            siguiente etapa y no se escribe el estado final (el trabajo ya no
+            es de este proceso)
+
+    Returns:
+        False si se canceló antes de terminar
+    """
+    cancel = cancel or threading.Event()
+
+    def checkpoint():
+        if cancel.is_set():
+            raise ExtractionCancelled(job_id)
+
+    def on_progress(snapshot: dict):
+        if not cancel.is_set():
+            jobs.update(job_id, **snapshot)
+
+    try:
+        # Ejecutar TermSuite
+        corpus_path = file_handler.get_corpus_path(request.corpus_id)
+        output_json = file_handler.get_path("outputs", f"{job_id}.json")
+        document_hashes = file_handler.document_hashes(request.corpus_id)
+        
+        # Quitar duplicados exactos y casi duplicados: la JVM solo ve
+        # documentos distintos
+        if deduplicator.enabled(request.dedup):
+            corpus_path, document_hashes = deduplicate_corpus(job_id, request, corpus_path)
+        checkpoint()
+        
+        # Mismo corpus, parámetros y JAR: reutilizar el resultado anterior
+        cache_key = None
+        if result_cache.enabled:
+            cache_key = result_cache.key(
+                corpus_path,
+                {
+                    "language": request.language.value,
+                    "min_frequency": request.min_frequency,
+                    "shards": termsuite_service.max_shards
+                },
+                termsuite_service.jar_path,
+                document_hashes=document_hashes
+            )
+        
+        if cache_key and result_cache.get(cache_key, output_json):
+            jobs.update(
+                job_id,
+                status=JobStatus.PROCESSING,
+                progress=30,
+                cached=True,
+                message="Resultado recuperado de caché"
+            )
+        else:
+            # Reservar el heap de las JVM antes de arrancarlas; si no cabe en
+            # el presupuesto del host, el trabajo sigue en cola
+            jvms, heap_mb = termsuite_service.memory_plan(str(corpus_path), request.language.value)
+            with memory_budget.reserve(
+                job_id,
+                jvms * heap_mb,
+                on_wait=lambda: jobs.update(
+                    job_id, message=f"Esperando memoria ({jvms * heap_mb} MB)"
+                ),
+                cancel=cancel.is_set
+            ) as reserved_mb:
+                checkpoint()
+                jobs.update(
+                    job_id,
+                    status=JobStatus.PROCESSING,
+                    progress=30,
+                    memory_mb=reserved_mb,
+                    message="Extrayendo términos..."
+                )
+                
+                # El progreso real (documentos, etapas) llega desde los logs de TermSuite
+                termsuite_service.extract_terms(
+                    corpus_path=str(corpus_path),
+                    output_path=str(output_json),
+                    language=request.language.value,
+                    min_frequency=request.min_frequency,
+                    on_progress=on_progress,
+                    heap_mb=min(heap_mb, reserved_mb // jvms),
+                    cancel=cancel
+                )
+            if cache_key:
+                result_cache.put(cache_key, output_json)
+            
+            prepared = termsuite_service.prepared_path(str(corpus_path), request.language.value)
+            retention.record(f"corpus/{request.corpus_id}", 'prepared', prepared)
+        
+        checkpoint()
+        jobs.update(
+            job_id,
+            progress=70,
+            stage="Procesando resultados",
+            message="Procesando resultados..."
+        )
+        
+        # Cargar resultados
+        with open(output_json, 'r', encoding='utf-8') as f:
+            results = json.load(f)
+        
+        # Filtrar con TMX si se especifica
+        if request.use_tmx and request.tmx_id:
+            index = get_tmx_index(request.tmx_id)
+            # Idioma activo del TMX o, si no se eligió, el del corpus
+            tmx_terms = index.terms(index.language or request.language.value)
+            results = filter_with_tmx(results, tmx_terms)
+        
+        # Almacén columnar: las lecturas posteriores no vuelven a parsear el JSON
+        store = TermStore.build(results, file_handler.get_path("outputs", f"{job_id}.terms"))
+        del results
+        output_json.unlink()
+        
+        checkpoint()
+        jobs.update(
+            job_id,
+            progress=90,
+            stage="Generando Excel",
+            message="Generando Excel..."
+        )
+        
+        # Exportar a Excel
+        excel_path = file_handler.get_path("outputs", f"{job_id}.xlsx")
+        excel_exporter.export_store(store, str(excel_path))
+        
+        retention.record(f"job/{job_id}", 'terms', store.store_dir)
+        retention.record(f"job/{job_id}", 'excel', excel_path)
+        
+        checkpoint()
+        jobs.update(
+            job_id,
+            status=JobStatus.COMPLETED,
+            progress=100,
+            message="Extracción completada",
+            result_file=f"{job_id}.xlsx"
+        )
+        
+    except (ExtractionCancelled, ReservationCancelled):
+        return False
+    except Exception as e:
+        # Un error provocado por la cancelación (JVM matada) no es del trabajo
+        if cancel.is_set():
+            return False
+        jobs.update(
+            job_id,
+            status=JobStatus.FAILED,
+            error=str(e),
+            message=f"Error: {str(e)}"
+        )
+    return True
+
+
+def deduplicate_corpus(job_id: str, request: ExtractionRequest, corpus_path):
+    """
+    Etapa de eliminación de duplicados de una extracción
+    
+    Returns:
+        (directorio a extraer, SHA-256 de los documentos conservados)
+    """
+    jobs.update(
+        job_id,
+        status=JobStatus.PROCESSING,
+        progress=10,
+        stage="Eliminando duplicados",
+        message="Buscando documentos duplicados..."
+    )
+    dedup_path, report = deduplicator.deduplicate(
+        corpus_path,
+        request.dedup_threshold,
+        on_progress=lambda done, total: jobs.update(
+            job_id, documents_processed=done, documents_total=total
+        )
+    )
+    
+    owner = f"corpus/{request.corpus_id}"
+    retention.record(owner, 'dedup', deduplicator.report_path(corpus_path, request.dedup_threshold))
+    if dedup_path != corpus_path:
+        retention.record(owner, 'dedup', dedup_path)
+    
+    removed = report["exact_duplicates"] + report["near_duplicates"]
+    jobs.update(
+        job_id,
+        dedup=job_summary(report),
+        message=f"{removed} documentos duplicados de {report['documents']} eliminados"
+    )
+    return dedup_path, report["kept_sha256"]
+
+
+def get_tmx_index(tmx_id: str) -> TMXIndex:
+    """
+    Abrir el índice de un TMX subido
+    
+    Las memorias subidas antes de existir el índice se indexan una vez
+    desde el .tmx original, conservando el idioma de su {tmx_id}_terms.json
+    (un parseo completo: desde la API, llamar fuera del event loop).
+    
+    Raises:
+        FileNotFoundError: Si el TMX no existe
+    """
+    index_dir = file_handler.get_path("tmx", f"{tmx_id}.index")
+    if TMXIndex.exists(index_dir):
+        retention.touch(f"tmx/{tmx_id}")
+        return TMXIndex(index_dir)
+    
+    tmx_path = file_handler.get_path("tmx", f"{tmx_id}.tmx")
+    if not tmx_path.exists():
+        raise FileNotFoundError("TMX no encontrado")
+    
+    language = None
+    legacy_terms_path = file_handler.get_path("tmx", f"{tmx_id}_terms.json")
+    if legacy_terms_path.exists():
+        with open(legacy_terms_path, 'r', encoding='utf-8') as f:
+            legacy_data = json.load(f)
+        if isinstance(legacy_data, dict):
+            language = legacy_data.get('language')
+    
+    index = TMXIndex.build(tmx_path, index_dir, tmx_parser, language=language)
+    retention.record(f"tmx/{tmx_id}", 'tmx_index', index_dir)
+    return index
+
+
+def filter_with_tmx(results: dict, tmx_terms: list) -> dict:
+    """Filtrar resultados marcando términos que están en TMX"""
+    tmx_set = set(term.lower() for term in tmx_terms)
+    
+    if "terms" in results:
+        for term in results["terms"]:
+            term["in_tmx"] = term_label(term).lower() in tmx_set
+    
+    return results
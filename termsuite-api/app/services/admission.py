@@ -0,0 +1,307 @@
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+# Recursos de idioma más pesados (diccionarios de compuestos, morfología)
+LANGUAGE_HEAP_FACTORS = {
+    'de': 1.3,
+    'ru': 1.3,
+    'zh': 1.2
+}
+
+# Granularidad de los -Xmx calculados
+HEAP_STEP_MB = 256
+
+
+def parse_heap_mb(java_opts: List[str], flag: str = '-Xmx') -> Optional[int]:
+    """
+    Tamaño en MB de una opción de memoria de la JVM (-Xmx4g, -Xms512m...)
+
+    Returns:
+        MB, o None si la opción no aparece
+    """
+    units = {'': 1 / (1024 * 1024), 'k': 1 / 1024, 'm': 1, 'g': 1024, 't': 1024 * 1024}
+    for opt in reversed(java_opts):
+        match = re.fullmatch(rf'{flag}(\d+)([kmgt]?)', opt, re.IGNORECASE)
+        if match:
+            return int(int(match.group(1)) * units[match.group(2).lower()])
+    return None
+
+
+def with_heap(java_opts: List[str], heap_mb: int) -> List[str]:
+    """Opciones de la JVM con -Xmx{heap_mb}m (y -Xms que no lo supere)"""
+    opts = [opt for opt in java_opts if not opt.startswith('-Xmx')]
+    initial = parse_heap_mb(opts, '-Xms')
+    if initial is not None and initial > heap_mb:
+        opts = [opt for opt in opts if not opt.startswith('-Xms')] + [f'-Xms{heap_mb}m']
+    return opts + [f'-Xmx{heap_mb}m']
+
+
+def estimate_heap_mb(corpus_bytes: int, documents: int, language: str, max_mb: int) -> int:
+    """
+    Heap de la JVM para extraer un corpus
+
+    TermSuite mantiene en memoria las ocurrencias de todo el corpus, así que
+    el heap crece con el texto; cada documento añade además su CAS y sus
+    anotaciones. Los coeficientes (JVM_HEAP_BASE_MB, JVM_HEAP_PER_CORPUS_MB,
+    JVM_HEAP_PER_DOCUMENT_MB) se ajustan por entorno.
+
+    Args:
+        corpus_bytes: Bytes de texto del corpus (o del fragmento)
+        documents: Número de documentos
+        language: Idioma del corpus
+        max_mb: Tope (el -Xmx de JAVA_OPTS)
+
+    Returns:
+        MB de heap, redondeados a HEAP_STEP_MB
+    """
+    base = float(os.getenv('JVM_HEAP_BASE_MB', '768'))
+    per_mb = float(os.getenv('JVM_HEAP_PER_CORPUS_MB', '40'))
+    per_document = float(os.getenv('JVM_HEAP_PER_DOCUMENT_MB', '0.05'))
+    minimum = int(os.getenv('JVM_HEAP_MIN_MB', '1024'))
+
+    needed = base + (per_mb * corpus_bytes / (1024 * 1024) + per_document * documents) \
+        * LANGUAGE_HEAP_FACTORS.get(language, 1.0)
+    needed = -(-int(needed) // HEAP_STEP_MB) * HEAP_STEP_MB
+    return max(min(needed, max_mb), min(minimum, max_mb))
+
+
+def host_memory_mb() -> Optional[int]:
+    """Memoria del contenedor (límite del cgroup) o, si no hay, del host"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            value = Path(path).read_text().strip()
+        except OSError:
+            continue
+        # 'max' o un valor enorme: sin límite
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value) // (1024 * 1024)
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+def default_budget_mb() -> int:
+    """
+    Presupuesto de memoria para las JVM: JVM_MEMORY_BUDGET_MB o, si no se
+    indica, el 75% de la memoria del contenedor (0 = sin control)
+    """
+    configured = os.getenv('JVM_MEMORY_BUDGET_MB')
+    if configured:
+        return int(configured)
+    total = host_memory_mb()
+    return int(total * 0.75) if total else 0
+
+
+class ReservationCancelled(Exception):
+    """Se abandonó la espera de una reserva de memoria (ver MemoryBudget.reserve)"""
+
+
+class MemoryBudget:
+    """
+    Control de admisión de extracciones por memoria
+
+    Cada extracción reserva los MB de heap de sus JVM antes de arrancarlas
+    y solo entra si la suma de lo reservado cabe en el presupuesto del
+    host; las demás esperan por orden de llegada (la primera de la cola
+    entra antes que otra más pequeña, para que las grandes no esperen
+    siempre). Las reservas viven en la base SQLite de trabajos, así que el
+    presupuesto es común a la API y a todos los workers del host. Cada
+    proceso renueva el alquiler de sus reservas; las de un proceso muerto
+    caducan a los `lease` segundos.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS memory_reservations (
+            job_id TEXT PRIMARY KEY,
+            memory_mb INTEGER NOT NULL,
+            admitted INTEGER NOT NULL DEFAULT 0,
+            requested_at REAL NOT NULL,
+            owner TEXT NOT NULL,
+            lease_expires REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS memory_reservations_requested ON memory_reservations (admitted, requested_at)"
+    )
+
+    def __init__(self, db_path: Path, budget_mb: int = None, lease: float = 60, poll_interval: float = 1.0):
+        self.db_path = Path(db_path)
+        self.budget_mb = default_budget_mb() if budget_mb is None else budget_mb
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._mine: Dict[str, int] = {}
+        self._renewer: Optional[threading.Thread] = None
+
+        if self.enabled:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = self._conn()
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                for statement in self.SCHEMA:
+                    conn.execute(statement)
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget_mb > 0
+
+    @contextmanager
+    def reserve(
+        self,
+        job_id: str,
+        memory_mb: int,
+        on_wait: Callable[[], None] = None,
+        cancel: Callable[[], bool] = None
+    ) -> Iterator[int]:
+        """
+        Reservar memoria durante el bloque (espera hasta que quepa)
+
+        Args:
+            job_id: ID del trabajo
+            memory_mb: MB de heap de todas sus JVM
+            on_wait: Callback opcional, una vez, si hay que esperar
+            cancel: Callback opcional; si devuelve True durante la espera se
+                abandona la reserva con ReservationCancelled
+
+        Yields:
+            MB reservados (como mucho el presupuesto entero)
+        """
+        # Sin memoria que reservar (p. ej. trabajos servidos por el pool de
+        # JVMs) no se hace cola: esperar detrás de otros no liberaría nada
+        if not self.enabled or memory_mb <= 0:
+            yield memory_mb
+            return
+
+        memory_mb = min(memory_mb, self.budget_mb)
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO memory_reservations "
+                "(job_id, memory_mb, admitted, requested_at, owner, lease_expires) VALUES (?, ?, 0, ?, ?, ?)",
+                (job_id, memory_mb, now, self.owner, now + self.lease)
+            )
+        with self._cond:
+            self._mine[job_id] = memory_mb
+            if self._renewer is None:
+                self._start_renewer()
+
+        try:
+            waited = False
+            while not self._try_admit(job_id, memory_mb):
+                if not waited and on_wait:
+                    on_wait()
+                waited = True
+                if cancel and cancel():
+                    raise ReservationCancelled(job_id)
+                with self._cond:
+                    self._cond.wait(self.poll_interval)
+            yield memory_mb
+        finally:
+            with self._cond:
+                self._mine.pop(job_id, None)
+            with self._conn() as conn:
+                conn.execute("DELETE FROM memory_reservations WHERE job_id = ?", (job_id,))
+            with self._cond:
+                self._cond.notify_all()
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Posición en la espera de memoria (1 = la siguiente), o None si no espera"""
+        if not self.enabled:
+            return None
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT requested_at FROM memory_reservations WHERE job_id = ? AND admitted = 0",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        ahead = conn.execute(
+            "SELECT COUNT(*) FROM memory_reservations "
+            "WHERE admitted = 0 AND requested_at < ? AND lease_expires >= ?",
+            (row[0], time.time())
+        ).fetchone()[0]
+        return ahead + 1
+
+    def stats(self) -> Dict:
+        """Presupuesto, memoria reservada y trabajos esperando"""
+        if not self.enabled:
+            return {"budget_mb": 0}
+        reserved, running, waiting = self._conn().execute(
+            "SELECT COALESCE(SUM(CASE WHEN admitted THEN memory_mb END), 0), "
+            "COALESCE(SUM(admitted), 0), COALESCE(SUM(1 - admitted), 0) "
+            "FROM memory_reservations WHERE lease_expires >= ?",
+            (time.time(),)
+        ).fetchone()
+        return {
+            "budget_mb": self.budget_mb,
+            "reserved_mb": reserved,
+            "running": running,
+            "waiting": waiting
+        }
+
+    def _try_admit(self, job_id: str, memory_mb: int) -> bool:
+        """Admitir si es la primera en espera y cabe en el presupuesto"""
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM memory_reservations WHERE lease_expires < ?", (now,))
+            head = conn.execute(
+                "SELECT job_id FROM memory_reservations WHERE admitted = 0 "
+                "ORDER BY requested_at LIMIT 1"
+            ).fetchone()
+            if head is None or head[0] != job_id:
+                return False
+            reserved = conn.execute(
+                "SELECT COALESCE(SUM(memory_mb), 0) FROM memory_reservations WHERE admitted = 1"
+            ).fetchone()[0]
+            if reserved + memory_mb > self.budget_mb:
+                return False
+            conn.execute(
+                "UPDATE memory_reservations SET admitted = 1 WHERE job_id = ?", (job_id,)
+            )
+        return True
+
+    def _start_renewer(self):
+        """Hilo que renueva el alquiler de las reservas de este proceso"""
+        def run():
+            while True:
+                time.sleep(self.lease / 3)
+                with self._cond:
+                    job_ids = list(self._mine)
+                if not job_ids:
+                    continue
+                with self._conn() as conn:
+                    conn.executemany(
+                        "UPDATE memory_reservations SET lease_expires = ? WHERE job_id = ? AND owner = ?",
+                        [(time.time() + self.lease, job_id, self.owner) for job_id in job_ids]
+                    )
+
+        self._renewer = threading.Thread(target=run, name='memory-budget-lease', daemon=True)
+        self._renewer.start()
+
+    def _conn(self) -> sqlite3.Connection:
+        """Conexión propia de cada hilo"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
@@ -0,0 +1,345 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.minhash import MINHASH_SEED, document_signature
+from app.services.sharding import list_documents
+from app.utils.blob_store import link_or_copy
+
+
+logger = logging.getLogger(__name__)
+
+# Con menos documentos las firmas se calculan en el propio hilo
+POOL_MIN_DOCUMENTS = 64
+
+# Duplicados que se guardan en el estado del trabajo (el informe completo
+# está en disco, ver GET /api/jobs/{job_id}/dedup)
+JOB_REPORT_SAMPLE = 20
+
+
+def lsh_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Bandas y filas por banda del LSH para un umbral de similitud
+
+    Dos documentos con similitud s coinciden en alguna banda con
+    probabilidad 1 - (1 - s^filas)^bandas; el umbral del esquema es
+    aproximadamente (1/bandas)^(1/filas). Se elige el mayor que no supere
+    `threshold` (mejor un candidato de más, que se verifica, que perder
+    un duplicado).
+
+    Returns:
+        (bandas, filas)
+    """
+    options = []
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows == 0:
+            bands = num_perm // rows
+            options.append(((1 / bands) ** (1 / rows), bands, rows))
+    below = [option for option in options if option[0] <= threshold]
+    _, bands, rows = max(below) if below else min(options)
+    return bands, rows
+
+
+def job_summary(report: Dict) -> Dict:
+    """Resumen del informe para el estado del trabajo (con una muestra de eliminados)"""
+    summary = {key: value for key, value in report.items() if key not in ('removed', 'kept_sha256')}
+    summary["removed"] = report["removed"][:JOB_REPORT_SAMPLE]
+    summary["removed_truncated"] = len(report["removed"]) > JOB_REPORT_SAMPLE
+    return summary
+
+
+class CorpusDeduplicator:
+    """
+    Eliminación de documentos duplicados antes de la extracción
+
+    Los corpus de clientes traen a menudo muchas copias del mismo texto
+    (avisos legales, plantillas): TermSuite las etiqueta y cuenta todas, lo
+    que alarga la extracción y sesga las frecuencias. Antes de lanzar la
+    JVM se calculan, en un pool de procesos (el mismo para todos los
+    trabajos, creado al primer uso), el SHA-256 y una firma MinHash de
+    cada documento (app.services.minhash):
+
+    - Duplicados exactos: mismo SHA-256.
+    - Casi duplicados: candidatos por LSH (bandas de la firma) y verificados
+      con la similitud estimada (fracción de la firma que coincide) contra
+      el umbral.
+
+    Se conserva el primer documento de cada grupo (orden de
+    list_documents). Los conservados se enlazan (hardlink) en
+    `corpus/{id}.dedup-{clave}/` y el informe queda en
+    `corpus/{id}.dedup-{clave}.json`; ambos se reutilizan en las
+    extracciones siguientes con los mismos parámetros (y con ellos su
+    preprocesado). Si no sobra ningún documento se sigue usando el corpus
+    original.
+
+    Parámetros por entorno: CORPUS_DEDUP (true = eliminar duplicados en las
+    extracciones que no indiquen dedup; por defecto false), DEDUP_THRESHOLD,
+    DEDUP_NUM_PERM, DEDUP_SHINGLE_WORDS y DEDUP_WORKERS procesos.
+    """
+
+    def __init__(
+        self,
+        threshold: float = None,
+        num_perm: int = None,
+        shingle_words: int = None,
+        workers: int = None
+    ):
+        self.default_enabled = os.getenv('CORPUS_DEDUP', 'false').lower() == 'true'
+        if threshold is None:
+            threshold = float(os.getenv('DEDUP_THRESHOLD', '0.9'))
+        self.threshold = threshold
+        self.num_perm = num_perm or int(os.getenv('DEDUP_NUM_PERM', '128'))
+        self.shingle_words = shingle_words or int(os.getenv('DEDUP_SHINGLE_WORDS', '5'))
+        self.workers = workers or int(os.getenv('DEDUP_WORKERS', str(os.cpu_count() or 1)))
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def enabled(self, requested: Optional[bool]) -> bool:
+        """Si una extracción elimina duplicados (None = valor por defecto)"""
+        return self.default_enabled if requested is None else requested
+
+    def key(self, threshold: float) -> str:
+        """Clave de los parámetros (nombra el corpus sin duplicados)"""
+        params = f"{threshold:.4f}-{self.num_perm}-{self.shingle_words}-{MINHASH_SEED}"
+        return hashlib.sha1(params.encode('ascii')).hexdigest()[:10]
+
+    def report_path(self, corpus_path: Path, threshold: float = None) -> Path:
+        corpus_path = Path(corpus_path)
+        key = self.key(self.threshold if threshold is None else threshold)
+        return corpus_path.with_name(f"{corpus_path.name}.dedup-{key}.json")
+
+    def deduplicate(
+        self,
+        corpus_path: Path,
+        threshold: float = None,
+        on_progress: Callable[[int, int], None] = None
+    ) -> Tuple[Path, Dict]:
+        """
+        Corpus sin duplicados
+
+        Args:
+            corpus_path: Directorio del corpus
+            threshold: Similitud a partir de la cual dos documentos son
+                casi duplicados (None = DEDUP_THRESHOLD)
+            on_progress: Callback opcional (documentos firmados, total)
+
+        Returns:
+            (directorio a extraer, informe): documents, kept,
+            exact_duplicates, near_duplicates, bytes_in, bytes_kept,
+            removed (document, duplicate_of, kind, similarity), kept_sha256,
+            parámetros y seconds
+        """
+        corpus_path = Path(corpus_path)
+        if threshold is None:
+            threshold = self.threshold
+        report_path = self.report_path(corpus_path, threshold)
+        target = report_path.with_suffix('')
+
+        with self._lock(str(target)):
+            cached = self._load(report_path, target, corpus_path)
+            if cached is not None:
+                return cached
+
+            report = self._analyze(corpus_path, threshold, on_progress)
+            if report["removed"]:
+                self._link_kept(corpus_path, target, report)
+            _write_json(report_path, report)
+            return (target if report["removed"] else corpus_path), report
+
+    def _analyze(
+        self,
+        corpus_path: Path,
+        threshold: float,
+        on_progress: Callable[[int, int], None] = None
+    ) -> Dict:
+        started = time.time()
+        documents = list_documents(corpus_path)
+        signatures = self._signatures(documents, on_progress)
+        bands, rows = lsh_bands(self.num_perm, threshold)
+
+        names = [str(path.relative_to(corpus_path)) for path in documents]
+        kept: List[int] = []
+        removed: List[Dict] = []
+        by_hash: Dict[str, int] = {}
+        buckets: Dict[Tuple[int, bytes], List[int]] = {}
+
+        for i, (sha256, _, signature) in enumerate(signatures):
+            if sha256 in by_hash:
+                removed.append({
+                    "document": names[i],
+                    "duplicate_of": names[by_hash[sha256]],
+                    "kind": "exact",
+                    "similarity": 1.0
+                })
+                continue
+            by_hash[sha256] = i
+
+            match = None
+            if signature is not None:
+                keys = [
+                    (band, signature[band * rows:(band + 1) * rows].tobytes())
+                    for band in range(bands)
+                ]
+                candidates = {j for key in keys for j in buckets.get(key, ())}
+                best = 0.0
+                for j in candidates:
+                    similarity = float(np.mean(signatures[j][2] == signature))
+                    if similarity >= threshold and similarity > best:
+                        match, best = j, similarity
+                if match is None:
+                    for key in keys:
+                        buckets.setdefault(key, []).append(i)
+            if match is not None:
+                removed.append({
+                    "document": names[i],
+                    "duplicate_of": names[match],
+                    "kind": "near",
+                    "similarity": round(best, 4)
+                })
+                continue
+            kept.append(i)
+
+        return {
+            "threshold": threshold,
+            "num_perm": self.num_perm,
+            "bands": bands,
+            "rows": rows,
+            "shingle_words": self.shingle_words,
+            "key": self.key(threshold),
+            "documents": len(documents),
+            "kept": len(kept),
+            "exact_duplicates": sum(1 for r in removed if r["kind"] == "exact"),
+            "near_duplicates": sum(1 for r in removed if r["kind"] == "near"),
+            "bytes_in": sum(s[1] for s in signatures),
+            "bytes_kept": sum(signatures[i][1] for i in kept),
+            "seconds": round(time.time() - started, 3),
+            "removed": removed,
+            "kept_sha256": [signatures[i][0] for i in kept]
+        }
+
+    def _signatures(
+        self,
+        documents: List[Path],
+        on_progress: Callable[[int, int], None] = None
+    ) -> List[Tuple[str, int, Optional[np.ndarray]]]:
+        """Firmas de todos los documentos, en su orden (en paralelo si son muchos)"""
+        total = len(documents)
+        args = [str(path) for path in documents]
+        results = []
+
+        if total < POOL_MIN_DOCUMENTS or self.workers <= 1:
+            for path in args:
+                results.append(document_signature(path, self.num_perm, self.shingle_words))
+                if on_progress:
+                    on_progress(len(results), total)
+            return results
+
+        pool = self._get_pool()
+        try:
+            signatures = pool.map(
+                document_signature,
+                args,
+                [self.num_perm] * total,
+                [self.shingle_words] * total,
+                chunksize=max(1, min(64, total // (self.workers * 4)))
+            )
+            for result in signatures:
+                results.append(result)
+                if on_progress and (len(results) % 100 == 0 or len(results) == total):
+                    on_progress(len(results), total)
+        except BrokenProcessPool:
+            # Un proceso murió (p. ej. sin memoria): el próximo trabajo crea otro pool
+            with self._pool_lock:
+                if self._pool is pool:
+                    self._pool = None
+            pool.shutdown(wait=False)
+            raise
+        return results
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Pool de procesos compartido por todos los trabajos"""
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: el proceso padre tiene hilos (pool de trabajos,
+                # SQLite) y un fork podría heredar un lock tomado
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def shutdown(self):
+        """Cerrar el pool de procesos (al parar la API o el worker)"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _link_kept(self, corpus_path: Path, target: Path, report: Dict):
+        """
+        Enlazar los documentos conservados en el directorio sin duplicados
+
+        Un directorio que ya existe no se sustituye: otro trabajo puede
+        estar extrayendo de él y, con el mismo corpus y parámetros, su
+        contenido es el mismo.
+        """
+        if target.is_dir():
+            return
+        removed = {r["document"] for r in report["removed"]}
+        work_dir = target.with_name(f"{target.name}.{uuid.uuid4().hex[:8]}.part")
+        try:
+            for path in list_documents(corpus_path):
+                name = str(path.relative_to(corpus_path))
+                if name in removed:
+                    continue
+                link = work_dir / name
+                link.parent.mkdir(parents=True, exist_ok=True)
+                link_or_copy(path, link)
+            try:
+                os.replace(work_dir, target)
+            except OSError:
+                # Otro proceso lo creó mientras tanto
+                if not target.is_dir():
+                    raise
+                shutil.rmtree(work_dir, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+
+    def _load(self, report_path: Path, target: Path, corpus_path: Path) -> Optional[Tuple[Path, Dict]]:
+        """Informe y corpus de una ejecución anterior con los mismos parámetros"""
+        try:
+            with open(report_path, 'r', encoding='utf-8') as f:
+                report = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if not report["removed"]:
+            return corpus_path, report
+        if target.is_dir():
+            return target, report
+        return None
+
+    def _lock(self, name: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(name, threading.Lock())
+
+
+def _write_json(path: Path, data: Dict):
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
@@ -1,100 +1,143 @@
-import pandas as pd
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils.dataframe import dataframe_to_rows
-from typing import Dict, List
-from pathlib import Path
+from openpyxl.utils import get_column_letter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from app.services.term_store import TermStore
+from app.utils.terms import term_label, term_value, term_words
+
+
+# Columnas del Excel de resultados de TermSuite: (encabezado, ancho)
+TERM_COLUMNS = [
+    ('Término', 40),
+    ('Patrón', 20),
+    ('Frecuencia', 12),
+    ('Frec. Documentos', 18),
+    ('Especificidad', 15),
+    ('En TMX', 10),
+    ('Palabras', 30)
+]
 
 
 class ExcelExporter:
     """Exportador de términos a Excel con formato"""
-    
+
+    # Estilos compartidos por todos los libros (se crean una sola vez)
+    HEADER_FILL = PatternFill(
+        start_color="366092",
+        end_color="366092",
+        fill_type="solid"
+    )
+    HEADER_FONT = Font(color="FFFFFF", bold=True, size=11)
+    HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='center')
+
     def export(self, results: Dict, output_path: str):
         """
         Exportar resultados de TermSuite a Excel
-        
+
         Args:
             results: Diccionario con resultados de TermSuite
             output_path: Ruta del archivo Excel de salida
         """
         # Extraer términos
         terms = results.get('terms', [])
-        
+
         if not terms:
             raise ValueError("No hay términos para exportar")
-        
-        # Convertir a DataFrame
-        df = self._prepare_dataframe(terms)
-        
-        # Crear Excel con formato
-        self._create_formatted_excel(df, output_path)
-    
-    def _prepare_dataframe(self, terms: List[Dict]) -> pd.DataFrame:
-        """Preparar DataFrame desde términos de TermSuite"""
-        data = []
-        
-        for term in terms:
-            row = {
-                'Término': term.get('groupingKey', ''),
-                'Patrón': term.get('pattern', ''),
-                'Frecuencia': term.get('frequency', 0),
-                'Frec. Documentos': term.get('documentFrequency', 0),
-                'Especificidad': round(term.get('specificity', 0), 4),
-                'En TMX': 'Sí' if term.get('in_tmx', False) else 'No',
-                'Palabras': term.get('words', '')
-            }
-            data.append(row)
-        
-        df = pd.DataFrame(data)
-        
-        # Ordenar por frecuencia descendente
-        df = df.sort_values('Frecuencia', ascending=False)
-        
-        return df
-    
-    def _create_formatted_excel(self, df: pd.DataFrame, output_path: str):
-        """Crear Excel con formato profesional"""
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Términos Extraídos"
-        
-        # Estilos
-        header_fill = PatternFill(
-            start_color="366092",
-            end_color="366092",
-            fill_type="solid"
+
+        # Ordenar por frecuencia descendente (solo referencias, sin copiar)
+        ordered = sorted(
+            terms,
+            key=lambda term: term_value(term, 'frequency', 0) or 0,
+            reverse=True
+        )
+
+        self.write_rows(
+            output_path,
+            "Términos Extraídos",
+            TERM_COLUMNS,
+            (self._term_row(term) for term in ordered)
+        )
+
+    def export_store(self, store: TermStore, output_path: str):
+        """
+        Exportar a Excel los términos de un almacén columnar
+
+        Args:
+            store: Almacén de términos del trabajo (ya ordenado por frecuencia)
+            output_path: Ruta del archivo Excel de salida
+        """
+        if not len(store):
+            raise ValueError("No hay términos para exportar")
+
+        fields = ('term', 'pattern', 'freq', 'dfreq', 'spec', 'in_tmx', 'words')
+        self.write_rows(
+            output_path,
+            "Términos Extraídos",
+            TERM_COLUMNS,
+            (
+                (term, pattern, freq, dfreq, round(spec, 4), 'Sí' if in_tmx else 'No', words)
+                for term, pattern, freq, dfreq, spec, in_tmx, words in store.iter_rows(fields)
+            )
         )
-        header_font = Font(color="FFFFFF", bold=True, size=11)
-        
-        # Escribir encabezados
-        for col_idx, column in enumerate(df.columns, 1):
-            cell = ws.cell(row=1, column=col_idx, value=column)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Escribir datos
-        for row_idx, row in enumerate(df.values, 2):
-            for col_idx, value in enumerate(row, 1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.alignment = Alignment(vertical='center')
-        
-        # Ajustar anchos de columna
-        column_widths = {
-            'A': 40,  # Término
-            'B': 20,  # Patrón
-            'C': 12,  # Frecuencia
-            'D': 18,  # Frec. Documentos
-            'E': 15,  # Especificidad
-            'F': 10,  # En TMX
-            'G': 30   # Palabras
-        }
-        
-        for col, width in column_widths.items():
-            ws.column_dimensions[col].width = width
-        
-        # Congelar primera fila
+
+    def write_rows(
+        self,
+        output_path: str,
+        title: str,
+        columns: List[Tuple[str, float]],
+        rows: Iterable[Sequence]
+    ) -> int:
+        """
+        Escribir un Excel fila a fila (openpyxl en modo write-only)
+
+        Las filas se vuelcan a disco según llegan, sin celdas ni DataFrame
+        en memoria. Solo el encabezado lleva estilo; los datos se escriben
+        como valores planos, que es lo más rápido que permite openpyxl.
+
+        Args:
+            output_path: Ruta del archivo Excel de salida
+            title: Nombre de la hoja
+            columns: Encabezados y anchos de columna
+            rows: Valores de cada fila, en el orden de columns
+
+        Returns:
+            Número de filas de datos escritas
+        """
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(title)
+
+        # Anchos y panel congelado antes de la primera fila
+        for col_idx, (_, width) in enumerate(columns, 1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = width
         ws.freeze_panes = 'A2'
-        
-        # Guardar
+
+        ws.append([self._header_cell(ws, name) for name, _ in columns])
+
+        count = 0
+        for row in rows:
+            ws.append(row)
+            count += 1
+
         wb.save(output_path)
+        return count
+
+    def _header_cell(self, ws, value: str) -> WriteOnlyCell:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.fill = self.HEADER_FILL
+        cell.font = self.HEADER_FONT
+        cell.alignment = self.HEADER_ALIGNMENT
+        return cell
+
+    def _term_row(self, term: Dict) -> tuple:
+        """Fila del Excel para un término de TermSuite (orden de TERM_COLUMNS)"""
+        return (
+            term_label(term),
+            term_value(term, 'pattern', ''),
+            term_value(term, 'frequency', 0),
+            term_value(term, 'documentFrequency', 0),
+            round(term_value(term, 'specificity', 0) or 0, 4),
+            'Sí' if term.get('in_tmx', False) else 'No',
+            term_words(term)
+        )
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+from typing import Dict, Set, Tuple
+
+
+class JobEventBroker:
+    """
+    Avisos de cambio de trabajos para los flujos de eventos (SSE)
+
+    El almacén de trabajos llama a `publish(job_id)` desde cualquier hilo
+    (pool de extracción, workers JVM) y cada conexión abierta espera con
+    `wait()` en el bucle de asyncio sin ocupar un hilo. Solo cubre los
+    cambios hechos en este proceso: con JOB_RUNNER=queue quien escribe es
+    otro proceso, y el flujo se entera releyendo el almacén al vencer la
+    espera.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+
+    def subscribe(self, job_id: str) -> asyncio.Event:
+        """Evento que se activa en cada cambio del trabajo (llamar desde el bucle)"""
+        event = asyncio.Event()
+        with self._lock:
+            self._waiters.setdefault(job_id, set()).add((asyncio.get_running_loop(), event))
+        return event
+
+    def unsubscribe(self, job_id: str, event: asyncio.Event):
+        """Dejar de recibir avisos de un trabajo"""
+        with self._lock:
+            waiters = self._waiters.get(job_id)
+            if waiters is None:
+                return
+            waiters.difference_update({w for w in waiters if w[1] is event})
+            if not waiters:
+                del self._waiters[job_id]
+
+    def publish(self, job_id: str):
+        """Despertar a quien espera cambios del trabajo (seguro entre hilos)"""
+        with self._lock:
+            waiters = list(self._waiters.get(job_id, ()))
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Bucle ya cerrado (apagado)
+                pass
+
+    @staticmethod
+    async def wait(event: asyncio.Event, timeout: float) -> bool:
+        """
+        Esperar un aviso como mucho `timeout` segundos
+
+        Returns:
+            True si hubo aviso, False si venció la espera
+        """
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        event.clear()
+        return True
+
+    def stats(self) -> Dict:
+        """Conexiones escuchando"""
+        with self._lock:
+            return {
+                "jobs": len(self._waiters),
+                "listeners": sum(len(w) for w in self._waiters.values())
+            }
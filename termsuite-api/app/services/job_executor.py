@@ -0,0 +1,115 @@
+import fcntl
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+
+class JobExecutor:
+    """
+    Ejecutor de trabajos de extracción con un pool acotado
+
+    Los trabajos se ejecutan en hilos fuera del event loop (las llamadas
+    bloqueantes a la JVM, json.load y la exportación a Excel no frenan la
+    API). Como mucho MAX_CONCURRENT_JOBS corren a la vez; el resto espera
+    en cola por orden de llegada.
+
+    Con `lock_dir` el ejecutor tiene un propietario (`owner`) que mantiene
+    bloqueado {lock_dir}/{owner}.lock mientras vive el proceso: otro
+    proceso sabe así si los trabajos de ese propietario siguen en marcha
+    (ver owner_alive), aunque el primero muriera sin pararse.
+    """
+
+    def __init__(self, max_workers: int = None, lock_dir: Path = None):
+        self.max_workers = max_workers or int(os.getenv('MAX_CONCURRENT_JOBS', '2'))
+        self.lock_dir = Path(lock_dir) if lock_dir is not None else None
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._owner_lock = None
+        if self.lock_dir is not None:
+            self.lock_dir.mkdir(parents=True, exist_ok=True)
+            # El sistema libera el bloqueo cuando el proceso termina
+            self._owner_lock = open(self.lock_dir / f"{self.owner}.lock", 'w')
+            fcntl.flock(self._owner_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='termsuite-job'
+        )
+        self._lock = threading.Lock()
+        self._queued: List[str] = []
+        self._running: Set[str] = set()
+
+    def submit(self, job_id: str, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Encolar un trabajo
+
+        Args:
+            job_id: ID del trabajo
+            fn: Función bloqueante a ejecutar
+            *args, **kwargs: Argumentos de la función
+
+        Returns:
+            Future del trabajo
+        """
+        with self._lock:
+            self._queued.append(job_id)
+        return self._pool.submit(self._run, job_id, fn, *args, **kwargs)
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """Posición en cola (1 = el siguiente), o None si no está esperando"""
+        with self._lock:
+            if job_id in self._queued:
+                return self._queued.index(job_id) + 1
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        """Trabajos en ejecución y en cola"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "running": len(self._running),
+                "queued": len(self._queued)
+            }
+
+    def owner_alive(self, owner: str) -> bool:
+        """
+        Si el proceso propietario `owner` sigue vivo
+
+        El de un propietario muerto se borra al comprobarlo.
+        """
+        if owner == self.owner:
+            return True
+        if self.lock_dir is None:
+            return False
+        path = self.lock_dir / f"{owner}.lock"
+        try:
+            f = open(path, 'r+')
+        except FileNotFoundError:
+            return False
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            path.unlink(missing_ok=True)
+        return False
+
+    def shutdown(self, wait: bool = False):
+        """Detener el pool (los trabajos en cola se descartan si wait=False)"""
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
+        if self._owner_lock is not None:
+            (self.lock_dir / f"{self.owner}.lock").unlink(missing_ok=True)
+            self._owner_lock.close()
+            self._owner_lock = None
+
+    def _run(self, job_id: str, fn: Callable, *args, **kwargs):
+        with self._lock:
+            self._queued.remove(job_id)
+            self._running.add(job_id)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
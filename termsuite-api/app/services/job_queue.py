@@ -0,0 +1,149 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+class JobQueue:
+    """
+    Cola duradera de trabajos de extracción en SQLite
+
+    La web encola y los workers (`python -m app.worker`) reclaman. Reclamar
+    un trabajo lo alquila durante `visibility_timeout` segundos: mientras
+    el worker lo procesa renueva el alquiler (heartbeat) y al terminar lo
+    borra. Si el worker muere, el alquiler caduca y otro worker lo vuelve a
+    reclamar; tras `max_attempts` reclamaciones se da por fallido.
+
+    Vive en la misma base que SQLiteJobStore (tabla `queue`).
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS queue (
+            job_id TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            enqueued_at REAL NOT NULL,
+            lease_owner TEXT,
+            lease_expires REAL NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS queue_lease_enqueued ON queue (lease_expires, enqueued_at)"
+    )
+
+    def __init__(self, db_path: Path, visibility_timeout: float = None, max_attempts: int = None):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.visibility_timeout = visibility_timeout or float(os.getenv('QUEUE_VISIBILITY_TIMEOUT', '300'))
+        self.max_attempts = max_attempts or int(os.getenv('QUEUE_MAX_ATTEMPTS', '3'))
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def enqueue(self, job_id: str, payload: Dict):
+        """Encolar un trabajo (payload: argumentos serializables en JSON)"""
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO queue (job_id, payload, enqueued_at) VALUES (?, ?, ?)",
+                (job_id, json.dumps(payload, ensure_ascii=False), time.time())
+            )
+
+    def claim(self, worker_id: str) -> Optional[Tuple[str, Dict, int]]:
+        """
+        Reclamar el trabajo más antiguo libre (o con el alquiler caducado)
+
+        Args:
+            worker_id: Identificador del worker que lo procesará
+
+        Returns:
+            (job_id, payload, intento) o None si la cola está vacía
+        """
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT job_id, payload, attempts FROM queue WHERE lease_expires < ? "
+                "ORDER BY enqueued_at LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, payload, attempts = row
+            conn.execute(
+                "UPDATE queue SET lease_owner = ?, lease_expires = ?, attempts = ? WHERE job_id = ?",
+                (worker_id, now + self.visibility_timeout, attempts + 1, job_id)
+            )
+        return job_id, json.loads(payload), attempts + 1
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Renovar el alquiler; False si el trabajo ya no es de este worker"""
+        with self._conn() as conn:
+            cursor = conn.execute(
+                "UPDATE queue SET lease_expires = ? WHERE job_id = ? AND lease_owner = ?",
+                (time.time() + self.visibility_timeout, job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str) -> bool:
+        """Sacar de la cola un trabajo terminado (bien o con error)"""
+        with self._conn() as conn:
+            cursor = conn.execute(
+                "DELETE FROM queue WHERE job_id = ? AND lease_owner = ?",
+                (job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, job_id: str, worker_id: str):
+        """Devolver un trabajo a la cola sin procesarlo (p. ej. al parar el worker)"""
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE queue SET lease_owner = NULL, lease_expires = 0, attempts = MAX(attempts - 1, 0) "
+                "WHERE job_id = ? AND lease_owner = ?",
+                (job_id, worker_id)
+            )
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Posición en cola (1 = el siguiente), o None si no está esperando"""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT enqueued_at, lease_expires FROM queue WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None or row[1] >= time.time():
+            return None
+        ahead = conn.execute(
+            "SELECT COUNT(*) FROM queue WHERE enqueued_at < ? AND lease_expires < ?",
+            (row[0], time.time())
+        ).fetchone()[0]
+        return ahead + 1
+
+    def stats(self) -> Dict:
+        """Trabajos esperando y en proceso"""
+        now = time.time()
+        queued, running = self._conn().execute(
+            "SELECT COALESCE(SUM(lease_expires < ?), 0), COALESCE(SUM(lease_expires >= ?), 0) FROM queue",
+            (now, now)
+        ).fetchone()
+        return {
+            "queued": queued,
+            "running": running,
+            "visibility_timeout": self.visibility_timeout,
+            "max_attempts": self.max_attempts
+        }
+
+    def _conn(self) -> sqlite3.Connection:
+        """Conexión propia de cada hilo"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
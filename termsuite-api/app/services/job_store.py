@@ -0,0 +1,286 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+class JobStore:
+    """
+    Estado de los trabajos de extracción
+
+    Interfaz común de los backends. Cada trabajo es un diccionario
+    (status, progress, message, ...) que se crea una vez y se actualiza
+    por campos.
+    """
+
+    def __init__(self):
+        self._listeners: List[Callable[[str], None]] = []
+
+    def add_listener(self, callback: Callable[[str], None]):
+        """Llamar a callback(job_id) tras cada cambio hecho desde este proceso"""
+        self._listeners.append(callback)
+
+    def create(self, job_id: str, job: Dict):
+        """Registrar un trabajo nuevo"""
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Copia del estado de un trabajo, o None si no existe"""
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields):
+        """Actualizar campos de un trabajo"""
+        raise NotImplementedError
+
+    def list(self, status: str = None, limit: int = 100) -> List[Dict]:
+        """Trabajos más recientes primero, opcionalmente de un estado"""
+        raise NotImplementedError
+
+    def flush(self):
+        """Escribir las actualizaciones pendientes"""
+
+    def close(self):
+        """Liberar recursos del backend"""
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+    def _notify(self, job_id: str):
+        for callback in self._listeners:
+            callback(job_id)
+
+
+class MemoryJobStore(JobStore):
+    """Trabajos en un diccionario del proceso (se pierden al reiniciar)"""
+
+    def __init__(self):
+        super().__init__()
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id: str, job: Dict):
+        with self._lock:
+            self._jobs[job_id] = {**job, "job_id": job_id, "created_at": time.time()}
+        self._notify(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id not in self._jobs:
+                return
+            self._jobs[job_id].update(fields)
+        self._notify(job_id)
+
+    def list(self, status: str = None, limit: int = 100) -> List[Dict]:
+        with self._lock:
+            jobs = [
+                dict(job) for job in self._jobs.values()
+                if status is None or job["status"] == status
+            ]
+        jobs.sort(key=lambda job: job["created_at"], reverse=True)
+        return jobs[:limit]
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Trabajos en una base SQLite local (modo WAL)
+
+    Sobrevive a reinicios y la comparten todos los procesos del host, así
+    que varios workers de uvicorn pueden responder al mismo trabajo. Los
+    cambios de estado se escriben al momento; el resto (progreso, etapa,
+    documentos procesados) se acumula en memoria y se escribe como mucho
+    cada `flush_interval` segundos por trabajo. Las lecturas del mismo
+    proceso ven también lo pendiente.
+
+    Las escrituras de un mismo trabajo se hacen en orden: quien saca un
+    lote de `_pending` lo escribe antes de que otro hilo saque el
+    siguiente (lock por trabajo), así un lote de progreso viejo no pisa el
+    estado final.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            data TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)",
+        "CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at)"
+    )
+
+    # Locks de escritura (cada trabajo usa siempre el mismo)
+    WRITE_LOCKS = 16
+
+    def __init__(self, db_path: Path, flush_interval: float = None):
+        super().__init__()
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        if flush_interval is None:
+            flush_interval = float(os.getenv('JOB_STORE_FLUSH_INTERVAL', '1.0'))
+        self.flush_interval = flush_interval
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._write_locks = [threading.Lock() for _ in range(self.WRITE_LOCKS)]
+        self._pending: Dict[str, Dict] = {}
+        self._last_write: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def create(self, job_id: str, job: Dict):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?)",
+                (job_id, job["status"], now, now, json.dumps(job, ensure_ascii=False))
+            )
+        self._notify(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT data, created_at FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = self._decode(job_id, row)
+        with self._lock:
+            job.update(self._pending.get(job_id, {}))
+        return job
+
+    def update(self, job_id: str, **fields):
+        now = time.time()
+        with self._write_lock(job_id):
+            with self._lock:
+                pending = self._pending.setdefault(job_id, {})
+                pending.update(fields)
+                # Cambio de estado o lote viejo: escribir ya
+                due = "status" in fields or now - self._last_write.get(job_id, 0) >= self.flush_interval
+                if due:
+                    fields = self._pending.pop(job_id)
+                    self._last_write[job_id] = now
+                elif self._flusher is None:
+                    self._start_flusher()
+
+            if due:
+                self._write(job_id, fields, now)
+                if fields.get("status") in ("completed", "failed"):
+                    with self._lock:
+                        self._last_write.pop(job_id, None)
+        # Las lecturas de este proceso ya ven lo pendiente
+        self._notify(job_id)
+
+    def list(self, status: str = None, limit: int = 100) -> List[Dict]:
+        if status is None:
+            rows = self._conn().execute(
+                "SELECT id, data, created_at FROM jobs ORDER BY created_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        else:
+            rows = self._conn().execute(
+                "SELECT id, data, created_at FROM jobs WHERE status = ? "
+                "ORDER BY created_at DESC LIMIT ?",
+                (status, limit)
+            ).fetchall()
+        jobs = [self._decode(row[0], row[1:]) for row in rows]
+        # Como en get: lo pendiente de este proceso (el estado ya está escrito)
+        with self._lock:
+            for job in jobs:
+                job.update(self._pending.get(job["job_id"], {}))
+        return jobs
+
+    def flush(self):
+        with self._lock:
+            job_ids = list(self._pending)
+        for job_id in job_ids:
+            with self._write_lock(job_id):
+                with self._lock:
+                    fields = self._pending.pop(job_id, None)
+                    if fields is None:
+                        continue
+                    now = time.time()
+                    self._last_write[job_id] = now
+                self._write(job_id, fields, now)
+
+    def close(self):
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    def _write(self, job_id: str, fields: Dict, now: float):
+        """Mezclar campos en el JSON del trabajo (una transacción)"""
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            data = json.loads(row[0])
+            data.update(fields)
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, data = ? WHERE id = ?",
+                (data["status"], now, json.dumps(data, ensure_ascii=False), job_id)
+            )
+
+    def _write_lock(self, job_id: str) -> threading.Lock:
+        return self._write_locks[hash(job_id) % self.WRITE_LOCKS]
+
+    def _decode(self, job_id: str, row) -> Dict:
+        data, created_at = row
+        return {**json.loads(data), "job_id": job_id, "created_at": created_at}
+
+    def _start_flusher(self):
+        """Hilo que escribe los lotes de progreso que nadie más va a vaciar"""
+        def run():
+            while not self._stop.wait(self.flush_interval):
+                self.flush()
+
+        self._flusher = threading.Thread(target=run, name='job-store-flush', daemon=True)
+        self._flusher.start()
+
+    def _conn(self) -> sqlite3.Connection:
+        """Conexión propia de cada hilo"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+
+def job_db_path(data_dir: Path) -> Path:
+    """Base SQLite de trabajos y de la cola: JOB_DB_PATH o {DATA_DIR}/jobs.db"""
+    return Path(os.getenv('JOB_DB_PATH') or Path(data_dir) / 'jobs.db')
+
+
+def create_job_store(data_dir: Path) -> JobStore:
+    """
+    Crear el almacén de trabajos configurado
+
+    JOB_STORE=sqlite (por defecto) guarda en JOB_DB_PATH
+    (por defecto {DATA_DIR}/jobs.db); JOB_STORE=memory usa un diccionario.
+    """
+    backend = os.getenv('JOB_STORE', 'sqlite').lower()
+    if backend == 'memory':
+        return MemoryJobStore()
+    if backend == 'sqlite':
+        return SQLiteJobStore(job_db_path(data_dir))
+    raise Exception(f"JOB_STORE desconocido: {backend}")
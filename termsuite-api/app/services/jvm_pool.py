@@ -0,0 +1,412 @@
+import itertools
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+from typing import Callable, Dict, List, Optional
+
+from app.services.admission import MemoryBudget, ReservationCancelled, parse_heap_mb
+
+
+# Clase de entrada del worker en el JAR de TermSuite
+WORKER_CLASS = 'fr.univnantes.termsuite.tools.TermSuiteWorker'
+
+
+class WorkerError(Exception):
+    """Error de comunicación con un worker JVM (no de la extracción)"""
+
+
+class WorkerStartError(WorkerError):
+    """El worker JVM no pudo arrancar (p. ej. JAR sin TermSuiteWorker)"""
+
+
+class WorkerTimeout(WorkerError):
+    """El worker JVM no respondió a tiempo (se mata)"""
+
+
+def kill_on_cancel(process: subprocess.Popen, cancel: threading.Event, done: threading.Event, interval: float = 1.0):
+    """
+    Matar `process` si se activa `cancel` antes que `done` (en un hilo aparte)
+
+    Args:
+        process: Proceso JVM
+        cancel: Evento de cancelación del trabajo
+        done: Evento que marca el fin de la tarea (deja de vigilar)
+        interval: Segundos entre comprobaciones
+    """
+    def run():
+        while not cancel.wait(interval):
+            if done.is_set() or process.poll() is not None:
+                return
+        if not done.is_set() and process.poll() is None:
+            process.kill()
+
+    threading.Thread(target=run, name='jvm-cancel', daemon=True).start()
+
+
+class JVMWorker:
+    """
+    Proceso JVM de larga duración que ejecuta extracciones de TermSuite
+
+    Habla el protocolo de TermSuiteWorker: una petición JSON por línea en
+    stdin y una respuesta JSON por línea en stdout. El stderr (logs de
+    TermSuite) se drena en un hilo aparte para que la tubería no se llene.
+    """
+
+    def __init__(self, worker_id: int, jar_path: str, java_opts: List[str], startup_timeout: float = 120):
+        self.worker_id = worker_id
+        self.language: Optional[str] = None
+        self.jobs = 0
+        self.started_at = time.time()
+        self.last_used = self.started_at
+        self.log = deque(maxlen=200)
+        self.listener: Optional[Callable[[str], None]] = None
+        self._ids = itertools.count(1)
+        self._responses: queue.Queue = queue.Queue()
+
+        try:
+            self.process = subprocess.Popen(
+                ['java', *java_opts, '-cp', jar_path, WORKER_CLASS],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding='utf-8',
+                bufsize=1
+            )
+        except OSError as e:
+            raise WorkerStartError(f"No se pudo lanzar la JVM: {e}")
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+
+        try:
+            ready = self._wait_response(startup_timeout)
+        except WorkerError as e:
+            self.kill()
+            raise WorkerStartError(str(e))
+        if ready.get('status') != 'ready':
+            self.kill()
+            raise WorkerStartError(f"El worker JVM no arrancó: {ready}")
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def request(self, payload: Dict, timeout: float) -> Dict:
+        """
+        Enviar una petición y esperar su respuesta
+
+        Args:
+            payload: Petición (command, args...)
+            timeout: Segundos máximos de espera
+
+        Returns:
+            Respuesta del worker
+        """
+        payload = dict(payload, id=str(next(self._ids)))
+        try:
+            self.process.stdin.write(json.dumps(payload) + '\n')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise WorkerError(f"Worker JVM {self.worker_id} no disponible: {e}")
+
+        response = self._wait_response(timeout)
+        if response.get('id') != payload['id']:
+            raise WorkerError(f"Respuesta inesperada del worker JVM: {response}")
+        return response
+
+    def ping(self, timeout: float = 10) -> bool:
+        """Comprobar que el worker responde"""
+        try:
+            return self.request({'command': 'ping'}, timeout).get('status') == 'ok'
+        except WorkerError:
+            return False
+
+    def stop(self, timeout: float = 10):
+        """Parar el worker ordenadamente (o matarlo si no responde)"""
+        if self.alive:
+            try:
+                self.request({'command': 'shutdown'}, timeout)
+                self.process.wait(timeout)
+            except (WorkerError, subprocess.TimeoutExpired):
+                pass
+        self.kill()
+
+    def kill(self):
+        if self.alive:
+            self.process.kill()
+            self.process.wait()
+
+    def tail(self, lines: int = 20) -> str:
+        """Últimas líneas de log del worker"""
+        return '\n'.join(list(self.log)[-lines:])
+
+    def _wait_response(self, timeout: float) -> Dict:
+        try:
+            response = self._responses.get(timeout=timeout)
+        except queue.Empty:
+            self.kill()
+            raise WorkerTimeout(f"El worker JVM {self.worker_id} no respondió en {timeout:.0f}s")
+        if response is None:
+            raise WorkerError(
+                f"El worker JVM {self.worker_id} terminó inesperadamente: {self.tail()}"
+            )
+        return response
+
+    def _read_stdout(self):
+        for line in self.process.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                self._responses.put(json.loads(line))
+            except ValueError:
+                # Salida que no es del protocolo: tratarla como log
+                self.log.append(line)
+        self._responses.put(None)
+
+    def _read_stderr(self):
+        for line in self.process.stderr:
+            line = line.rstrip('\n')
+            self.log.append(line)
+            listener = self.listener
+            if listener:
+                try:
+                    listener(line)
+                except Exception:
+                    # Un fallo al notificar progreso no debe cortar el drenaje
+                    pass
+
+
+class JVMWorkerPool:
+    """
+    Pool de workers JVM calientes para TermSuite
+
+    - Como mucho `size` workers vivos, creados bajo demanda
+    - Afinidad por idioma: un trabajo va preferentemente a un worker
+      libre que ya procesó ese idioma (recursos ya cargados)
+    - Reciclado: un worker se reinicia tras `max_jobs` extracciones o si
+      falla, para acotar fugas de memoria en la JVM
+    - Health check periódico (ping) de los workers libres
+    - Memoria: cada worker reserva el -Xmx de JAVA_OPTS en el presupuesto
+      del host (MemoryBudget) al arrancar y lo libera al pararse; un worker
+      libre más de `idle_timeout` segundos se para para devolver su heap
+      a otros procesos
+    """
+
+    def __init__(
+        self,
+        size: int,
+        jar_path: str,
+        java_opts: List[str],
+        max_jobs: int = None,
+        health_interval: float = None,
+        memory_budget: MemoryBudget = None,
+        idle_timeout: float = None
+    ):
+        self.size = size
+        self.jar_path = jar_path
+        self.java_opts = java_opts
+        self.memory_budget = memory_budget
+        self.heap_mb = parse_heap_mb(java_opts) or 4096
+        self.max_jobs = max_jobs or int(os.getenv('TERMSUITE_WORKER_MAX_JOBS', '50'))
+        self.health_interval = health_interval or float(os.getenv('TERMSUITE_WORKER_HEALTH_INTERVAL', '60'))
+        self.idle_timeout = idle_timeout or float(os.getenv('TERMSUITE_WORKER_IDLE_TIMEOUT', '300'))
+
+        self._ids = itertools.count(1)
+        self._idle: List[JVMWorker] = []
+        self._busy = 0
+        self._reservations: Dict[int, ExitStack] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stats = {"started": 0, "recycled": 0, "failed": 0, "expired": 0, "affinity_hits": 0}
+
+        threading.Thread(target=self._health_loop, daemon=True).start()
+
+    def extract(
+        self,
+        args: List[str],
+        language: str,
+        timeout: float,
+        on_line: Callable[[str], None] = None,
+        command: str = 'extract',
+        cancel: threading.Event = None
+    ) -> Dict:
+        """
+        Ejecutar una extracción en un worker del pool
+
+        Args:
+            args: Argumentos de TerminologyExtractorCLI (o de PreprocessorCLI)
+            language: Idioma del corpus (para la afinidad)
+            timeout: Segundos máximos de la extracción
+            on_line: Callback opcional para cada línea de log de la extracción
+            command: 'extract' o 'preprocess'
+            cancel: Evento opcional; si se activa se mata el worker
+
+        Returns:
+            Respuesta del worker (status, error, elapsed_ms...)
+        """
+        worker = self._acquire(language)
+        worker.listener = on_line
+        healthy = False
+        done = threading.Event()
+        if cancel is not None:
+            kill_on_cancel(worker.process, cancel, done)
+        try:
+            response = worker.request({'command': command, 'args': args}, timeout)
+            worker.language = language
+            healthy = True
+            if response.get('status') != 'ok':
+                response['log'] = worker.tail()
+            return response
+        finally:
+            done.set()
+            worker.listener = None
+            self._release(worker, healthy)
+
+    def stats(self) -> Dict:
+        """Estado del pool para operadores"""
+        with self._cond:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "busy": self._busy,
+                "languages": sorted({w.language for w in self._idle if w.language}),
+                **self._stats
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            workers, self._idle = self._idle, []
+            self._cond.notify_all()
+        for worker in workers:
+            self._retire(worker)
+
+    def _acquire(self, language: str) -> JVMWorker:
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise WorkerError("El pool de workers JVM está cerrado")
+
+                    if self._idle:
+                        # Preferir un worker que ya cargó los recursos del idioma
+                        for idx, worker in enumerate(self._idle):
+                            if worker.language == language:
+                                self._stats["affinity_hits"] += 1
+                                break
+                        else:
+                            idx = len(self._idle) - 1
+                        self._busy += 1
+                        return self._idle.pop(idx)
+
+                    if self._busy < self.size:
+                        self._busy += 1
+                        break
+
+                    self._cond.wait()
+
+            # Reservar el heap del worker nuevo fuera del lock; si mientras
+            # se espera memoria queda libre otro worker, se usa ese
+            worker_id = next(self._ids)
+            reservation = ExitStack()
+            try:
+                if self.memory_budget is not None:
+                    reservation.enter_context(self.memory_budget.reserve(
+                        f"jvm-worker/{self.memory_budget.owner}/{worker_id}",
+                        self.heap_mb,
+                        cancel=lambda: bool(self._idle) or self._closed
+                    ))
+            except ReservationCancelled:
+                with self._cond:
+                    self._busy -= 1
+                    self._cond.notify()
+                continue
+            except Exception:
+                with self._cond:
+                    self._busy -= 1
+                    self._cond.notify()
+                raise
+            break
+
+        # Arrancar el worker fuera del lock (la JVM tarda en arrancar)
+        try:
+            worker = JVMWorker(worker_id, self.jar_path, self.java_opts)
+        except Exception:
+            reservation.close()
+            with self._cond:
+                self._busy -= 1
+                self._stats["failed"] += 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["started"] += 1
+            self._reservations[worker_id] = reservation
+        return worker
+
+    def _release(self, worker: JVMWorker, healthy: bool):
+        worker.jobs += 1
+        worker.last_used = time.time()
+        recycle = not healthy or not worker.alive or worker.jobs >= self.max_jobs
+
+        with self._cond:
+            self._busy -= 1
+            if recycle:
+                self._stats["recycled" if healthy else "failed"] += 1
+            elif not self._closed:
+                self._idle.append(worker)
+            self._cond.notify()
+
+        if recycle or self._closed:
+            self._retire(worker)
+
+    def _health_loop(self):
+        while True:
+            time.sleep(min(self.health_interval, self.idle_timeout))
+            now = time.time()
+            with self._cond:
+                if self._closed:
+                    return
+                # Parar los que llevan demasiado tiempo libres (su reserva de
+                # memoria puede hacer falta en otro proceso)
+                expired = [w for w in self._idle if now - w.last_used >= self.idle_timeout]
+                self._stats["expired"] += len(expired)
+                # Sacar los demás workers libres mientras se comprueban
+                workers = [w for w in self._idle if w not in expired]
+                self._idle = []
+                self._busy += len(workers)
+
+            for worker in expired:
+                self._retire(worker)
+            for worker in workers:
+                self._release_checked(worker)
+
+    def _release_checked(self, worker: JVMWorker):
+        healthy = worker.alive and worker.ping()
+        with self._cond:
+            self._busy -= 1
+            if healthy and not self._closed:
+                self._idle.append(worker)
+            elif not healthy:
+                self._stats["failed"] += 1
+            self._cond.notify()
+        if not healthy or self._closed:
+            self._retire(worker, graceful=False)
+
+    def _retire(self, worker: JVMWorker, graceful: bool = True):
+        """Parar un worker y liberar la reserva de su heap"""
+        try:
+            if graceful:
+                worker.stop()
+            else:
+                worker.kill()
+        finally:
+            with self._cond:
+                reservation = self._reservations.pop(worker.worker_id, None)
+            if reservation is not None:
+                reservation.close()
@@ -0,0 +1,62 @@
+import hashlib
+import re
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+# Semilla fija: las firmas tienen que coincidir entre procesos y ejecuciones
+MINHASH_SEED = 20240611
+
+# Palabras del texto (los shingles son secuencias de palabras en minúscula)
+WORD = re.compile(r'\w+')
+
+# Shingles por bloque al calcular una firma (acota la memoria)
+SHINGLE_BLOCK = 8192
+
+
+@lru_cache(maxsize=8)
+def minhash_params(num_perm: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Coeficientes (a impares, b) de las num_perm funciones hash"""
+    rng = np.random.default_rng(MINHASH_SEED)
+    a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def document_signature(path: str, num_perm: int, shingle_words: int) -> Tuple[str, int, Optional[np.ndarray]]:
+    """
+    SHA-256 y firma MinHash de un documento
+
+    Se ejecuta en los procesos del pool de CorpusDeduplicator: este módulo
+    no importa nada de la aplicación, así un proceso nuevo solo carga numpy.
+
+    Cada shingle (shingle_words palabras seguidas) se reduce a 32 bits con
+    CRC32 y las permutaciones son hashes multiplicativos (a·x + b) >> 32
+    sobre 64 bits.
+
+    Returns:
+        (sha256, bytes, firma uint32 o None si el documento no tiene palabras)
+    """
+    data = Path(path).read_bytes()
+    sha256 = hashlib.sha256(data).hexdigest()
+    words = WORD.findall(data.decode('utf-8', errors='replace').lower())
+    if not words:
+        return sha256, len(data), None
+
+    k = min(shingle_words, len(words))
+    shingles = {
+        zlib.crc32(' '.join(words[i:i + k]).encode('utf-8'))
+        for i in range(len(words) - k + 1)
+    }
+    hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    a, b = minhash_params(num_perm)
+    signature = np.full(num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+    for start in range(0, len(hashes), SHINGLE_BLOCK):
+        block = hashes[start:start + SHINGLE_BLOCK, None]
+        values = ((block * a + b) >> np.uint64(32)).astype(np.uint32)
+        np.minimum(signature, values.min(axis=0), out=signature)
+    return sha256, len(data), signature
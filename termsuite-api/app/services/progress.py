@@ -0,0 +1,181 @@
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+
+class ExtractionProgress:
+    """
+    Traduce las líneas de log de TermSuite (--info) en progreso del trabajo
+
+    TermSuite no publica un porcentaje global, pero sus logs permiten
+    estimarlo:
+
+    - Lectura del corpus (preprocesado: tokenización, POS, lematización):
+      "Reading collection ... (N documents)", "Processing document i on N",
+      "x% - ... (y Mb/s) - Processing file ... (doc. i out of N)"
+    - Extracción: un "Running ... Engine <nombre>" por cada etapa
+
+    El preprocesado ocupa la mayor parte del rango [start, end]; las etapas
+    de extracción reparten el resto de forma asintótica, porque su número
+    depende de la configuración.
+    """
+
+    READING = re.compile(r'Reading collection .* \((\d+) documents\)')
+    READER_PROGRESS = re.compile(
+        r'([\d.,]+)% - .* \(([\d.,]+) Mb/s\) - Processing file .* \(doc\. (\d+) out of (\d+)\)'
+    )
+    DOC_PROGRESS = re.compile(r'Processing document (\d+) on (\d+)')
+    DOC_COUNT = re.compile(r'Processing document (\d+)')
+    FINISHED = re.compile(r'Finished reading collection')
+    ENGINE = re.compile(r'Running (?:Aggregate Engine|SimpleEngine) (\S+)')
+    PREPROCESSING = 'Starting preprocessing pipeline'
+
+    def __init__(self, start: int = 30, end: int = 70, preprocessing_share: float = 0.75):
+        self.start = start
+        self.end = end
+        self.preprocessing_end = start + (end - start) * preprocessing_share
+
+        self.stage = 'Iniciando TermSuite'
+        self.progress = start
+        self.documents_processed = 0
+        self.documents_total: Optional[int] = None
+        self.mb_per_second: Optional[float] = None
+        self.engines = 0
+        self._first_document_at: Optional[float] = None
+
+    def feed(self, line: str) -> Optional[Dict]:
+        """
+        Procesar una línea de log
+
+        Args:
+            line: Línea de stdout/stderr de TermSuite
+
+        Returns:
+            Nuevo estado (ver snapshot) si la línea aporta progreso, o None
+        """
+        if self.PREPROCESSING in line:
+            self.stage = 'Preprocesando corpus'
+            return self.snapshot()
+
+        match = self.READING.search(line)
+        if match:
+            self.documents_total = int(match.group(1))
+            self.stage = 'Preprocesando corpus'
+            return self.snapshot()
+
+        match = self.READER_PROGRESS.search(line)
+        if match:
+            self.mb_per_second = _to_float(match.group(2))
+            self._documents(int(match.group(3)), int(match.group(4)))
+            self._advance_reading(_to_float(match.group(1)) / 100)
+            return self.snapshot()
+
+        match = self.DOC_PROGRESS.search(line)
+        if match:
+            self._documents(int(match.group(1)), int(match.group(2)))
+            return self.snapshot()
+
+        match = self.DOC_COUNT.search(line)
+        if match:
+            self._documents(int(match.group(1)), self.documents_total)
+            return self.snapshot()
+
+        if self.FINISHED.search(line):
+            if self.documents_total:
+                self.documents_processed = self.documents_total
+            self._advance_reading(1.0)
+            self.stage = 'Extrayendo términos'
+            return self.snapshot()
+
+        match = self.ENGINE.search(line)
+        if match:
+            self.engines += 1
+            self._advance_reading(1.0)
+            window = self.end - self.preprocessing_end
+            self.progress = max(
+                self.progress,
+                self.preprocessing_end + window * (1 - 0.85 ** self.engines)
+            )
+            self.stage = f"Extrayendo términos ({match.group(1)})"
+            return self.snapshot()
+
+        return None
+
+    def snapshot(self) -> Dict:
+        """Estado actual, listo para volcar en el registro del trabajo"""
+        return {
+            "progress": int(self.progress),
+            "message": self._message(),
+            "stage": self.stage,
+            "documents_processed": self.documents_processed,
+            "documents_total": self.documents_total,
+            "docs_per_second": self.docs_per_second,
+            "mb_per_second": self.mb_per_second,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }
+
+    @property
+    def docs_per_second(self) -> Optional[float]:
+        if not self._first_document_at or self.documents_processed < 2:
+            return None
+        elapsed = time.monotonic() - self._first_document_at
+        return round(self.documents_processed / elapsed, 2) if elapsed > 0 else None
+
+    def _documents(self, processed: int, total: Optional[int]):
+        if self._first_document_at is None:
+            self._first_document_at = time.monotonic()
+        self.documents_processed = max(self.documents_processed, processed)
+        if total:
+            self.documents_total = total
+            self._advance_reading(self.documents_processed / total)
+
+    def _advance_reading(self, fraction: float):
+        fraction = min(max(fraction, 0.0), 1.0)
+        reading = self.start + (self.preprocessing_end - self.start) * fraction
+        self.progress = max(self.progress, reading)
+
+    def _message(self) -> str:
+        if self.documents_total and self.stage == 'Preprocesando corpus':
+            return f"{self.stage}: {self.documents_processed}/{self.documents_total} documentos"
+        return f"{self.stage}..."
+
+
+def _to_float(value: str) -> float:
+    """Números formateados por Java (el separador decimal depende del locale)"""
+    return float(value.replace(',', '.'))
+
+
+def merge_snapshots(snapshots: List[Optional[Dict]], start: int = 30) -> Dict:
+    """
+    Combinar el progreso de varias extracciones en paralelo (fragmentos)
+
+    Args:
+        snapshots: Último estado de cada extracción (None si aún no empezó)
+        start: Progreso de las extracciones que aún no empezaron
+
+    Returns:
+        Estado conjunto con el mismo formato que ExtractionProgress.snapshot
+    """
+    started = [s for s in snapshots if s]
+    progress = sum(s["progress"] for s in started) + start * (len(snapshots) - len(started))
+
+    def total(field: str):
+        values = [s[field] for s in started if s.get(field) is not None]
+        return round(sum(values), 2) if values else None
+
+    processed = total("documents_processed") or 0
+    documents_total = total("documents_total")
+    stage = f"Extracción en {len(snapshots)} fragmentos"
+    message = f"{stage}: {int(processed)}/{int(documents_total)} documentos" if documents_total else f"{stage}..."
+
+    return {
+        "progress": int(progress / len(snapshots)),
+        "message": message,
+        "stage": stage,
+        "documents_processed": int(processed),
+        "documents_total": int(documents_total) if documents_total else None,
+        "docs_per_second": total("docs_per_second"),
+        "mb_per_second": total("mb_per_second"),
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+# Tamaño de bloque al calcular hashes de ficheros
+HASH_CHUNK = 1024 * 1024
+
+
+class ResultCache:
+    """
+    Caché de resultados de TermSuite direccionada por contenido
+
+    La clave es un SHA-256 del contenido del corpus (hash de cada
+    documento; los nombres no cuentan porque no cambian la terminología y
+    un .txt suelto se guarda con el id de la subida), de los parámetros de
+    extracción y del JAR de TermSuite. Los JSON se guardan en `cache_dir/{clave}.json` y se expulsan
+    por LRU cuando el total supera `max_bytes`. El índice LRU y los
+    contadores viven en `cache_dir/cache.db` (SQLite), compartido por la API
+    y los workers: un resultado guardado por un proceso es un acierto en
+    los demás y la expulsión ve todas las entradas.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS cache_entries (
+            key TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            last_access REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS cache_entries_last_access ON cache_entries (last_access)",
+        """
+        CREATE TABLE IF NOT EXISTS cache_stats (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        """
+    )
+
+    def __init__(self, cache_dir: Path, max_bytes: int = None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if max_bytes is None:
+            max_bytes = int(os.getenv('RESULT_CACHE_MAX_MB', '1024')) * 1024 * 1024
+        self.max_bytes = max_bytes
+
+        self._local = threading.local()
+        self._jar_hashes: Dict[Tuple[str, int, int], str] = {}
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+        self._reconcile()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def key(
+        self,
+        corpus_path: Path,
+        params: Dict,
+        jar_path: str,
+        document_hashes: List[str] = None
+    ) -> str:
+        """
+        Calcular la clave de un resultado
+
+        Args:
+            corpus_path: Directorio del corpus
+            params: Parámetros de extracción (idioma, frecuencia mínima...)
+            jar_path: JAR de TermSuite (su contenido identifica la versión)
+            document_hashes: SHA-256 de los documentos si ya se conocen
+                (calculados al subir); si no, se leen del corpus
+
+        Returns:
+            Hash hexadecimal
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+        digest.update(self._jar_hash(jar_path).encode('ascii'))
+
+        if document_hashes is None:
+            document_hashes = [
+                _file_hash(path) for path in Path(corpus_path).rglob('*') if path.is_file()
+            ]
+        documents = sorted(document_hashes)
+        for document in documents:
+            digest.update(document.encode('ascii'))
+
+        return digest.hexdigest()
+
+    def get(self, key: str, target_path: Path) -> bool:
+        """
+        Copiar un resultado cacheado a target_path
+
+        El fichero en disco manda: lo haya guardado este proceso u otro.
+
+        Returns:
+            True si había resultado (acierto)
+        """
+        if not self.enabled:
+            return False
+
+        path = self._path(key)
+        try:
+            shutil.copyfile(path, target_path)
+            size = path.stat().st_size
+        except FileNotFoundError:
+            with self._conn() as conn:
+                # Expulsado o borrado por fuera: olvidar la entrada
+                conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                self._count(conn, "misses")
+            return False
+
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, size, last_access) VALUES (?, ?, ?)",
+                (key, size, time.time())
+            )
+            self._count(conn, "hits")
+        return True
+
+    def put(self, key: str, source_path: Path):
+        """Guardar un resultado y expulsar los menos usados si hace falta"""
+        if not self.enabled:
+            return
+
+        size = Path(source_path).stat().st_size
+        if size > self.max_bytes:
+            return
+
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, path)
+
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, size, last_access) VALUES (?, ?, ?)",
+                (key, size, time.time())
+            )
+            self._count(conn, "stores")
+            self._evict(conn)
+
+    def stats(self) -> Dict:
+        """Aciertos, fallos y ocupación de la caché (de todos los procesos)"""
+        conn = self._conn()
+        entries, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+        ).fetchone()
+        counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        counters.update(conn.execute("SELECT name, value FROM cache_stats").fetchall())
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else None,
+            **counters
+        }
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _reconcile(self):
+        """
+        Alinear el índice con el disco (un proceso caído entre escribir el
+        fichero y registrarlo, o una limpieza manual)
+        """
+        files = {}
+        for path in self.cache_dir.glob('*.json'):
+            stat = path.stat()
+            files[path.stem] = (stat.st_size, stat.st_mtime)
+
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            known = {row[0] for row in conn.execute("SELECT key FROM cache_entries")}
+            for key in known - files.keys():
+                conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            for key in files.keys() - known:
+                conn.execute(
+                    "INSERT INTO cache_entries (key, size, last_access) VALUES (?, ?, ?)",
+                    (key, *files[key])
+                )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Expulsar los menos usados hasta caber en max_bytes (dentro de una transacción)"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute(
+            "SELECT key, size FROM cache_entries ORDER BY last_access"
+        ).fetchall():
+            conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            self._path(key).unlink(missing_ok=True)
+            self._count(conn, "evictions")
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def _count(self, conn: sqlite3.Connection, name: str):
+        conn.execute(
+            "INSERT INTO cache_stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        """Conexión propia de cada hilo"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.cache_dir / 'cache.db', timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _jar_hash(self, jar_path: str) -> str:
+        """Hash del JAR, recalculado solo si cambia su tamaño o mtime"""
+        try:
+            stat = os.stat(jar_path)
+        except OSError:
+            return ''
+        ident = (str(jar_path), stat.st_size, stat.st_mtime_ns)
+        if ident not in self._jar_hashes:
+            self._jar_hashes[ident] = _file_hash(Path(jar_path))
+        return self._jar_hashes[ident]
+
+
+def _file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,351 @@
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from app.models import JobStatus
+
+
+logger = logging.getLogger(__name__)
+
+# Días sin uso tras los que se borra cada tipo de propietario (0 = nunca)
+DEFAULT_TTL_DAYS = {
+    'corpus': 30,
+    'tmx': 90,
+    'job': 14
+}
+
+# Segundos entre actualizaciones del último acceso de un mismo propietario
+TOUCH_INTERVAL = 60
+
+
+class RetentionService:
+    """
+    Retención de los artefactos del directorio de datos
+
+    Cada artefacto (subida, corpus extraído, corpus preprocesado, índice
+    TMX, almacén de términos, Excel) se registra al crearse en la tabla
+    `artifacts` con su tamaño y su propietario (`corpus/{id}`, `tmx/{id}`,
+    `job/{id}`), y los accesos actualizan su último uso. Un barrido
+    periódico consulta solo ese índice, sin recorrer el disco:
+
+    - TTL: borra los propietarios sin uso desde hace más de
+      RETENTION_TTL_{CORPUS,TMX,JOB}_DAYS días.
+    - Presupuesto: si el total supera RETENTION_MAX_GB, borra propietarios
+      por LRU hasta volver a caber.
+
+    Nunca se borra lo que usa un trabajo pendiente o en curso (su corpus y
+    su TMX) ni lo usado en los últimos RETENTION_MIN_AGE segundos. Los
+    propietarios se borran enteros (p. ej. la subida, el corpus extraído y
+    sus preprocesados), así nada queda a medias.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS artifacts (
+            path TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS artifacts_owner ON artifacts (owner)",
+        "CREATE INDEX IF NOT EXISTS artifacts_access ON artifacts (last_access)",
+        "CREATE TABLE IF NOT EXISTS retention_meta (key TEXT PRIMARY KEY, value REAL NOT NULL)"
+    )
+
+    def __init__(self, db_path: Path, file_handler, jobs, max_bytes: int = None, interval: float = None):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.file_handler = file_handler
+        self.jobs = jobs
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('RETENTION_MAX_GB', '0')) * 1024 ** 3)
+        self.max_bytes = max_bytes
+        self.ttl_days = {
+            prefix: float(os.getenv(f'RETENTION_TTL_{prefix.upper()}_DAYS', str(days)))
+            for prefix, days in DEFAULT_TTL_DAYS.items()
+        }
+        self.min_age = float(os.getenv('RETENTION_MIN_AGE', '3600'))
+        self.interval = interval or float(os.getenv('RETENTION_INTERVAL', '600'))
+
+        self._local = threading.local()
+        self._touched: Dict[str, float] = {}
+        self._touched_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def record(self, owner: str, kind: str, path: Path):
+        """
+        Registrar (o actualizar) un artefacto recién escrito
+
+        Args:
+            owner: Propietario: 'corpus/{id}', 'tmx/{id}' o 'job/{id}'
+            kind: Tipo de artefacto (upload, corpus, prepared, tmx_index, terms, excel)
+            path: Archivo o directorio
+        """
+        path = Path(path)
+        if not path.exists():
+            return
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO artifacts (path, owner, kind, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET "
+                "owner = excluded.owner, kind = excluded.kind, size = excluded.size, "
+                "last_access = excluded.last_access",
+                (str(path), owner, kind, _disk_usage(path), now, now)
+            )
+
+    def touch(self, owner: str):
+        """Marcar un propietario como usado ahora (como mucho una escritura por minuto)"""
+        now = time.time()
+        with self._touched_lock:
+            if now - self._touched.get(owner, 0) < TOUCH_INTERVAL:
+                return
+            self._touched[owner] = now
+        with self._conn() as conn:
+            conn.execute("UPDATE artifacts SET last_access = ? WHERE owner = ?", (now, owner))
+
+    def sweep(self) -> Dict[str, int]:
+        """
+        Aplicar TTLs y presupuesto una vez
+
+        Returns:
+            Propietarios y bytes borrados en este barrido
+        """
+        started = time.time()
+        result = {"ttl": 0, "budget": 0, "bytes": 0}
+        pinned = self._pinned()
+        conn = self._conn()
+
+        for prefix, days in self.ttl_days.items():
+            if days <= 0:
+                continue
+            expired = conn.execute(
+                "SELECT owner FROM artifacts WHERE owner LIKE ? GROUP BY owner "
+                "HAVING MAX(last_access) < ?",
+                (f"{prefix}/%", started - days * 86400)
+            ).fetchall()
+            for (owner,) in expired:
+                if owner not in pinned:
+                    result["ttl"] += 1
+                    result["bytes"] += self.evict(owner)
+
+        if self.max_bytes > 0:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+            if total > self.max_bytes:
+                candidates = conn.execute(
+                    "SELECT owner, SUM(size) FROM artifacts GROUP BY owner "
+                    "HAVING MAX(last_access) < ? ORDER BY MAX(last_access)",
+                    (started - self.min_age,)
+                ).fetchall()
+                for owner, size in candidates:
+                    if total <= self.max_bytes:
+                        break
+                    if owner in pinned:
+                        continue
+                    result["budget"] += 1
+                    result["bytes"] += self.evict(owner)
+                    total -= size
+
+        with conn:
+            for key in ("ttl", "budget", "bytes"):
+                self._add_meta(conn, f"evicted_{key}", result[key])
+            self._set_meta(conn, "last_sweep", started)
+            self._set_meta(conn, "last_sweep_seconds", time.time() - started)
+        if result["ttl"] or result["budget"]:
+            logger.info(
+                "Retención: %d caducados, %d por presupuesto, %d bytes liberados",
+                result["ttl"], result["budget"], result["bytes"]
+            )
+        return result
+
+    def evict(self, owner: str) -> int:
+        """
+        Borrar todos los artefactos de un propietario
+
+        Returns:
+            Bytes registrados de lo borrado
+        """
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT path, kind, size FROM artifacts WHERE owner = ?", (owner,)
+        ).fetchall()
+        owner_type, owner_id = owner.split('/', 1)
+        for path, kind, _ in rows:
+            path = Path(path)
+            if kind == 'upload':
+                # Suelta también la referencia al blob
+                self.file_handler.discard_upload(owner_id, owner_type, path)
+            elif path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+        with conn:
+            conn.execute("DELETE FROM artifacts WHERE owner = ?", (owner,))
+        with self._touched_lock:
+            self._touched.pop(owner, None)
+        if owner_type == 'job':
+            self.jobs.update(owner_id, result_file=None, message="Resultados borrados por retención")
+        return sum(row[2] for row in rows)
+
+    def start(self):
+        """Barrer cada `interval` segundos en un hilo (registra antes lo anterior al índice)"""
+        if self._thread is not None:
+            return
+
+        def run():
+            try:
+                self.backfill()
+            except Exception:
+                logger.exception("Error registrando artefactos existentes")
+            while not self._stop.wait(self.interval):
+                try:
+                    self.sweep()
+                except Exception:
+                    logger.exception("Error en el barrido de retención")
+
+        self._thread = threading.Thread(target=run, name='retention', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def backfill(self) -> int:
+        """
+        Registrar una sola vez los artefactos creados antes de existir el
+        índice (último acceso = fecha de modificación)
+
+        Returns:
+            Artefactos registrados
+        """
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM retention_meta WHERE key = 'backfilled'").fetchone():
+            return 0
+
+        fh = self.file_handler
+        found = []
+        for upload_type in ('tmx', 'corpus'):
+            directory = fh.uploads_dir / upload_type
+            if not directory.exists():
+                continue
+            for path in directory.iterdir():
+                file_id = path.name.split('.')[0].replace('_terms', '')
+                owner = f"{upload_type}/{file_id}"
+                if path.suffix in ('.tmx', '.txt', '.zip'):
+                    found.append((owner, 'upload', path))
+                elif path.name.endswith('.index'):
+                    found.append((owner, 'tmx_index', path))
+                elif path.name.endswith('_terms.json'):
+                    found.append((owner, 'tmx_legacy', path))
+        for path in fh.corpus_dir.iterdir():
+            corpus_id = path.name.split('.')[0]
+            found.append((f"corpus/{corpus_id}", 'prepared' if '.prepared-' in path.name else 'corpus', path))
+        for path in fh.outputs_dir.iterdir():
+            job_id = path.name.split('.')[0]
+            kind = {'.terms': 'terms', '.xlsx': 'excel'}.get(path.suffix, 'output')
+            found.append((f"job/{job_id}", kind, path))
+
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for owner, kind, path in found:
+                mtime = path.stat().st_mtime
+                conn.execute(
+                    "INSERT OR IGNORE INTO artifacts (path, owner, kind, size, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (str(path), owner, kind, _disk_usage(path), mtime, mtime)
+                )
+            self._set_meta(conn, 'backfilled', time.time())
+        return len(found)
+
+    def stats(self) -> Dict:
+        """Bytes registrados por tipo, presupuesto, TTLs y expulsiones acumuladas"""
+        conn = self._conn()
+        by_kind = {
+            kind: {"artifacts": count, "bytes": size}
+            for kind, count, size in conn.execute(
+                "SELECT kind, COUNT(*), SUM(size) FROM artifacts GROUP BY kind"
+            )
+        }
+        owners, total = conn.execute(
+            "SELECT COUNT(DISTINCT owner), COALESCE(SUM(size), 0) FROM artifacts"
+        ).fetchone()
+        meta = dict(conn.execute("SELECT key, value FROM retention_meta").fetchall())
+        return {
+            "max_bytes": self.max_bytes,
+            "total_bytes": total,
+            "owners": owners,
+            "by_kind": by_kind,
+            "ttl_days": self.ttl_days,
+            "evicted": {
+                "ttl": int(meta.get("evicted_ttl", 0)),
+                "budget": int(meta.get("evicted_budget", 0)),
+                "bytes": int(meta.get("evicted_bytes", 0))
+            },
+            "last_sweep": meta.get("last_sweep"),
+            "last_sweep_seconds": meta.get("last_sweep_seconds")
+        }
+
+    def _pinned(self) -> Set[str]:
+        """Propietarios en uso por trabajos pendientes o en curso"""
+        pinned = set()
+        for status in (JobStatus.PENDING, JobStatus.PROCESSING):
+            for job in self.jobs.list(status.value, limit=10000):
+                request = job.get("request") or {}
+                pinned.add(f"job/{job['job_id']}")
+                if request.get("corpus_id"):
+                    pinned.add(f"corpus/{request['corpus_id']}")
+                if request.get("tmx_id"):
+                    pinned.add(f"tmx/{request['tmx_id']}")
+        return pinned
+
+    def _add_meta(self, conn: sqlite3.Connection, key: str, value: float):
+        conn.execute(
+            "INSERT INTO retention_meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+            (key, value)
+        )
+
+    def _set_meta(self, conn: sqlite3.Connection, key: str, value: float):
+        conn.execute("INSERT OR REPLACE INTO retention_meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _conn(self) -> sqlite3.Connection:
+        """Conexión propia de cada hilo"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+
+def _disk_usage(path: Path) -> int:
+    """Bytes de un archivo o directorio (cada inodo una vez: hardlinks)"""
+    if path.is_file():
+        return path.stat().st_size
+    total = 0
+    seen = set()
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.stat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            if (st.st_dev, st.st_ino) not in seen:
+                seen.add((st.st_dev, st.st_ino))
+                total += st.st_size
+    return total
@@ -0,0 +1,201 @@
+import heapq
+import math
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.utils.terms import set_term_value, term_value
+
+
+def list_documents(corpus_dir: Path) -> List[Path]:
+    """Documentos del corpus (recursivo, en orden estable)"""
+    return sorted(p for p in Path(corpus_dir).rglob('*') if p.is_file())
+
+
+def split_corpus(corpus_dir: Path, target_dir: Path, num_shards: int) -> List[Path]:
+    """
+    Repartir los documentos de un corpus en fragmentos equilibrados
+
+    Cada documento va al fragmento con menos bytes hasta el momento
+    (de mayor a menor tamaño), así los fragmentos tardan parecido.
+    Los documentos se enlazan (hardlink) en vez de copiarse.
+
+    Args:
+        corpus_dir: Directorio del corpus
+        target_dir: Directorio donde crear shard-0, shard-1...
+        num_shards: Número de fragmentos
+
+    Returns:
+        Directorios de los fragmentos no vacíos
+    """
+    corpus_dir = Path(corpus_dir)
+    documents = list_documents(corpus_dir)
+    documents.sort(key=lambda p: p.stat().st_size, reverse=True)
+    num_shards = max(1, min(num_shards, len(documents)))
+
+    shards = [Path(target_dir) / f"shard-{i}" for i in range(num_shards)]
+    for shard in shards:
+        shard.mkdir(parents=True, exist_ok=True)
+
+    heap = [(0, i) for i in range(num_shards)]
+    for document in documents:
+        size, idx = heapq.heappop(heap)
+        # Aplanar subdirectorios sin colisiones de nombre
+        name = '__'.join(document.relative_to(corpus_dir).parts)
+        _link(document, shards[idx] / name)
+        heapq.heappush(heap, (size + document.stat().st_size, idx))
+
+    return shards
+
+
+def shard_count(corpus_dir: Path, max_shards: int, min_documents: int) -> Optional[int]:
+    """
+    Número de fragmentos para un corpus, o None si no compensa fragmentar
+
+    Args:
+        corpus_dir: Directorio del corpus
+        max_shards: Máximo de fragmentos (TERMSUITE_SHARDS)
+        min_documents: Documentos mínimos por fragmento
+
+    Returns:
+        Número de fragmentos (>= 2) o None
+    """
+    if max_shards < 2:
+        return None
+    shards = min(max_shards, len(list_documents(corpus_dir)) // max(min_documents, 1))
+    return shards if shards >= 2 else None
+
+
+def merge_results(results: List[Dict], min_frequency: int = 1) -> Dict:
+    """
+    Fusionar las terminologías de varios fragmentos
+
+    Los términos se agrupan por groupingKey: se suman frecuencia y
+    frecuencia documental, y se recalculan las propiedades que dependen
+    del tamaño del corpus (fNorm, spec, tfIdf, specIdf, rank) como lo hace
+    TermSuite (TermSpecificityComputer). El resultado conserva el formato
+    de entrada.
+
+    Args:
+        results: JSON de TermSuite de cada fragmento
+        min_frequency: Frecuencia mínima tras la fusión
+
+    Returns:
+        JSON de TermSuite de todo el corpus
+    """
+    if not results:
+        return {"terms": []}
+
+    metadata = dict(results[0].get('metadata', {}))
+    words_num = sum(r.get('metadata', {}).get('wordsNum', 0) for r in results)
+
+    merged: Dict[str, Dict] = {}
+    # Suma de spec * freq por término (para términos sin gfNorm)
+    weighted_spec: Dict[str, float] = {}
+
+    for result in results:
+        for term in result.get('terms', []):
+            key = term_value(term, 'groupingKey')
+            if key is None:
+                continue
+            freq = term_value(term, 'frequency', 0) or 0
+            spec = term_value(term, 'specificity')
+            if spec is not None:
+                weighted_spec[key] = weighted_spec.get(key, 0.0) + spec * freq
+
+            current = merged.get(key)
+            if current is None:
+                merged[key] = _copy_term(term)
+                continue
+            set_term_value(current, 'frequency', term_value(current, 'frequency', 0) + freq)
+            set_term_value(
+                current, 'documentFrequency',
+                term_value(current, 'documentFrequency', 0) + (term_value(term, 'documentFrequency', 0) or 0)
+            )
+            # La forma piloto es la del fragmento donde el término es más frecuente
+            if freq > current['_shard_freq'] and term_value(term, 'pilot') is not None:
+                set_term_value(current, 'pilot', term_value(term, 'pilot'))
+                current['_shard_freq'] = freq
+
+    terms = []
+    for key, term in merged.items():
+        term.pop('_shard_freq', None)
+        freq = term_value(term, 'frequency', 0)
+        if freq < min_frequency:
+            continue
+        _update_scores(term, key, freq, words_num, weighted_spec)
+        terms.append(term)
+
+    # Orden por especificidad descendente, como TermSuite
+    terms.sort(key=lambda t: term_value(t, 'specificity', 0) or 0, reverse=True)
+    for rank, term in enumerate(terms, 1):
+        if term_value(term, 'rank') is not None:
+            set_term_value(term, 'rank', rank)
+
+    merged_result = dict(results[0])
+    if metadata:
+        metadata['wordsNum'] = words_num
+        if 'spottedTermsNum' in metadata:
+            metadata['spottedTermsNum'] = sum(
+                r.get('metadata', {}).get('spottedTermsNum', 0) for r in results
+            )
+        merged_result['metadata'] = metadata
+    merged_result['terms'] = terms
+    if 'relations' in merged_result:
+        merged_result['relations'] = _merge_relations(results, set(
+            term_value(t, 'groupingKey') for t in terms
+        ))
+    return merged_result
+
+
+def _update_scores(term: Dict, key: str, freq: int, words_num: int, weighted_spec: Dict[str, float]):
+    dfreq = term_value(term, 'documentFrequency')
+    gfnorm = term_value(term, 'generalFrequencyNorm')
+
+    if words_num and gfnorm:
+        fnorm = 1000.0 * freq / words_num
+        set_term_value(term, 'frequencyNorm', fnorm)
+        spec = math.log10(1 + fnorm / gfnorm)
+    elif key in weighted_spec and freq:
+        spec = weighted_spec[key] / freq
+    else:
+        spec = None
+
+    if spec is not None:
+        set_term_value(term, 'specificity', spec)
+    if dfreq:
+        if term_value(term, 'tfIdf') is not None:
+            set_term_value(term, 'tfIdf', freq / dfreq)
+        if spec is not None and term_value(term, 'specIdf') is not None:
+            set_term_value(term, 'specIdf', spec / dfreq)
+
+
+def _merge_relations(results: List[Dict], keys: set) -> List[Dict]:
+    """Relaciones de todos los fragmentos, sin duplicados, entre términos conservados"""
+    relations = []
+    seen = set()
+    for result in results:
+        for relation in result.get('relations', []):
+            ident = (relation.get('from'), relation.get('to'), relation.get('type'))
+            if ident in seen or ident[0] not in keys or ident[1] not in keys:
+                continue
+            seen.add(ident)
+            relations.append(relation)
+    return relations
+
+
+def _copy_term(term: Dict) -> Dict:
+    copy = dict(term)
+    if isinstance(term.get('props'), dict):
+        copy['props'] = dict(term['props'])
+    copy['_shard_freq'] = term_value(term, 'frequency', 0) or 0
+    return copy
+
+
+def _link(source: Path, target: Path):
+    try:
+        os.link(source, target)
+    except OSError:
+        # Otro sistema de ficheros o sin soporte de hardlinks
+        shutil.copy(source, target)
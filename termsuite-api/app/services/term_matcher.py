@@ -0,0 +1,144 @@
+import heapq
+from typing import Dict, Iterable, List, Tuple
+
+
+class TermMatcher:
+    """
+    Búsqueda multipatrón de términos en segmentos (autómata de Aho-Corasick)
+
+    Cada segmento se recorre una sola vez, carácter a carácter, y se
+    obtienen a la vez todos los términos que contiene, sea cual sea el
+    número de términos. Sustituye al doble bucle términos × segmentos.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        """
+        Args:
+            patterns: Términos a buscar (se comparan tal cual; normalizar antes)
+        """
+        self.patterns: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        for pattern in patterns:
+            if pattern and pattern not in self._ids:
+                self._ids[pattern] = len(self.patterns)
+                self.patterns.append(pattern)
+                self._insert(pattern, self._ids[pattern])
+
+        self._build_failure_links()
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def pattern_id(self, pattern: str) -> int:
+        """Id de un patrón, o -1 si no está en el autómata"""
+        return self._ids.get(pattern, -1)
+
+    def find(self, text: str) -> Dict[int, bool]:
+        """
+        Buscar todos los patrones contenidos en un texto
+
+        Args:
+            text: Texto donde buscar
+
+        Returns:
+            Diccionario id de patrón -> True si aparece como palabra completa
+            en alguna de sus ocurrencias
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        patterns = self.patterns
+        found: Dict[int, bool] = {}
+        last = len(text) - 1
+        state = 0
+
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+
+            for pid in out[state]:
+                if found.get(pid):
+                    continue
+                start = pos - len(patterns[pid]) + 1
+                found[pid] = (
+                    (start == 0 or not text[start - 1].isalnum())
+                    and (pos == last or not text[pos + 1].isalnum())
+                )
+
+        return found
+
+    def match_segments(
+        self,
+        segments: Iterable[Tuple[str, str]],
+        limit: int = 5
+    ) -> Dict[int, Tuple[int, List[str]]]:
+        """
+        Buscar los patrones en una secuencia de segmentos con su traducción
+
+        Las coincidencias se ordenan por una puntuación barata: primero las
+        que cubren palabras completas y después las de segmentos más cortos
+        (mayor proporción del segmento cubierta por el término).
+
+        Args:
+            segments: Pares (segmento normalizado, traducción)
+            limit: Número máximo de traducciones a conservar por patrón
+
+        Returns:
+            Diccionario id de patrón -> (número total de segmentos
+            coincidentes, traducciones ordenadas de mejor a peor)
+        """
+        heaps: Dict[int, list] = {}
+        counts: Dict[int, int] = {}
+        patterns = self.patterns
+
+        for seq, (segment, target) in enumerate(segments):
+            if not segment:
+                continue
+            for pid, whole_word in self.find(segment).items():
+                score = (1.0 if whole_word else 0.0) + len(patterns[pid]) / len(segment)
+                counts[pid] = counts.get(pid, 0) + 1
+                heap = heaps.setdefault(pid, [])
+                # Menor seq primero a igual puntuación (orden del TMX)
+                entry = (score, -seq, target)
+                if len(heap) < limit:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+
+        return {
+            pid: (counts[pid], [target for _, _, target in sorted(heap, reverse=True)])
+            for pid, heap in heaps.items()
+        }
+
+    def _insert(self, pattern: str, pid: int):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = self._out[state] + (pid,)
+
+    def _build_failure_links(self):
+        """Enlaces de fallo en anchura; las salidas se heredan por el enlace"""
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = list(goto[0].values())
+        head = 0
+
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
@@ -0,0 +1,280 @@
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+from pathlib import Path
+from typing import Sequence, Tuple
+
+
+# Longitud de los n-gramas del índice invertido
+GRAM_SIZE = 3
+
+# Bits por carácter al empaquetar un trigrama en un entero (code points Unicode)
+CHAR_BITS = 21
+
+# Si el trigrama menos común está en más de 1/SCAN_RATIO de los términos, se recorre el blob
+SCAN_RATIO = 32
+
+# Índices abiertos que se conservan entre peticiones (por ruta base)
+MAX_OPEN_INDEXES = 64
+
+_OPEN: "OrderedDict[str, Tuple[Tuple[int, int], TermSearchIndex]]" = OrderedDict()
+_OPEN_LOCK = threading.Lock()
+
+
+class TermSearchIndex:
+    """
+    Índice de búsqueda por subcadena y prefijo sobre una lista de términos
+
+    Se construye una vez junto al índice del TMX o al almacén de un trabajo
+    y se abre con mmap. Ficheros, con la misma ruta base:
+
+        {base}.lower.bin        términos en minúsculas separados por NUL
+        {base}.starts.npy       inicio de cada término en el blob (y el final)
+        {base}.grams.npy        trigramas distintos (empaquetados en int64), ordenados
+        {base}.postings_offsets.npy  inicio de la lista de cada trigrama
+        {base}.postings.npy     ids de término de cada trigrama, ordenados
+        {base}.sorted.npy       ids de término en orden alfabético (minúsculas)
+
+    Una subcadena de tres o más caracteres se resuelve intersecando las
+    listas de sus trigramas y verificando solo los candidatos; un prefijo
+    con búsqueda binaria sobre el orden alfabético. Las subcadenas más
+    cortas recorren el blob de términos (sigue siendo una sola búsqueda en C).
+
+    Abrir un índice no recorre nada (todo son mmap); open() además reutiliza
+    el ya abierto de la misma ruta mientras no se reconstruya.
+    """
+
+    def __init__(self, base_path: Path):
+        self.base_path = str(base_path)
+        blob_path = Path(f"{self.base_path}.lower.bin")
+        # mmap no admite ficheros vacíos
+        if blob_path.stat().st_size:
+            with open(blob_path, 'rb') as f:
+                self.blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.blob = b''
+        self.starts = np.load(f"{self.base_path}.starts.npy", mmap_mode='r')
+        self.grams = np.load(f"{self.base_path}.grams.npy", mmap_mode='r')
+        self.postings_offsets = np.load(f"{self.base_path}.postings_offsets.npy", mmap_mode='r')
+        self.postings = np.load(f"{self.base_path}.postings.npy", mmap_mode='r')
+        self.sorted = np.load(f"{self.base_path}.sorted.npy", mmap_mode='r')
+
+    def __len__(self) -> int:
+        return len(self.sorted)
+
+    @staticmethod
+    def open(base_path: Path) -> 'TermSearchIndex':
+        """Índice abierto de una ruta, compartido mientras no se reconstruya"""
+        base_path = str(base_path)
+        stat = os.stat(f"{base_path}.sorted.npy")
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        with _OPEN_LOCK:
+            cached = _OPEN.get(base_path)
+            if cached is not None and cached[0] == stamp:
+                _OPEN.move_to_end(base_path)
+                return cached[1]
+        index = TermSearchIndex(base_path)
+        with _OPEN_LOCK:
+            _OPEN[base_path] = (stamp, index)
+            _OPEN.move_to_end(base_path)
+            while len(_OPEN) > MAX_OPEN_INDEXES:
+                _OPEN.popitem(last=False)
+        return index
+
+    @staticmethod
+    def exists(base_path: Path) -> bool:
+        """Comprobar si el índice está completo (sorted.npy se escribe el último)"""
+        return Path(f"{base_path}.sorted.npy").exists() and Path(f"{base_path}.starts.npy").exists()
+
+    @staticmethod
+    def build(base_path: Path, terms: Sequence[str], order: Sequence[int] = None) -> 'TermSearchIndex':
+        """
+        Construir el índice de una lista de términos
+
+        Args:
+            base_path: Ruta base (sin extensión) de los ficheros
+            terms: Términos en orden de id
+            order: Ids en orden alfabético sin mayúsculas, si ya se conocen
+
+        Returns:
+            Índice abierto
+        """
+        base_path = str(base_path)
+        lower = [term.lower() for term in terms]
+        if order is None:
+            order = sorted(range(len(lower)), key=lower.__getitem__)
+
+        joined = '\x00'.join(lower)
+        _write(f"{base_path}.lower.bin", joined.encode('utf-8'))
+        # Cada término ocupa sus bytes UTF-8 más el separador
+        sizes = np.fromiter((len(term.encode('utf-8')) + 1 for term in lower), dtype=np.int64, count=len(lower))
+        _save(f"{base_path}.starts.npy", np.concatenate(([0], np.cumsum(sizes))))
+
+        grams, offsets, postings = _build_postings(joined)
+        _save(f"{base_path}.grams.npy", grams)
+        _save(f"{base_path}.postings_offsets.npy", offsets)
+        _save(f"{base_path}.postings.npy", postings)
+        _save(f"{base_path}.sorted.npy", np.asarray(order, dtype=np.int32))
+
+        return TermSearchIndex.open(base_path)
+
+    def term(self, term_id: int) -> str:
+        """Término en minúsculas"""
+        start = self.starts[term_id]
+        end = self.starts[term_id + 1] - 1
+        return self.blob[start:end].decode('utf-8')
+
+    def contains(self, needle: str) -> np.ndarray:
+        """
+        Términos que contienen needle (sin distinguir mayúsculas)
+
+        Returns:
+            Ids de término, en orden creciente
+        """
+        needle = needle.lower()
+        if not needle:
+            return np.arange(len(self), dtype=np.int64)
+        if len(needle) < GRAM_SIZE:
+            return self._scan(needle)
+
+        # Listas de cada trigrama, de la más corta a la más larga
+        lists = []
+        for gram in set(_pack(needle).tolist()):
+            idx = int(np.searchsorted(self.grams, gram))
+            if idx == len(self.grams) or self.grams[idx] != gram:
+                return np.zeros(0, dtype=np.int64)
+            lists.append(self.postings[self.postings_offsets[idx]:self.postings_offsets[idx + 1]])
+        lists.sort(key=len)
+        # Trigramas muy comunes: recorrer el blob cuesta menos que intersecar
+        if len(lists[0]) * SCAN_RATIO > len(self):
+            return self._scan(needle)
+
+        candidates = np.asarray(lists[0])
+        for postings in lists[1:]:
+            candidates = np.intersect1d(candidates, postings, assume_unique=True)
+            if not len(candidates):
+                break
+
+        # Un único trigrama es la subcadena entera: no hay nada que verificar
+        if len(needle) == GRAM_SIZE:
+            return np.asarray(candidates, dtype=np.int64)
+        # Los trigramas no garantizan el orden: verificar cada candidato
+        return np.asarray(
+            [term_id for term_id in candidates.tolist() if needle in self.term(term_id)],
+            dtype=np.int64
+        )
+
+    def prefix(self, prefix: str) -> np.ndarray:
+        """
+        Términos que empiezan por prefix (sin distinguir mayúsculas)
+
+        Returns:
+            Ids de término, en orden alfabético
+        """
+        prefix = prefix.lower()
+        low, high = 0, len(self.sorted)
+        while low < high:
+            mid = (low + high) // 2
+            if self.term(int(self.sorted[mid])) < prefix:
+                low = mid + 1
+            else:
+                high = mid
+        first = low
+
+        high = len(self.sorted)
+        while low < high:
+            mid = (low + high) // 2
+            if self.term(int(self.sorted[mid])).startswith(prefix):
+                low = mid + 1
+            else:
+                high = mid
+        return np.asarray(self.sorted[first:low], dtype=np.int64)
+
+    def suggest(self, query: str, weights: np.ndarray, limit: int = 10) -> np.ndarray:
+        """
+        Sugerencias de autocompletado
+
+        Primero los términos que empiezan por query y, si no llegan a
+        limit, los que la contienen; cada grupo por peso descendente.
+
+        Args:
+            query: Texto escrito por el usuario
+            weights: Peso de cada término (frecuencia), indexado por id
+            limit: Máximo de sugerencias
+
+        Returns:
+            Ids de término sugeridos, en orden
+        """
+        ids = self.prefix(query)
+        picked = ids[np.argsort(-np.asarray(weights[ids]), kind='stable')[:limit]]
+        if len(picked) < limit:
+            others = np.setdiff1d(self.contains(query), picked)
+            others = others[np.argsort(-np.asarray(weights[others]), kind='stable')]
+            picked = np.concatenate([picked, others[:limit - len(picked)]])
+        return picked
+
+    def _scan(self, needle: str) -> np.ndarray:
+        """Subcadena corta: una pasada de re sobre el blob (ninguna coincidencia cruza un NUL)"""
+        matches = np.fromiter(
+            (match.start() for match in re.finditer(re.escape(needle.encode('utf-8')), self.blob)),
+            dtype=np.int64
+        )
+        ids = np.searchsorted(self.starts, matches, side='right') - 1
+        # Las coincidencias salen en orden: quitar repetidos consecutivos
+        return ids[np.concatenate(([True], ids[1:] != ids[:-1]))] if len(ids) else ids
+
+
+def _pack(text: str) -> np.ndarray:
+    """Trigramas de un texto empaquetados en int64 (uno por posición)"""
+    chars = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    if len(chars) < GRAM_SIZE:
+        return np.zeros(0, dtype=np.int64)
+    return _pack_chars(chars)
+
+
+def _build_postings(joined: str):
+    """Listas invertidas trigrama -> ids de término, vectorizadas sobre el texto unido"""
+    chars = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32)
+    if len(chars) < GRAM_SIZE:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, np.zeros(1, dtype=np.int64), empty.astype(np.int32)
+
+    # Término de cada posición y trigramas que no cruzan un separador
+    term_ids = np.cumsum(chars == 0, dtype=np.int64)
+    grams = _pack_chars(chars)
+    valid = (chars[:-2] != 0) & (chars[1:-1] != 0) & (chars[2:] != 0)
+    grams = grams[valid]
+    term_ids = term_ids[:-2][valid]
+
+    # Pares (trigrama, término) distintos, ordenados por trigrama y término
+    order = np.lexsort((term_ids, grams))
+    grams, term_ids = grams[order], term_ids[order]
+    keep = np.ones(len(grams), dtype=bool)
+    keep[1:] = (grams[1:] != grams[:-1]) | (term_ids[1:] != term_ids[:-1])
+    grams, term_ids = grams[keep], term_ids[keep]
+
+    unique, first = np.unique(grams, return_index=True)
+    offsets = np.append(first, len(grams)).astype(np.int64)
+    return unique, offsets, term_ids.astype(np.int32)
+
+
+def _pack_chars(chars: np.ndarray) -> np.ndarray:
+    """Trigrama que empieza en cada posición (21 bits por code point)"""
+    chars = chars.astype(np.int64)
+    return (chars[:-2] << (2 * CHAR_BITS)) | (chars[1:-1] << CHAR_BITS) | chars[2:]
+
+
+def _save(path: str, array: np.ndarray):
+    tmp_path = f"{path}.tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def _write(path: str, data: bytes):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
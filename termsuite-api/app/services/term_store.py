@@ -0,0 +1,255 @@
+import json
+import os
+import shutil
+import numpy as np
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from app.services.term_search import TermSearchIndex
+from app.utils.string_table import StringTable
+from app.utils.terms import term_label, term_value, term_words
+
+
+STORE_VERSION = 1
+
+# Columnas del almacén: nombre -> dtype (las de texto guardan ids de la tabla de cadenas)
+COLUMNS = {
+    'term': np.int32,
+    'key': np.int32,
+    'pattern': np.int32,
+    'words': np.int32,
+    'freq': np.int64,
+    'dfreq': np.int64,
+    'spec': np.float64,
+    'in_tmx': np.bool_
+}
+STRING_COLUMNS = ('term', 'key', 'pattern', 'words')
+
+# Permutaciones de orden precalculadas: columna -> descendente por defecto
+SORTS = {
+    'freq': True,
+    'dfreq': True,
+    'spec': True,
+    'term': False
+}
+
+# Filas decodificadas por bloque al recorrer el almacén
+ROWS_PER_BLOCK = 10000
+
+
+class TermStore:
+    """
+    Almacén columnar de los términos de un trabajo terminado
+
+    Se construye una vez al terminar la extracción, a partir del JSON de
+    TermSuite, y después se abre con mmap: leerlo no requiere parsear JSON
+    y solo se decodifican las filas que se recorren. Estructura:
+
+        meta.json               versión y número de términos
+        strings.bin / .offsets  tabla de cadenas (términos, claves, patrones, lemas)
+        {columna}.npy           una columna por fichero (ver COLUMNS)
+        sort.{columna}.npy      permutación de filas ordenada por la columna (ver SORTS)
+        search.*                índice de búsqueda por subcadena y prefijo (TermSearchIndex)
+
+    Las filas se guardan ordenadas por frecuencia descendente. Con las
+    permutaciones, una página de cualquier orden se lee sin reordenar.
+    """
+
+    def __init__(self, store_dir: Path):
+        self.store_dir = Path(store_dir)
+        with open(self.store_dir / 'meta.json', 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self._strings = None
+        self._search = None
+        self._columns = {}
+
+    @staticmethod
+    def exists(store_dir: Path) -> bool:
+        """Comprobar si hay un almacén construido en el directorio"""
+        return (Path(store_dir) / 'meta.json').exists()
+
+    @classmethod
+    def build(cls, results: Dict, store_dir: Path) -> 'TermStore':
+        """
+        Construir el almacén desde los resultados de TermSuite
+
+        Args:
+            results: JSON de TermSuite (términos planos o con "props")
+            store_dir: Directorio destino
+
+        Returns:
+            Almacén abierto
+        """
+        store_dir = Path(store_dir)
+        tmp_dir = store_dir.with_name(store_dir.name + '.tmp')
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+
+        strings: Dict[str, int] = {}
+        texts: List[str] = []
+
+        def intern(text) -> int:
+            text = '' if text is None else str(text)
+            sid = strings.get(text)
+            if sid is None:
+                sid = strings[text] = len(texts)
+                texts.append(text)
+            return sid
+
+        columns = {name: [] for name in COLUMNS}
+        for term in results.get('terms', []):
+            columns['term'].append(intern(term_label(term)))
+            columns['key'].append(intern(term_value(term, 'groupingKey', '')))
+            columns['pattern'].append(intern(term_value(term, 'pattern', '')))
+            columns['words'].append(intern(term_words(term)))
+            columns['freq'].append(term_value(term, 'frequency', 0) or 0)
+            columns['dfreq'].append(term_value(term, 'documentFrequency', 0) or 0)
+            columns['spec'].append(term_value(term, 'specificity', 0) or 0)
+            columns['in_tmx'].append(bool(term.get('in_tmx', False)))
+
+        arrays = {
+            name: np.asarray(values, dtype=COLUMNS[name])
+            for name, values in columns.items()
+        }
+        # Orden estable por frecuencia descendente (el del Excel)
+        order = np.argsort(-arrays['freq'], kind='stable')
+        for name, array in arrays.items():
+            arrays[name] = array[order]
+            np.save(tmp_dir / f"{name}.npy", arrays[name])
+
+        for name in SORTS:
+            np.save(tmp_dir / f"sort.{name}.npy", _sort_permutation(name, arrays, texts))
+
+        StringTable.write(tmp_dir / 'strings', texts)
+        TermSearchIndex.build(tmp_dir / 'search', [texts[sid] for sid in arrays['term'].tolist()])
+
+        meta = {"version": STORE_VERSION, "total": int(len(order))}
+        with open(tmp_dir / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        if store_dir.exists():
+            shutil.rmtree(store_dir)
+        os.replace(tmp_dir, store_dir)
+
+        return cls(store_dir)
+
+    def __len__(self) -> int:
+        return self.meta.get('total', 0)
+
+    def column(self, name: str) -> np.ndarray:
+        """Columna completa (mmap, de solo lectura)"""
+        if name not in COLUMNS:
+            raise KeyError(f"Columna desconocida: {name}")
+        if name not in self._columns:
+            self._columns[name] = np.load(self.store_dir / f"{name}.npy", mmap_mode='r')
+        return self._columns[name]
+
+    def permutation(self, name: str) -> np.ndarray:
+        """Filas ordenadas por una columna, en su sentido por defecto (SORTS)"""
+        if name not in SORTS:
+            raise KeyError(f"Orden desconocido: {name}")
+        key = f"sort.{name}"
+        if key not in self._columns:
+            self._columns[key] = np.load(self.store_dir / f"{key}.npy", mmap_mode='r')
+        return self._columns[key]
+
+    def query(
+        self,
+        sort_by: str = 'freq',
+        descending: bool = None,
+        offset: int = 0,
+        limit: int = 50,
+        filters: Dict[str, Tuple] = None,
+        contains: str = None
+    ) -> Tuple[int, np.ndarray]:
+        """
+        Seleccionar una página de filas
+
+        Sin filtros, la página es un corte de la permutación precalculada
+        (coste proporcional al tamaño de página). Los filtros se evalúan
+        vectorizados sobre las columnas completas.
+
+        Args:
+            sort_by: Columna de orden (ver SORTS)
+            descending: Sentido; None = el de por defecto de la columna
+            offset: Filas a saltar
+            limit: Tamaño de página
+            filters: Columna -> (mínimo, máximo); None en un extremo = sin límite
+            contains: Subcadena del término (sin distinguir mayúsculas)
+
+        Returns:
+            Total de filas que cumplen los filtros e índices de fila de la página
+        """
+        order = self.permutation(sort_by)
+        if descending is not None and descending != SORTS[sort_by]:
+            order = order[::-1]
+
+        active = {
+            name: bounds for name, bounds in (filters or {}).items()
+            if any(bound is not None for bound in bounds)
+        }
+        if active or contains:
+            mask = np.ones(len(self), dtype=bool)
+            if contains:
+                matches = np.zeros(len(self), dtype=bool)
+                matches[self.search_index().contains(contains)] = True
+                mask &= matches
+            for name, (low, high) in active.items():
+                column = self.column(name)
+                if low is not None:
+                    mask &= column >= low
+                if high is not None:
+                    mask &= column <= high
+            order = order[mask[order]]
+
+        return len(order), np.asarray(order[offset:offset + limit])
+
+    def iter_rows(
+        self,
+        fields: Sequence[str] = tuple(COLUMNS),
+        order: np.ndarray = None
+    ) -> Iterator[tuple]:
+        """
+        Recorrer filas como tuplas de valores Python
+
+        Args:
+            fields: Columnas a devolver, en orden
+            order: Índices de fila a recorrer (por defecto todas, en orden
+                de frecuencia descendente)
+
+        Yields:
+            Una tupla por fila, con los textos ya decodificados
+        """
+        total = len(self) if order is None else len(order)
+        for start in range(0, total, ROWS_PER_BLOCK):
+            rows = slice(start, min(start + ROWS_PER_BLOCK, total))
+            block = []
+            for name in fields:
+                values = self.column(name)[rows] if order is None else self.column(name)[order[rows]]
+                if name in STRING_COLUMNS:
+                    block.append(self.strings.take(values))
+                else:
+                    block.append(values.tolist())
+            yield from zip(*block)
+
+    def search_index(self) -> TermSearchIndex:
+        """Índice de búsqueda de los términos (ids = filas del almacén)"""
+        if self._search is None:
+            self._search = TermSearchIndex.open(self.store_dir / 'search')
+        return self._search
+
+    @property
+    def strings(self) -> StringTable:
+        if self._strings is None:
+            self._strings = StringTable(self.store_dir / 'strings')
+        return self._strings
+
+
+def _sort_permutation(name: str, arrays: Dict[str, np.ndarray], texts: Sequence[str]) -> np.ndarray:
+    """Permutación estable de filas por una columna, en su sentido por defecto"""
+    if name == 'term':
+        labels = [texts[sid].lower() for sid in arrays['term'].tolist()]
+        return np.asarray(sorted(range(len(labels)), key=labels.__getitem__), dtype=np.int64)
+    values = arrays[name]
+    return np.argsort(-values if SORTS[name] else values, kind='stable').astype(np.int64)
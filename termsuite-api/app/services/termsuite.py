@@ -1,24 +1,75 @@
+import json
+import logging
+import shutil
 import subprocess
 import os
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from app.services.admission import MemoryBudget, estimate_heap_mb, parse_heap_mb, with_heap
+from app.services.jvm_pool import JVMWorkerPool, WorkerError, WorkerStartError, WorkerTimeout, kill_on_cancel
+from app.services.progress import ExtractionProgress, merge_snapshots
+from app.services.sharding import list_documents, merge_results, shard_count, split_corpus
+
+
+logger = logging.getLogger(__name__)
+
+# Clase del preprocesador de TermSuite (no es la Main-Class del JAR)
+PREPROCESSOR_CLASS = 'fr.univnantes.termsuite.tools.PreprocessorCLI'
 
 
 class TermSuiteService:
     """Servicio para ejecutar TermSuite JAR"""
     
-    def __init__(self):
+    def __init__(self, memory_budget: MemoryBudget = None):
+        """
+        Args:
+            memory_budget: Presupuesto de memoria del host; los workers del
+                pool (y las JVM que los sustituyen) reservan en él su heap
+        """
+        self.memory_budget = memory_budget
         self.jar_path = os.getenv(
             'TERMSUITE_JAR', 
             '/app/termsuite/termsuite-core-3.0.10.jar'
         )
         self.java_opts = os.getenv('JAVA_OPTS', '-Xms1g -Xmx4g')
+        # Tope del heap por JVM (los -Xmx por trabajo no lo superan)
+        self.max_heap_mb = parse_heap_mb(self.java_opts.split()) or 4096
+        self.timeout = 600  # 10 minutos
+        
+        # Pool de JVMs calientes (0 = una JVM nueva por extracción)
+        workers = int(os.getenv('TERMSUITE_WORKERS', '0'))
+        self.pool = JVMWorkerPool(
+            workers, self.jar_path, self.java_opts.split(), memory_budget=memory_budget
+        ) if workers > 0 else None
+        
+        # Extracción fragmentada (map-reduce) para corpus grandes
+        self.max_shards = int(os.getenv('TERMSUITE_SHARDS', '0'))
+        self.shard_min_documents = int(os.getenv('TERMSUITE_SHARD_MIN_DOCS', '50'))
+        
+        # Preprocesado (POS, lematización) guardado por corpus e idioma
+        self.tagger_home = os.getenv('TAGGER_HOME')
+        # PreprocessorCLI exige -t: sin TAGGER_HOME no se preprocesa
+        self.reuse_preprocessing = (
+            os.getenv('TERMSUITE_REUSE_PREPROCESSING', 'true').lower() == 'true'
+            and bool(self.tagger_home)
+        )
+        self._prepare_locks: Dict[str, threading.Lock] = {}
+        self._prepare_locks_guard = threading.Lock()
     
     def extract_terms(
         self, 
         corpus_path: str, 
         output_path: str, 
         language: str = 'en',
-        min_frequency: int = 2
+        min_frequency: int = 2,
+        on_progress: Callable[[Dict], None] = None,
+        heap_mb: int = None,
+        cancel: threading.Event = None
     ):
         """
         Ejecutar TermSuite para extraer términos
@@ -28,36 +79,401 @@ class TermSuiteService:
             output_path: Ruta de salida JSON
             language: Idioma (en, es, fr, de, etc.)
             min_frequency: Frecuencia mínima
+            on_progress: Callback opcional con el progreso estimado a partir
+                de los logs (ver ExtractionProgress.snapshot)
+            heap_mb: -Xmx de cada JVM lanzada (ver memory_plan); None usa JAVA_OPTS
+            cancel: Evento opcional; si se activa se matan las JVM del trabajo
         """
         if not Path(self.jar_path).exists():
             raise FileNotFoundError(
                 f"TermSuite JAR no encontrado en: {self.jar_path}"
             )
         
+        on_line = self._progress_listener(on_progress)
+        
+        # Corpus ya preprocesado: solo la etapa de extracción
+        prepared = self.prepared_path(corpus_path, language)
+        if self.reuse_preprocessing and self._is_prepared(prepared):
+            return self._extract_single(
+                corpus_path, output_path, language, min_frequency, on_line,
+                prepared=prepared, heap_mb=heap_mb, cancel=cancel
+            )
+        
+        shards = shard_count(Path(corpus_path), self.max_shards, self.shard_min_documents)
+        if shards:
+            return self._extract_sharded(
+                corpus_path, output_path, language, min_frequency, shards, on_progress, heap_mb, cancel
+            )
+        
+        if self.reuse_preprocessing:
+            try:
+                self.preprocess(corpus_path, language, on_line, heap_mb, cancel)
+            except Exception as e:
+                if cancel is not None and cancel.is_set():
+                    raise
+                # Sin preprocesado reutilizable: pipeline completo como antes
+                logger.warning("No se pudo preprocesar %s, se usa el pipeline completo: %s", corpus_path, e)
+            else:
+                return self._extract_single(
+                    corpus_path, output_path, language, min_frequency, on_line,
+                    prepared=prepared, heap_mb=heap_mb, cancel=cancel
+                )
+        
+        return self._extract_single(
+            corpus_path, output_path, language, min_frequency, on_line, heap_mb=heap_mb, cancel=cancel
+        )
+    
+    def memory_plan(self, corpus_path: str, language: str) -> Tuple[int, int]:
+        """
+        JVMs simultáneas de una extracción y heap de cada una
+        
+        El heap se estima a partir del tamaño, el número de documentos y el
+        idioma del corpus (ver estimate_heap_mb); en la extracción
+        fragmentada cada JVM procesa su parte. Los workers del pool
+        reservan su heap al arrancar (ver JVMWorkerPool), así que el
+        trabajo no reserva nada más para ellos.
+        
+        Args:
+            corpus_path: Ruta al corpus
+            language: Idioma del corpus
+            
+        Returns:
+            (número de JVMs, MB de heap por JVM)
+        """
+        documents = list_documents(Path(corpus_path))
+        jvms = 1
+        if not (self.reuse_preprocessing and self._is_prepared(self.prepared_path(corpus_path, language))):
+            jvms = shard_count(Path(corpus_path), self.max_shards, self.shard_min_documents) or 1
+        
+        if self.pool is not None:
+            return min(jvms, self.pool.size), 0
+        
+        corpus_bytes = sum(document.stat().st_size for document in documents)
+        heap_mb = estimate_heap_mb(
+            corpus_bytes // jvms, len(documents) // jvms, language, self.max_heap_mb
+        )
+        return jvms, heap_mb
+    
+    def preprocess(
+        self,
+        corpus_path: str,
+        language: str,
+        on_line: Callable[[str], None] = None,
+        heap_mb: int = None,
+        cancel: threading.Event = None
+    ) -> Path:
+        """
+        Preprocesar un corpus una sola vez por idioma (PreprocessorCLI)
+        
+        El resultado (terminología preparada con todas las ocurrencias) se
+        guarda junto al corpus y las extracciones siguientes parten de él
+        con --from-prepared-corpus, sin repetir tokenización, POS y
+        lematización.
+        
+        Args:
+            corpus_path: Ruta al corpus
+            language: Idioma del corpus
+            on_line: Callback opcional para cada línea de log
+            heap_mb: -Xmx de la JVM; None usa JAVA_OPTS
+            cancel: Evento opcional; si se activa se mata la JVM
+            
+        Returns:
+            Ruta del corpus preprocesado
+        """
+        prepared = self.prepared_path(corpus_path, language)
+        
+        with self._prepare_lock(prepared):
+            # Otro trabajo pudo prepararlo mientras se esperaba el lock
+            if self._is_prepared(prepared):
+                return prepared
+            
+            # Temporal propio del proceso y el hilo: el lock solo vale dentro
+            # del proceso y varios workers pueden preparar el mismo corpus
+            tmp_path = prepared.with_name(f"{prepared.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            args = [
+                '-c', str(corpus_path),
+                '-l', language,
+                *self._tagger_args(),
+                '--json', str(tmp_path),
+                '--info'
+            ]
+            try:
+                self._run('preprocess', args, language, on_line, heap_mb, cancel)
+                os.replace(tmp_path, prepared)
+            finally:
+                if tmp_path.exists():
+                    tmp_path.unlink()
+        
+        return prepared
+    
+    def prepared_path(self, corpus_path: str, language: str) -> Path:
+        """Ruta del corpus preprocesado: corpus/{corpus_id}.prepared-{idioma}.json"""
+        corpus_path = Path(corpus_path)
+        return corpus_path.parent / f"{corpus_path.name}.prepared-{language}.json"
+    
+    def shutdown(self):
+        """Parar los workers JVM del pool"""
+        if self.pool is not None:
+            self.pool.shutdown()
+    
+    def _extract_single(
+        self,
+        corpus_path: str,
+        output_path: str,
+        language: str,
+        min_frequency: int,
+        on_line: Callable[[str], None] = None,
+        prepared: Path = None,
+        heap_mb: int = None,
+        cancel: threading.Event = None
+    ) -> str:
+        """Una extracción de TermSuite (desde el texto o un corpus preprocesado)"""
+        args = self._extractor_args(corpus_path, output_path, language, min_frequency, prepared)
+        return self._run('extract', args, language, on_line, heap_mb, cancel)
+    
+    def _run(
+        self,
+        command: str,
+        args: List[str],
+        language: str,
+        on_line: Callable[[str], None] = None,
+        heap_mb: int = None,
+        cancel: threading.Event = None
+    ) -> str:
+        """
+        Ejecutar una herramienta de TermSuite (worker del pool o JVM nueva)
+        
+        Args:
+            command: 'extract' (TerminologyExtractorCLI) o 'preprocess' (PreprocessorCLI)
+            args: Argumentos de la herramienta
+            language: Idioma (afinidad de workers)
+            on_line: Callback opcional para cada línea de log
+            heap_mb: -Xmx de la JVM nueva; None usa JAVA_OPTS
+            cancel: Evento opcional; si se activa se mata la JVM
+        """
+        if self.pool is not None:
+            try:
+                return self._run_in_pool(command, args, language, on_line, cancel)
+            except WorkerStartError as e:
+                # JAR sin TermSuiteWorker o JVM que no arranca: modo clásico
+                logger.warning("Pool de workers JVM no disponible, se usa una JVM por trabajo: %s", e)
+                if self.memory_budget is not None:
+                    # El trabajo no reservó heap para esta JVM (contaba con el pool)
+                    with self.memory_budget.reserve(
+                        f"jvm/{uuid.uuid4().hex}",
+                        heap_mb or self.max_heap_mb,
+                        cancel=cancel.is_set if cancel is not None else None
+                    ):
+                        return self._run_process(command, args, on_line, heap_mb, cancel)
+        
+        return self._run_process(command, args, on_line, heap_mb, cancel)
+    
+    def _run_process(
+        self,
+        command: str,
+        args: List[str],
+        on_line: Callable[[str], None] = None,
+        heap_mb: int = None,
+        cancel: threading.Event = None
+    ) -> str:
+        """Ejecutar una herramienta de TermSuite en una JVM nueva"""
         # Construir comando
+        if command == 'preprocess':
+            entry = ['-cp', self.jar_path, PREPROCESSOR_CLASS]
+        else:
+            entry = ['-jar', self.jar_path]
+        java_opts = self.java_opts.split()
+        if heap_mb:
+            java_opts = with_heap(java_opts, heap_mb)
         cmd = [
             'java',
-            *self.java_opts.split(),
-            '-jar', self.jar_path,
-            '-c', corpus_path,
-            '-l', language,
-            '--json', output_path,
-            '--post-filter-property', 'freq',
-            '--post-filter-th', str(min_frequency),
-            '--info'
+            *java_opts,
+            *entry,
+            *args
         ]
         
-        # Ejecutar
+        # Ejecutar leyendo la salida línea a línea (progreso en vivo)
         try:
-            result = subprocess.run(
+            process = subprocess.Popen(
                 cmd,
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
                 text=True,
-                check=True,
-                timeout=600  # 10 minutos timeout
+                encoding='utf-8',
+                errors='replace',
+                bufsize=1
             )
-            return result.stdout
-        except subprocess.CalledProcessError as e:
-            raise Exception(f"Error ejecutando TermSuite: {e.stderr}")
-        except subprocess.TimeoutExpired:
+        except OSError as e:
+            raise Exception(f"Error ejecutando TermSuite: {e}")
+        
+        timer = threading.Timer(self.timeout, process.kill)
+        timer.start()
+        done = threading.Event()
+        if cancel is not None:
+            kill_on_cancel(process, cancel, done)
+        output = deque(maxlen=500)
+        try:
+            for line in process.stdout:
+                line = line.rstrip('\n')
+                output.append(line)
+                if on_line:
+                    on_line(line)
+            returncode = process.wait()
+        finally:
+            done.set()
+            timed_out = not timer.is_alive()
+            timer.cancel()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        
+        if cancel is not None and cancel.is_set():
+            raise Exception("Extracción de TermSuite cancelada")
+        if timed_out:
             raise Exception("TermSuite excedió el tiempo límite de ejecución")
+        log = '\n'.join(output)
+        if returncode != 0:
+            raise Exception(f"Error ejecutando TermSuite: {log}")
+        return log
+    
+    def _extract_sharded(
+        self,
+        corpus_path: str,
+        output_path: str,
+        language: str,
+        min_frequency: int,
+        shards: int,
+        on_progress: Callable[[Dict], None] = None,
+        heap_mb: int = None,
+        cancel: threading.Event = None
+    ) -> str:
+        """
+        Extracción map-reduce: un TermSuite por fragmento del corpus, en
+        paralelo, y fusión de las terminologías por groupingKey
+        
+        Los fragmentos se extraen sin umbral de frecuencia (un término poco
+        frecuente en cada fragmento puede superarlo en el total); el umbral
+        se aplica tras la fusión.
+        """
+        work_dir = Path(output_path).with_suffix('.shards')
+        shutil.rmtree(work_dir, ignore_errors=True)
+        
+        try:
+            shard_dirs = split_corpus(Path(corpus_path), work_dir, shards)
+            shard_outputs = [work_dir / f"{d.name}.json" for d in shard_dirs]
+            
+            snapshots = [None] * len(shard_dirs)
+            lock = threading.Lock()
+            
+            def shard_listener(idx: int) -> Callable[[str], None]:
+                def on_update(update: Dict):
+                    with lock:
+                        snapshots[idx] = update
+                        combined = merge_snapshots(snapshots)
+                    on_progress(combined)
+                return self._progress_listener(on_update if on_progress else None)
+            
+            logger.info("Extracción fragmentada: %d fragmentos de %s", len(shard_dirs), corpus_path)
+            with ThreadPoolExecutor(
+                max_workers=len(shard_dirs), thread_name_prefix='termsuite-shard'
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        self._extract_single,
+                        str(shard_dir), str(shard_output), language, 1, shard_listener(idx),
+                        heap_mb=heap_mb, cancel=cancel
+                    )
+                    for idx, (shard_dir, shard_output) in enumerate(zip(shard_dirs, shard_outputs))
+                ]
+                logs = [future.result() for future in futures]
+            
+            results = []
+            for shard_output in shard_outputs:
+                with open(shard_output, 'r', encoding='utf-8') as f:
+                    results.append(json.load(f))
+            
+            merged = merge_results(results, min_frequency)
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(merged, f, ensure_ascii=False)
+            
+            return '\n'.join(logs)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def _run_in_pool(
+        self,
+        command: str,
+        args: List[str],
+        language: str,
+        on_line: Callable[[str], None] = None,
+        cancel: threading.Event = None
+    ) -> str:
+        """Ejecutar una herramienta de TermSuite en un worker JVM caliente"""
+        try:
+            response = self.pool.extract(
+                args, language, self.timeout, on_line=on_line, command=command, cancel=cancel
+            )
+        except WorkerStartError:
+            raise
+        except WorkerTimeout:
+            raise Exception("TermSuite excedió el tiempo límite de ejecución")
+        except WorkerError as e:
+            if cancel is not None and cancel.is_set():
+                raise Exception("Extracción de TermSuite cancelada")
+            raise Exception(f"Error ejecutando TermSuite: {e}")
+        
+        if response.get('status') != 'ok':
+            raise Exception(
+                f"Error ejecutando TermSuite: {response.get('error')}\n{response.get('log', '')}"
+            )
+        return response.get('log', '')
+    
+    def _progress_listener(self, on_progress: Callable[[Dict], None]) -> Callable[[str], None]:
+        """Convertir líneas de log en llamadas a on_progress"""
+        if on_progress is None:
+            return None
+        
+        progress = ExtractionProgress()
+        
+        def on_line(line: str):
+            update = progress.feed(line)
+            if update:
+                on_progress(update)
+        
+        return on_line
+    
+    def _extractor_args(
+        self,
+        corpus_path: str,
+        output_path: str,
+        language: str,
+        min_frequency: int,
+        prepared: Path = None
+    ) -> List[str]:
+        """Argumentos de TerminologyExtractorCLI"""
+        if prepared is not None:
+            source = ['--from-prepared-corpus', str(prepared)]
+        else:
+            source = ['-c', corpus_path, *self._tagger_args()]
+        return [
+            *source,
+            '-l', language,
+            '--json', output_path,
+            '--post-filter-property', 'freq',
+            '--post-filter-th', str(min_frequency),
+            '--info'
+        ]
+    
+    def _tagger_args(self) -> List[str]:
+        return ['-t', self.tagger_home] if self.tagger_home else []
+    
+    def _is_prepared(self, prepared: Path) -> bool:
+        """Corpus preprocesado existente y no anterior al JAR actual"""
+        try:
+            return prepared.stat().st_mtime >= os.stat(self.jar_path).st_mtime
+        except OSError:
+            return False
+    
+    def _prepare_lock(self, prepared: Path) -> threading.Lock:
+        with self._prepare_locks_guard:
+            return self._prepare_locks.setdefault(str(prepared), threading.Lock())
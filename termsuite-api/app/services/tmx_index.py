@@ -0,0 +1,416 @@
+import json
+import os
+import shutil
+import threading
+import numpy as np
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.services.term_search import TermSearchIndex
+from app.services.tmx_parser import TMXParser
+from app.utils.string_table import StringTable
+
+
+INDEX_VERSION = 1
+
+# Vista de los <tuv> sin atributo de idioma (se suman a todas las vistas)
+UNLABELED = ''
+
+# Columnas derivadas de cada vista, precalculadas para filtrar y ordenar
+FEATURES = ('length', 'words', 'digit', 'alpha')
+
+# Criterios de orden de select(): nombre -> columna
+SORT_KEYS = {
+    'frequency': 'freq',
+    'alphabetical': 'alpha',
+    'length': 'length',
+    'words': 'words'
+}
+
+
+class TMXIndex:
+    """
+    Índice binario persistente de una memoria TMX
+
+    Se construye una vez al subir el TMX y se abre con mmap en cada
+    petición posterior. Estructura del directorio:
+
+        meta.json               idioma activo, idiomas y totales por vista
+        strings.bin / .offsets  tabla de cadenas (términos y segmentos)
+        {lang}.terms.npy        ids de términos de la vista, en orden alfabético
+        {lang}.freq.npy         frecuencia de cada término de la vista
+        {lang}.pairs.npy        pares (origen, destino) con {lang} como origen
+        {lang}.length.npy       longitud en caracteres de cada término
+        {lang}.words.npy        número de palabras de cada término
+        {lang}.digit.npy        si el término contiene dígitos
+        {lang}.alpha.npy        posición del término en orden alfabético sin mayúsculas
+        {lang}.lower.bin, ...   índice de búsqueda por subcadena y prefijo (TermSearchIndex)
+
+    Las vistas se indexan por código base de idioma (en, es, ...); los
+    <tuv> sin idioma forman la vista "_".
+    """
+
+    def __init__(self, index_dir: Path):
+        self.index_dir = Path(index_dir)
+        with open(self.index_dir / 'meta.json', 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self._strings = None
+        self._arrays = {}
+
+    @staticmethod
+    def exists(index_dir: Path) -> bool:
+        """Comprobar si hay un índice construido en el directorio"""
+        return (Path(index_dir) / 'meta.json').exists()
+
+    @classmethod
+    def build(
+        cls,
+        tmx_path: Path,
+        index_dir: Path,
+        parser: TMXParser = None,
+        language: str = None
+    ) -> 'TMXIndex':
+        """
+        Construir el índice en una sola pasada sobre el TMX
+
+        Args:
+            tmx_path: Ruta al archivo TMX
+            index_dir: Directorio destino del índice
+            parser: Parser a usar (por defecto uno nuevo)
+            language: Idioma activo inicial
+
+        Returns:
+            Índice abierto
+        """
+        parser = parser or TMXParser()
+        index_dir = Path(index_dir)
+        # Temporal propio de cada construcción: dos peticiones pueden
+        # construir el mismo índice a la vez sin borrarse los arrays
+        unique = f"{os.getpid()}.{threading.get_ident()}"
+        tmp_dir = index_dir.with_name(f"{index_dir.name}.{unique}.tmp")
+        tmp_dir.mkdir(parents=True)
+        try:
+            cls._write(tmx_path, tmp_dir, parser, language)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        # Apartar el índice anterior (si lo hay) y poner el nuevo en su sitio
+        old_dir = index_dir.with_name(f"{index_dir.name}.{unique}.old")
+        try:
+            os.replace(index_dir, old_dir)
+        except FileNotFoundError:
+            old_dir = None
+        try:
+            os.replace(tmp_dir, index_dir)
+        except OSError:
+            # Otra construcción simultánea lo puso antes: vale el suyo
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not TMXIndex.exists(index_dir):
+                raise
+        if old_dir is not None:
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+        return cls(index_dir)
+
+    @staticmethod
+    def _write(tmx_path: Path, tmp_dir: Path, parser: TMXParser, language: Optional[str]):
+        """Escribir los arrays, la tabla de cadenas y meta.json en tmp_dir"""
+        strings: Dict[str, int] = {}
+        texts: List[str] = []
+
+        def intern(text: str) -> int:
+            sid = strings.get(text)
+            if sid is None:
+                sid = strings[text] = len(texts)
+                texts.append(text)
+            return sid
+
+        counters: Dict[str, Counter] = {}
+        pairs: Dict[str, List[Tuple[int, int]]] = {}
+        languages = set()
+        units = 0
+
+        for variants in parser.iter_units(tmx_path):
+            units += 1
+            bases = set()
+
+            for lang_attr, text in variants:
+                base = lang_attr.split('-')[0].lower() if lang_attr else UNLABELED
+                if base:
+                    bases.add(base)
+                term = text.strip() if text else ''
+                if term:
+                    counters.setdefault(base, Counter())[intern(term)] += 1
+
+            languages.update(bases)
+
+            # Pares de traducción para cada idioma de la unidad como origen
+            for base in bases:
+                pair = parser.translation_pair(variants, base)
+                if pair and pair['source'] and pair['target']:
+                    pairs.setdefault(base, []).append(
+                        (intern(pair['source']), intern(pair['target']))
+                    )
+
+        languages = sorted(languages)
+        unlabeled = counters.get(UNLABELED, Counter())
+
+        views = {}
+        for view in languages + ([UNLABELED] if unlabeled else []):
+            counter = counters.get(view, Counter())
+            if view != UNLABELED:
+                counter.update(unlabeled)
+
+            ids = sorted(counter, key=texts.__getitem__)
+            freqs = [counter[sid] for sid in ids]
+            view_pairs = pairs.get(view, [])
+
+            np.save(tmp_dir / _array_file(view, 'terms'), np.asarray(ids, dtype=np.int32))
+            np.save(tmp_dir / _array_file(view, 'freq'), np.asarray(freqs, dtype=np.int64))
+            np.save(
+                tmp_dir / _array_file(view, 'pairs'),
+                np.asarray(view_pairs, dtype=np.int32).reshape(-1, 2)
+            )
+            _write_features(tmp_dir, view, [texts[sid] for sid in ids])
+            views[view] = {
+                "total": len(ids),
+                "total_occurrences": int(sum(freqs)),
+                "pairs": len(view_pairs)
+            }
+
+        StringTable.write(tmp_dir / 'strings', texts)
+
+        meta = {
+            "version": INDEX_VERSION,
+            "language": language,
+            "available_languages": languages,
+            "units": units,
+            "views": views
+        }
+        with open(tmp_dir / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    @property
+    def language(self) -> Optional[str]:
+        """Idioma activo de la memoria (el elegido al subir o extraer)"""
+        return self.meta.get('language')
+
+    @property
+    def available_languages(self) -> List[str]:
+        return self.meta.get('available_languages', [])
+
+    @property
+    def units(self) -> int:
+        return self.meta.get('units', 0)
+
+    def set_language(self, language: str):
+        """Cambiar el idioma activo (solo reescribe meta.json)"""
+        self.meta['language'] = language
+        tmp_path = self.index_dir / 'meta.json.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_dir / 'meta.json')
+
+    def stats(self, language: str = None) -> Dict[str, int]:
+        """Totales de la vista de un idioma (por defecto, el activo)"""
+        view = self._view(language)
+        empty = {"total": 0, "total_occurrences": 0, "pairs": 0}
+        return self.meta['views'].get(view, empty) if view is not None else empty
+
+    def terms(self, language: str = None) -> List[str]:
+        """Términos únicos de un idioma, en orden alfabético"""
+        view = self._view(language)
+        if view is None:
+            return []
+        return self.strings.take(self._array(view, 'terms'))
+
+    def frequencies(self, language: str = None) -> Dict[str, int]:
+        """Frecuencia de cada término de un idioma"""
+        view = self._view(language)
+        if view is None:
+            return {}
+        terms = self.strings.take(self._array(view, 'terms'))
+        return dict(zip(terms, self._array(view, 'freq').tolist()))
+
+    def select(
+        self,
+        language: str = None,
+        min_frequency: int = None,
+        min_words: int = None,
+        max_words: int = None,
+        exclude_numbers: bool = False,
+        contains: str = None,
+        sort_by: str = 'frequency',
+        descending: bool = True,
+        top_n: int = None
+    ) -> np.ndarray:
+        """
+        Filtrar y ordenar los términos de un idioma con operaciones vectorizadas
+
+        Los filtros son máscaras sobre las columnas precalculadas y la
+        subcadena se busca en el blob de términos en minúsculas. Con top_n
+        solo se ordenan los candidatos que devuelve argpartition. Los
+        empates conservan el orden alfabético del índice, igual que un
+        sort estable de Python.
+
+        Args:
+            language: Idioma (por defecto, el activo)
+            min_frequency: Frecuencia mínima
+            min_words: Mínimo número de palabras
+            max_words: Máximo número de palabras
+            exclude_numbers: Excluir términos con dígitos
+            contains: Subcadena (sin distinguir mayúsculas)
+            sort_by: frequency, alphabetical, length o words (otro valor: sin ordenar)
+            descending: Orden descendente
+            top_n: Quedarse con los N primeros tras ordenar
+
+        Returns:
+            Posiciones de los términos en la vista, en el orden pedido
+        """
+        view = self._view(language)
+        if view is None:
+            return np.zeros(0, dtype=np.int64)
+
+        mask = np.ones(len(self._array(view, 'terms')), dtype=bool)
+        if min_frequency:
+            mask &= self._array(view, 'freq') >= min_frequency
+        if min_words:
+            mask &= self._array(view, 'words') >= min_words
+        if max_words:
+            mask &= self._array(view, 'words') <= max_words
+        if exclude_numbers:
+            mask &= ~self._array(view, 'digit')
+        if contains:
+            mask &= self._contains(view, contains)
+        positions = np.flatnonzero(mask)
+
+        if sort_by in SORT_KEYS:
+            keys = np.asarray(self._array(view, SORT_KEYS[sort_by])[positions], dtype=np.int64)
+            positions = positions[_stable_top(-keys if descending else keys, top_n)]
+        if top_n:
+            positions = positions[:top_n]
+        return positions
+
+    def term_columns(self, positions: np.ndarray, language: str = None) -> Dict[str, List]:
+        """
+        Valores de las filas seleccionadas con select()
+
+        Returns:
+            term, freq, length y words como listas alineadas con positions
+        """
+        view = self._view(language)
+        if view is None:
+            return {"term": [], "freq": [], "length": [], "words": []}
+        return {
+            "term": self.strings.take(self._array(view, 'terms')[positions]),
+            "freq": self._array(view, 'freq')[positions].tolist(),
+            "length": self._array(view, 'length')[positions].tolist(),
+            "words": self._array(view, 'words')[positions].tolist()
+        }
+
+    def translations(self, language: str = None) -> Iterator[Tuple[str, str]]:
+        """
+        Recorrer los pares de traducción con el idioma dado como origen
+
+        Solo se indexan pares con origen y destino no vacíos.
+        """
+        view = self._view(language)
+        if view is None:
+            return
+        strings = self.strings
+        for source_id, target_id in self._array(view, 'pairs'):
+            yield strings[source_id], strings[target_id]
+
+    @property
+    def strings(self) -> StringTable:
+        if self._strings is None:
+            self._strings = StringTable(self.index_dir / 'strings')
+        return self._strings
+
+    def _array(self, view: str, name: str) -> np.ndarray:
+        key = (view, name)
+        if key not in self._arrays:
+            self._arrays[key] = np.load(
+                self.index_dir / _array_file(view, name), mmap_mode='r'
+            )
+        return self._arrays[key]
+
+    def view_frequencies(self, language: str = None) -> np.ndarray:
+        """Frecuencias de un idioma como array (alineado con las posiciones de la vista)"""
+        view = self._view(language)
+        if view is None:
+            return np.zeros(0, dtype=np.int64)
+        return self._array(view, 'freq')
+
+    def search_index(self, language: str = None) -> Optional[TermSearchIndex]:
+        """Índice de búsqueda de los términos de un idioma (ids = posiciones en la vista)"""
+        view = self._view(language)
+        return self._search(view) if view is not None else None
+
+    def _search(self, view: str) -> TermSearchIndex:
+        key = (view, 'search')
+        if key not in self._arrays:
+            self._arrays[key] = TermSearchIndex.open(self.index_dir / (view or '_'))
+        return self._arrays[key]
+
+    def _contains(self, view: str, needle: str) -> np.ndarray:
+        """Máscara de los términos de la vista que contienen needle"""
+        mask = np.zeros(len(self._array(view, 'terms')), dtype=bool)
+        mask[self._search(view).contains(needle)] = True
+        return mask
+
+    def _view(self, language: str = None) -> Optional[str]:
+        """Resolver la vista de un idioma; None si no hay idioma activo"""
+        language = language or self.language
+        if not language:
+            return None
+        base = language.split('-')[0].lower()
+        if base in self.meta['views']:
+            return base
+        # Idioma ausente en el TMX: solo quedan los <tuv> sin idioma
+        return UNLABELED if UNLABELED in self.meta['views'] else None
+
+
+def _array_file(view: str, name: str) -> str:
+    """Nombre del fichero de un array de una vista"""
+    return f"{view or '_'}.{name}.npy"
+
+
+def _write_features(index_dir: Path, view: str, terms: List[str]):
+    """Escribir las columnas derivadas y el índice de búsqueda de una vista"""
+    lower = [term.lower() for term in terms]
+    order = sorted(range(len(lower)), key=lower.__getitem__)
+    alpha = np.empty(len(terms), dtype=np.int32)
+    alpha[order] = np.arange(len(terms), dtype=np.int32)
+
+    features = {
+        'length': np.asarray([len(term) for term in terms], dtype=np.int32),
+        'words': np.asarray([len(term.split()) for term in terms], dtype=np.int32),
+        'digit': np.asarray([any(char.isdigit() for char in term) for term in terms], dtype=np.bool_),
+        'alpha': alpha
+    }
+    for name in FEATURES:
+        tmp_path = Path(index_dir) / f"{_array_file(view, name)}.tmp.npy"
+        np.save(tmp_path, features[name])
+        os.replace(tmp_path, Path(index_dir) / _array_file(view, name))
+
+    # El índice de búsqueda va el último: su presencia indica que la vista está completa
+    TermSearchIndex.build(Path(index_dir) / (view or '_'), terms, order)
+
+
+def _stable_top(keys: np.ndarray, top_n: int = None) -> np.ndarray:
+    """
+    Índices que ordenan keys de menor a mayor (estable), o solo los top_n primeros
+
+    Con top_n, argpartition encuentra el valor de corte; entran las claves
+    menores y, de las iguales al corte, las primeras por posición.
+    """
+    if not top_n or top_n <= 0 or top_n >= len(keys):
+        return np.argsort(keys, kind='stable')
+    kth = keys[np.argpartition(keys, top_n - 1)[top_n - 1]]
+    better = np.flatnonzero(keys < kth)
+    ties = np.flatnonzero(keys == kth)[:top_n - len(better)]
+    chosen = np.concatenate([better, ties])
+    return chosen[np.argsort(keys[chosen], kind='stable')]
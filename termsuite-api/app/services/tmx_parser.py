@@ -1,363 +1,251 @@
 from lxml import etree
-from typing import List, Dict
-from pathlib import Path
+from typing import List, Dict, Iterator, Optional, Tuple
 from collections import Counter
 
 
+# Atributo xml:lang de los <tuv> (TMX 1.4); TMX 1.1 usa "lang" a secas
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+
+# Variante de una unidad: (idioma, texto del <seg>). El texto es None si el <tuv> no tiene <seg>
+Variant = Tuple[Optional[str], Optional[str]]
+
+
+class TMXScan:
+    """Resultado de una única pasada sobre un archivo TMX"""
+
+    def __init__(self):
+        self.units = 0
+        self.languages = set()
+        self.frequencies = Counter()
+        self.translations: List[Dict[str, str]] = []
+
+
 class TMXParser:
     """Parser para archivos TMX (Translation Memory eXchange)"""
-    
-    def parse(self, tmx_path: str, language: str = None) -> List[str]:
+
+    def iter_units(self, tmx_path: str) -> Iterator[List[Variant]]:
         """
-        Parsear archivo TMX y extraer términos únicos de un idioma específico
-        
+        Recorrer el TMX en streaming, una unidad <tu> cada vez
+
+        Usa iterparse y libera cada <tu> tras procesarlo, de modo que la
+        memoria no depende del tamaño del archivo. Acepta TMX con y sin
+        namespace.
+
         Args:
             tmx_path: Ruta al archivo TMX
-            language: Código de idioma (en, es, fr, de, etc.). Si es None, extrae todos.
-            
+
+        Yields:
+            Lista de variantes (idioma, texto) de cada <tu>, en orden del documento
+        """
+        context = etree.iterparse(
+            str(tmx_path),
+            events=('end',),
+            tag='{*}tu',
+            huge_tree=True,
+            resolve_entities=False
+        )
+
+        for _, tu in context:
+            variants = []
+            for tuv in tu.iter('{*}tuv'):
+                lang_attr = tuv.get(XML_LANG) or tuv.get('lang')
+                seg = next(tuv.iter('{*}seg'), None)
+                text = None if seg is None else (seg.text or '')
+                variants.append((lang_attr, text))
+
+            yield variants
+
+            # Liberar el <tu> y los hermanos ya procesados
+            tu.clear()
+            while tu.getprevious() is not None:
+                del tu.getparent()[0]
+
+        del context
+
+    def scan(
+        self,
+        tmx_path: str,
+        language: str = None,
+        with_terms: bool = True,
+        with_translations: bool = False,
+        source_lang: str = None
+    ) -> TMXScan:
+        """
+        Recorrer el TMX una sola vez y obtener idiomas, frecuencias y traducciones
+
+        Args:
+            tmx_path: Ruta al archivo TMX
+            language: Código de idioma de los términos. Si es None, cuenta todos.
+            with_terms: Contar frecuencias de términos
+            with_translations: Extraer pares de traducción
+            source_lang: Idioma origen de los pares. Si es None, usa el primer <tuv>
+
         Returns:
-            Lista de términos únicos del idioma especificado
+            TMXScan con los resultados de la pasada
         """
-        terms = set()
-        
         try:
-            tree = etree.parse(tmx_path)
-            root = tree.getroot()
-            
-            # Namespace TMX
-            ns = {'tmx': 'http://www.lisa.org/tmx14'}
-            
-            # Extraer segmentos de texto del idioma especificado
-            for tu in root.findall('.//tmx:tu', ns):
-                for tuv in tu.findall('.//tmx:tuv', ns):
-                    # Obtener el idioma del segmento
-                    lang_attr = tuv.get('{http://www.w3.org/XML/1998/namespace}lang')
-                    if not lang_attr:
-                        lang_attr = tuv.get('lang')
-                    
-                    # Si se especificó idioma, filtrar
-                    if language:
-                        if lang_attr and not self._match_language(lang_attr, language):
-                            continue
-                    
-                    seg = tuv.find('.//tmx:seg', ns)
-                    if seg is not None and seg.text:
-                        term = seg.text.strip()
-                        if term:
-                            terms.add(term)
-            
-            # Si no hay namespace, intentar sin él
-            if not terms:
-                for tuv in root.findall('.//tuv'):
-                    lang_attr = tuv.get('{http://www.w3.org/XML/1998/namespace}lang')
-                    if not lang_attr:
-                        lang_attr = tuv.get('lang')
-                    
-                    if language:
-                        if lang_attr and not self._match_language(lang_attr, language):
-                            continue
-                    
-                    seg = tuv.find('.//seg')
-                    if seg is not None and seg.text:
-                        term = seg.text.strip()
-                        if term:
-                            terms.add(term)
-        
+            return self._scan(tmx_path, language, with_terms, with_translations, source_lang)
         except Exception as e:
             raise Exception(f"Error al parsear TMX: {str(e)}")
-        
-        return sorted(list(terms))
-    
-    def parse_with_frequency(self, tmx_path: str, language: str = None) -> Dict[str, int]:
+
+    def parse(self, tmx_path: str, language: str = None) -> List[str]:
         """
-        Parsear archivo TMX y contar frecuencia de términos
-        
+        Parsear archivo TMX y extraer términos únicos de un idioma específico
+
         Args:
             tmx_path: Ruta al archivo TMX
             language: Código de idioma (en, es, fr, de, etc.). Si es None, extrae todos.
-            
+
         Returns:
-            Diccionario con términos y su frecuencia
+            Lista de términos únicos del idioma especificado
         """
-        from collections import Counter
-        terms = []
-        
-        try:
-            tree = etree.parse(tmx_path)
-            root = tree.getroot()
-            
-            # Namespace TMX
-            ns = {'tmx': 'http://www.lisa.org/tmx14'}
-            
-            # Extraer segmentos de texto del idioma especificado
-            for tu in root.findall('.//tmx:tu', ns):
-                for tuv in tu.findall('.//tmx:tuv', ns):
-                    # Obtener el idioma del segmento
-                    lang_attr = tuv.get('{http://www.w3.org/XML/1998/namespace}lang')
-                    if not lang_attr:
-                        lang_attr = tuv.get('lang')
-                    
-                    # Si se especificó idioma, filtrar
-                    if language:
-                        if lang_attr and not self._match_language(lang_attr, language):
-                            continue
-                    
-                    seg = tuv.find('.//tmx:seg', ns)
-                    if seg is not None and seg.text:
-                        term = seg.text.strip()
-                        if term:
-                            terms.add(term)
-            
-            # Si no hay namespace, intentar sin él
-            if not terms:
-                for tuv in root.findall('.//tuv'):
-                    lang_attr = tuv.get('{http://www.w3.org/XML/1998/namespace}lang')
-                    if not lang_attr:
-                        lang_attr = tuv.get('lang')
-                    
-                    if language:
-                        if lang_attr and not self._match_language(lang_attr, language):
-                            continue
-                    
-                    seg = tuv.find('.//seg')
-                    if seg is not None and seg.text:
-                        term = seg.text.strip()
-                        if term:
-                            terms.add(term)
-        
-        except Exception as e:
-            raise Exception(f"Error al parsear TMX: {str(e)}")
-        
-        return sorted(list(terms))
-    
+        return sorted(self.scan(tmx_path, language=language).frequencies)
+
     def parse_with_frequency(self, tmx_path: str, language: str = None) -> Dict[str, int]:
         """
         Parsear archivo TMX y contar frecuencia de términos
-        
+
         Args:
             tmx_path: Ruta al archivo TMX
             language: Código de idioma (en, es, fr, de, etc.). Si es None, extrae todos.
-            
+
         Returns:
             Diccionario con términos y su frecuencia
         """
-        from collections import Counter
-        terms = []
-        
-        try:
-            tree = etree.parse(tmx_path)
-            root = tree.getroot()
-            
-            # Namespace TMX
-            ns = {'tmx': 'http://www.lisa.org/tmx14'}
-            
-            # Extraer todos los segmentos (con repeticiones)
-            for tu in root.findall('.//tmx:tu', ns):
-                for tuv in tu.findall('.//tmx:tuv', ns):
-                    lang_attr = tuv.get('{http://www.w3.org/XML/1998/namespace}lang')
-                    if not lang_attr:
-                        lang_attr = tuv.get('lang')
-                    
-                    if language:
-                        if lang_attr and not self._match_language(lang_attr, language):
-                            continue
-                    
-                    seg = tuv.find('.//tmx:seg', ns)
-                    if seg is not None and seg.text:
-                        term = seg.text.strip()
-                        if term:
-                            terms.append(term)
-            
-            # Si no hay namespace, intentar sin él
-            if not terms:
-                for tuv in root.findall('.//tuv'):
-                    lang_attr = tuv.get('{http://www.w3.org/XML/1998/namespace}lang')
-                    if not lang_attr:
-                        lang_attr = tuv.get('lang')
-                    
-                    if language:
-                        if lang_attr and not self._match_language(lang_attr, language):
-                            continue
-                    
-                    seg = tuv.find('.//seg')
-                    if seg is not None and seg.text:
-                        term = seg.text.strip()
-                        if term:
-                            terms.append(term)
-        
-        except Exception as e:
-            raise Exception(f"Error al parsear TMX: {str(e)}")
-        
-        # Contar frecuencias
-        return dict(Counter(terms))
-    
+        return dict(self.scan(tmx_path, language=language).frequencies)
+
     def parse_with_translations(self, tmx_path: str, source_lang: str = None) -> List[Dict[str, str]]:
         """
         Parsear TMX y extraer pares de traducción
-        
+
         Args:
             tmx_path: Ruta al archivo TMX
             source_lang: Idioma origen (ej: 'es'). Si es None, usa el primer <tuv>
-            
+
         Returns:
             Lista de diccionarios con source y target
         """
-        translations = []
-        
-        try:
-            tree = etree.parse(tmx_path)
-            root = tree.getroot()
-            
-            ns = {'tmx': 'http://www.lisa.org/tmx14'}
-            
-            for tu in root.findall('.//tmx:tu', ns):
-                tuvs = tu.findall('.//tmx:tuv', ns)
-                if len(tuvs) >= 2:
-                    # Si se especifica idioma origen, buscar el <tuv> correcto
-                    if source_lang:
-                        source_tuv = None
-                        target_tuv = None
-                        
-                        for tuv in tuvs:
-                            lang_attr = tuv.get('{http://www.w3.org/XML/1998/namespace}lang')
-                            if not lang_attr:
-                                lang_attr = tuv.get('lang')
-                            
-                            if lang_attr and self._match_language(lang_attr, source_lang):
-                                source_tuv = tuv
-                            elif lang_attr and not self._match_language(lang_attr, source_lang):
-                                target_tuv = tuv
-                        
-                        if source_tuv is not None and target_tuv is not None:
-                            source_seg = source_tuv.find('.//tmx:seg', ns)
-                            target_seg = target_tuv.find('.//tmx:seg', ns)
-                            
-                            if source_seg is not None and target_seg is not None:
-                                translations.append({
-                                    'source': source_seg.text.strip() if source_seg.text else '',
-                                    'target': target_seg.text.strip() if target_seg.text else ''
-                                })
-                    else:
-                        # Sin idioma especificado, usar primer y segundo <tuv>
-                        source_seg = tuvs[0].find('.//tmx:seg', ns)
-                        target_seg = tuvs[1].find('.//tmx:seg', ns)
-                        
-                        if source_seg is not None and target_seg is not None:
-                            translations.append({
-                                'source': source_seg.text.strip() if source_seg.text else '',
-                                'target': target_seg.text.strip() if target_seg.text else ''
-                            })
-            
-            # Si no hay namespace, intentar sin él
-            if not translations:
-                for tu in root.findall('.//tu'):
-                    tuvs = tu.findall('.//tuv')
-                    if len(tuvs) >= 2:
-                        if source_lang:
-                            source_tuv = None
-                            target_tuv = None
-                            
-                            for tuv in tuvs:
-                                lang_attr = tuv.get('{http://www.w3.org/XML/1998/namespace}lang')
-                                if not lang_attr:
-                                    lang_attr = tuv.get('lang')
-                                
-                                if lang_attr and self._match_language(lang_attr, source_lang):
-                                    source_tuv = tuv
-                                elif lang_attr:
-                                    target_tuv = tuv
-                            
-                            if source_tuv is not None and target_tuv is not None:
-                                source_seg = source_tuv.find('.//seg')
-                                target_seg = target_tuv.find('.//seg')
-                                
-                                if source_seg is not None and target_seg is not None:
-                                    translations.append({
-                                        'source': source_seg.text.strip() if source_seg.text else '',
-                                        'target': target_seg.text.strip() if target_seg.text else ''
-                                    })
-                        else:
-                            source_seg = tuvs[0].find('.//seg')
-                            target_seg = tuvs[1].find('.//seg')
-                            
-                            if source_seg is not None and target_seg is not None:
-                                translations.append({
-                                    'source': source_seg.text.strip() if source_seg.text else '',
-                                    'target': target_seg.text.strip() if target_seg.text else ''
-                                })
-        
-        except Exception as e:
-            raise Exception(f"Error al parsear TMX: {str(e)}")
-        
-        return translations
-    
+        return self.scan(
+            tmx_path,
+            with_terms=False,
+            with_translations=True,
+            source_lang=source_lang
+        ).translations
+
     def get_available_languages(self, tmx_path: str) -> List[str]:
         """
         Obtener lista de idiomas disponibles en el TMX
-        
+
         Args:
             tmx_path: Ruta al archivo TMX
-            
+
         Returns:
             Lista de códigos de idioma únicos
         """
-        languages = set()
-        
         try:
-            tree = etree.parse(tmx_path)
-            root = tree.getroot()
-            
-            ns = {'tmx': 'http://www.lisa.org/tmx14'}
-            
-            # Buscar todos los atributos de idioma
-            for tuv in root.findall('.//tmx:tuv', ns):
-                lang_attr = tuv.get('{http://www.w3.org/XML/1998/namespace}lang')
-                if not lang_attr:
-                    lang_attr = tuv.get('lang')
-                
-                if lang_attr:
-                    # Extraer código base (antes del guión)
-                    lang_code = lang_attr.split('-')[0].lower()
-                    languages.add(lang_code)
-            
-            # Si no hay namespace, intentar sin él
-            if not languages:
-                for tuv in root.findall('.//tuv'):
-                    lang_attr = tuv.get('{http://www.w3.org/XML/1998/namespace}lang')
-                    if not lang_attr:
-                        lang_attr = tuv.get('lang')
-                    
-                    if lang_attr:
-                        lang_code = lang_attr.split('-')[0].lower()
-                        languages.add(lang_code)
-        
+            scan = self._scan(tmx_path, with_terms=False)
         except Exception as e:
             raise Exception(f"Error al obtener idiomas del TMX: {str(e)}")
-        
-        return sorted(list(languages))
-    
+
+        return sorted(scan.languages)
+
+    def _scan(
+        self,
+        tmx_path: str,
+        language: str = None,
+        with_terms: bool = True,
+        with_translations: bool = False,
+        source_lang: str = None
+    ) -> TMXScan:
+        """Pasada única sobre las unidades del TMX"""
+        scan = TMXScan()
+
+        for variants in self.iter_units(tmx_path):
+            scan.units += 1
+
+            for lang_attr, text in variants:
+                if lang_attr:
+                    # Extraer código base (antes del guión)
+                    scan.languages.add(lang_attr.split('-')[0].lower())
+
+                if not with_terms or not text:
+                    continue
+
+                # Si se especificó idioma, filtrar (los <tuv> sin idioma se conservan)
+                if language and lang_attr and not self._match_language(lang_attr, language):
+                    continue
+
+                term = text.strip()
+                if term:
+                    scan.frequencies[term] += 1
+
+            if with_translations:
+                pair = self.translation_pair(variants, source_lang)
+                if pair is not None:
+                    scan.translations.append(pair)
+
+        return scan
+
+    def translation_pair(self, variants: List[Variant], source_lang: str = None) -> Optional[Dict[str, str]]:
+        """
+        Obtener el par de traducción de una unidad
+
+        Args:
+            variants: Variantes de la unidad, tal como las entrega iter_units
+            source_lang: Idioma origen. Si es None, usa el primer y segundo <tuv>
+
+        Returns:
+            Diccionario con source y target, o None si la unidad no tiene par
+        """
+        if len(variants) < 2:
+            return None
+
+        if source_lang:
+            # El último <tuv> de cada lado gana, como en el parser original
+            source_tuv = None
+            target_tuv = None
+
+            for variant in variants:
+                lang_attr = variant[0]
+                if lang_attr and self._match_language(lang_attr, source_lang):
+                    source_tuv = variant
+                elif lang_attr:
+                    target_tuv = variant
+
+            if source_tuv is None or target_tuv is None:
+                return None
+
+            source, target = source_tuv[1], target_tuv[1]
+        else:
+            source, target = variants[0][1], variants[1][1]
+
+        if source is None or target is None:
+            return None
+
+        return {'source': source.strip(), 'target': target.strip()}
+
     def _match_language(self, lang_attr: str, target_lang: str) -> bool:
         """
         Comparar códigos de idioma (maneja variantes como en-US, en-GB, etc.)
-        
+
         Args:
             lang_attr: Atributo de idioma del TMX (ej: "en-US", "es-ES")
             target_lang: Idioma objetivo (ej: "en", "es")
-            
+
         Returns:
             True si coinciden
         """
         if not lang_attr:
             return False
-        
+
         # Normalizar a minúsculas
         lang_attr = lang_attr.lower()
         target_lang = target_lang.lower()
-        
+
         # Comparación exacta
         if lang_attr == target_lang:
             return True
-        
+
         # Comparar solo el código base (antes del guión)
         lang_base = lang_attr.split('-')[0]
         return lang_base == target_lang
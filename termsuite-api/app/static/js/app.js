@@ -13,6 +13,7 @@ const API_BASE = '';
 document.addEventListener('DOMContentLoaded', function() {
     setupDragAndDrop();
     setupFileInputs();
+    setupAutocomplete();
     
     // Inicializar tooltips de Bootstrap
     const tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
@@ -67,6 +68,109 @@ function setupFileInputs() {
     });
 }
 
+// A partir de este tamaño los archivos se suben por bloques reanudables
+const RESUMABLE_THRESHOLD = 64 * 1024 * 1024;
+const UPLOAD_PARALLEL = 4;
+const CHUNK_RETRIES = 3;
+
+// Upload File (multipart, or resumable chunks for large files)
+async function uploadFile(file, fileType, btn) {
+    if (file.size < RESUMABLE_THRESHOLD) {
+        const formData = new FormData();
+        formData.append('file', file);
+        const endpoint = fileType === 'tmx' ? 'upload-tmx' : 'upload-corpus';
+        return fetch(`${API_BASE}/api/${endpoint}`, {
+            method: 'POST',
+            body: formData
+        });
+    }
+    
+    // Reanudar la subida del mismo archivo si quedó a medias
+    const key = `upload:${fileType}:${file.name}:${file.size}:${file.lastModified}`;
+    let session = null;
+    const savedId = localStorage.getItem(key);
+    if (savedId) {
+        const response = await fetch(`${API_BASE}/api/uploads/${savedId}`);
+        if (response.ok) {
+            session = await response.json();
+            if (session.status !== 'open') {
+                session = null;
+            }
+        }
+    }
+    if (!session) {
+        const response = await fetch(`${API_BASE}/api/uploads`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ file_type: fileType, filename: file.name, size: file.size })
+        });
+        if (!response.ok) {
+            return response;
+        }
+        session = await response.json();
+        localStorage.setItem(key, session.upload_id);
+    }
+    
+    const received = new Set(session.received);
+    const pending = [];
+    for (let i = 0; i < session.chunks; i++) {
+        if (!received.has(i)) {
+            pending.push(i);
+        }
+    }
+    let done = session.chunks - pending.length;
+    
+    async function sendChunk(index) {
+        const start = index * session.chunk_size;
+        const blob = file.slice(start, Math.min(start + session.chunk_size, file.size));
+        const headers = {};
+        if (window.crypto && crypto.subtle) {
+            // SHA-256 del bloque: el servidor lo rechaza si llega alterado
+            const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+            headers['X-Chunk-SHA256'] = Array.from(new Uint8Array(digest))
+                .map(b => b.toString(16).padStart(2, '0')).join('');
+        }
+        for (let attempt = 1; ; attempt++) {
+            let response = null;
+            try {
+                response = await fetch(`${API_BASE}/api/uploads/${session.upload_id}/chunks/${index}`, {
+                    method: 'PUT',
+                    headers: headers,
+                    body: blob
+                });
+            } catch (error) {
+                if (attempt >= CHUNK_RETRIES) {
+                    throw error;
+                }
+            }
+            if (response && response.ok) {
+                return;
+            }
+            if (response && (response.status < 500 || attempt >= CHUNK_RETRIES)) {
+                const data = await response.json();
+                throw new Error(data.detail);
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+        }
+    }
+    
+    async function worker() {
+        while (pending.length > 0) {
+            await sendChunk(pending.shift());
+            done++;
+            btn.innerHTML = `<span class="spinner"></span> Subiendo... ${Math.floor(100 * done / session.chunks)}%`;
+        }
+    }
+    await Promise.all(Array.from({ length: UPLOAD_PARALLEL }, worker));
+    
+    btn.innerHTML = '<span class="spinner"></span> Procesando...';
+    const response = await fetch(`${API_BASE}/api/uploads/${session.upload_id}/complete`, {
+        method: 'POST'
+    });
+    localStorage.removeItem(key);
+    return response;
+}
+
 // Upload TMX
 async function uploadTMX() {
     const fileInput = document.getElementById('tmx-file');
@@ -82,19 +186,13 @@ async function uploadTMX() {
         return;
     }
     
-    const formData = new FormData();
-    formData.append('file', file);
-    
     const btn = document.getElementById('btn-upload-tmx');
     btn.disabled = true;
     btn.innerHTML = '<span class="spinner"></span> Analizando TMX...';
     
     try {
         // Subir sin idioma para obtener idiomas disponibles
-        const response = await fetch(`${API_BASE}/api/upload-tmx`, {
-            method: 'POST',
-            body: formData
-        });
+        const response = await uploadFile(file, 'tmx', btn);
         
         const data = await response.json();
         
@@ -203,24 +301,31 @@ async function uploadCorpus() {
         return;
     }
     
-    const formData = new FormData();
-    formData.append('file', file);
-    
     const btn = document.getElementById('btn-upload-corpus');
     btn.disabled = true;
     btn.innerHTML = '<span class="spinner"></span> Subiendo...';
     
     try {
-        const response = await fetch(`${API_BASE}/api/upload-corpus`, {
-            method: 'POST',
-            body: formData
-        });
+        const response = await uploadFile(file, 'corpus', btn);
         
         const data = await response.json();
         
         if (response.ok) {
             state.corpusId = data.file_id;
             showStatus('corpus', 'success', data.message);
+            if (data.ingest_status === 'processing') {
+                // ZIP: los documentos se extraen en segundo plano
+                btn.innerHTML = '<span class="spinner"></span> Extrayendo ZIP...';
+                const report = await waitForCorpusIngest(data.file_id);
+                if (report.status !== 'completed') {
+                    state.corpusId = null;
+                    showStatus('corpus', 'error', report.error);
+                    showToast(`Error: ${report.error}`, 'error');
+                    return;
+                }
+                showStatus('corpus', 'success',
+                    `Corpus extraído: ${report.documents} documentos (${(report.bytes_out / 1048576).toFixed(1)} MB)`);
+            }
             showToast('Corpus subido exitosamente', 'success');
             // Mostrar opciones de extracción Corpus
             document.getElementById('corpus-extract-options').style.display = 'block';
@@ -235,6 +340,24 @@ async function uploadCorpus() {
     }
 }
 
+// Wait for ZIP corpus ingestion
+async function waitForCorpusIngest(corpusId) {
+    while (true) {
+        const response = await fetch(`${API_BASE}/api/corpus/${corpusId}/ingest?files=false`);
+        const report = await response.json();
+        if (!response.ok) {
+            return { status: 'failed', error: report.detail };
+        }
+        if (report.status !== 'processing') {
+            return report;
+        }
+        if (report.total) {
+            showStatus('corpus', 'info', `Extrayendo ZIP: ${report.done}/${report.total} documentos`);
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 // Extract from Corpus
 async function extractFromCorpus() {
     if (!state.corpusId) {
@@ -248,7 +371,8 @@ async function extractFromCorpus() {
         language: config.language,
         min_frequency: config.minFrequency,
         use_tmx: state.tmxId !== null,
-        tmx_id: state.tmxId
+        tmx_id: state.tmxId,
+        dedup: config.dedup
     };
     
     const btn = document.getElementById('btn-extract-corpus');
@@ -269,7 +393,7 @@ async function extractFromCorpus() {
         if (response.ok) {
             state.jobId = data.job_id;
             showToast('Extracción iniciada', 'info');
-            pollJobStatus();
+            watchJobStatus();
         } else {
             showResults('error', data.detail);
             showToast(`Error: ${data.detail}`, 'error');
@@ -283,6 +407,44 @@ async function extractFromCorpus() {
     }
 }
 
+// Autocompletado del filtro "Contiene" con los términos del TMX
+function setupAutocomplete() {
+    const input = document.getElementById('tmx-contains');
+    const list = document.getElementById('tmx-contains-suggestions');
+    let timer = null;
+    
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        const query = input.value.trim();
+        if (!state.tmxId || !query) {
+            list.innerHTML = '';
+            return;
+        }
+        
+        // Esperar a que el usuario deje de escribir
+        timer = setTimeout(async () => {
+            try {
+                const params = new URLSearchParams({ q: query, limit: 10 });
+                const response = await fetch(`${API_BASE}/api/tmx/${state.tmxId}/autocomplete?${params.toString()}`);
+                if (!response.ok) return;
+                const data = await response.json();
+                // Ignorar respuestas de consultas ya obsoletas
+                if (data.query !== input.value.trim()) return;
+                
+                list.innerHTML = '';
+                data.suggestions.forEach(suggestion => {
+                    const option = document.createElement('option');
+                    option.value = suggestion.term;
+                    option.label = `${suggestion.frequency}`;
+                    list.appendChild(option);
+                });
+            } catch (error) {
+                console.error('Error en autocompletado:', error);
+            }
+        }, 200);
+    });
+}
+
 // Extract from TMX
 async function extractFromTMX() {
     if (!state.tmxId) {
@@ -299,6 +461,7 @@ async function extractFromTMX() {
         sort_by: 'frequency',
         format: 'excel',
         exclude_numbers: document.getElementById('tmx-exclude-numbers').checked,
+        contains: document.getElementById('tmx-contains').value.trim(),
         include_translation: document.getElementById('tmx-include-translation').checked
     });
     
@@ -331,6 +494,54 @@ async function extractFromTMX() {
     }
 }
 
+// Apply Job Status (returns true once the job has finished)
+function applyJobStatus(data) {
+    updateProgress(data.progress, data.message);
+    
+    if (data.status === 'completed') {
+        state.downloadUrl = `/api/export/excel/${state.jobId}`;
+        let summary = `Completado: ${data.message}`;
+        if (data.dedup) {
+            const removed = data.dedup.exact_duplicates + data.dedup.near_duplicates;
+            summary += ` (${removed} de ${data.dedup.documents} documentos duplicados eliminados)`;
+        }
+        showResults('success', summary);
+        showToast('Extracción completada', 'success');
+        updateStats('extracted', 'Términos extraídos');
+        return true;
+    } else if (data.status === 'failed') {
+        showResults('error', data.error || 'Error desconocido');
+        showToast('Extracción fallida', 'error');
+        return true;
+    }
+    return false;
+}
+
+// Watch Job Status (server-sent events, polling as fallback)
+function watchJobStatus() {
+    if (!window.EventSource) {
+        pollJobStatus();
+        return;
+    }
+    
+    const source = new EventSource(`${API_BASE}/api/jobs/${state.jobId}/events`);
+    let finished = false;
+    const onEvent = (event) => {
+        if (applyJobStatus(JSON.parse(event.data))) {
+            finished = true;
+            source.close();
+        }
+    };
+    source.addEventListener('status', onEvent);
+    source.addEventListener('progress', onEvent);
+    source.onerror = () => {
+        source.close();
+        if (!finished) {
+            pollJobStatus();
+        }
+    };
+}
+
 // Poll Job Status
 async function pollJobStatus() {
     const interval = setInterval(async () => {
@@ -338,18 +549,8 @@ async function pollJobStatus() {
             const response = await fetch(`${API_BASE}/api/status/${state.jobId}`);
             const data = await response.json();
             
-            updateProgress(data.progress, data.message);
-            
-            if (data.status === 'completed') {
+            if (applyJobStatus(data)) {
                 clearInterval(interval);
-                state.downloadUrl = `/api/export/excel/${state.jobId}`;
-                showResults('success', `Completado: ${data.message}`);
-                showToast('Extracción completada', 'success');
-                updateStats('extracted', 'Términos extraídos');
-            } else if (data.status === 'failed') {
-                clearInterval(interval);
-                showResults('error', data.error || 'Error desconocido');
-                showToast('Extracción fallida', 'error');
             }
         } catch (error) {
             clearInterval(interval);
@@ -369,7 +570,8 @@ function getExtractionConfig() {
         sortBy: document.getElementById('sort-by').value,
         format: document.getElementById('format').value,
         includeTranslation: document.getElementById('include-translation').checked,
-        excludeNumbers: document.getElementById('exclude-numbers').checked
+        excludeNumbers: document.getElementById('exclude-numbers').checked,
+        dedup: document.getElementById('dedup').checked
     };
 }
 
@@ -425,6 +627,18 @@ function showStatus(type, status, message) {
         statusDiv.className = 'alert alert-success mt-3';
         statusDiv.style.display = 'block';
         statusText.textContent = message;
+    } else if (status === 'info') {
+        statusElement.className = 'badge bg-info';
+        statusElement.textContent = 'Extrayendo';
+        statusDiv.className = 'alert alert-info mt-3';
+        statusDiv.style.display = 'block';
+        statusText.textContent = message;
+    } else if (status === 'error') {
+        statusElement.className = 'badge bg-danger';
+        statusElement.textContent = 'Error';
+        statusDiv.className = 'alert alert-danger mt-3';
+        statusDiv.style.display = 'block';
+        statusText.textContent = message;
     }
 }
 
@@ -0,0 +1,212 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def link_or_copy(source: Path, target: Path):
+    """Enlazar (hardlink) un archivo o, si no se puede, copiarlo"""
+    try:
+        os.link(source, target)
+    except OSError:
+        # Otro sistema de ficheros o sin soporte de hardlinks
+        shutil.copy(source, target)
+
+
+class BlobStore:
+    """
+    Almacén de contenidos direccionado por SHA-256
+
+    Cada contenido se guarda una sola vez en `{root}/{sha[:2]}/{sha}`; las
+    subidas son referencias (`tmx/{id}`, `corpus/{id}`) y sus rutas de
+    siempre (uploads/...) son hardlinks al blob, así que subir diez veces
+    el mismo corpus ocupa lo mismo que subirlo una. El índice
+    (`{root}/blobs.db`) cuenta las referencias de cada blob: al soltar la
+    última se borra el blob. Los hardlinks que ya existan (p. ej. el corpus
+    materializado) siguen siendo válidos aunque el blob se borre.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS blob_refs (
+            ref TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS blob_refs_sha256 ON blob_refs (sha256)"
+    )
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.tmp_dir = self.root / 'tmp'
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def path(self, sha256: str) -> Path:
+        """Ruta del blob de un hash"""
+        return self.root / sha256[:2] / sha256
+
+    def temp_path(self, name: str) -> Path:
+        """Ruta para escribir un contenido antes de conocer su hash"""
+        return self.tmp_dir / f"{name}.part"
+
+    def adopt(self, tmp_path: Path, sha256: str, ref: str, target: Path) -> bool:
+        """
+        Guardar un contenido recién escrito, añadirle una referencia y
+        enlazarlo en la ruta de la referencia
+
+        Si el blob ya existía, el archivo temporal se descarta.
+
+        Args:
+            tmp_path: Archivo escrito (en temp_path, mismo sistema de ficheros)
+            sha256: Hash del contenido
+            ref: Referencia que lo usa (p. ej. 'corpus/{id}')
+            target: Ruta donde enlazar el blob (p. ej. uploads/corpus/{id}.txt)
+
+        Returns:
+            True si el contenido ya estaba guardado (deduplicado)
+        """
+        blob_path = self.path(sha256)
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            exists = blob_path.exists() and conn.execute(
+                "SELECT 1 FROM blobs WHERE sha256 = ?", (sha256,)
+            ).fetchone() is not None
+            if exists:
+                Path(tmp_path).unlink()
+            else:
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, blob_path)
+                conn.execute(
+                    "INSERT OR REPLACE INTO blobs (sha256, size, created_at) VALUES (?, ?, ?)",
+                    (sha256, blob_path.stat().st_size, now)
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO blob_refs (ref, sha256, created_at) VALUES (?, ?, ?)",
+                (ref, sha256, now)
+            )
+            # Dentro de la transacción: nadie puede borrar el blob a la vez
+            link_or_copy(blob_path, target)
+        return exists
+
+    def release(self, ref: str) -> bool:
+        """
+        Soltar una referencia; el blob se borra con la última
+
+        Returns:
+            True si se borró el blob
+        """
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT sha256 FROM blob_refs WHERE ref = ?", (ref,)).fetchone()
+            if row is None:
+                return False
+            sha256 = row[0]
+            conn.execute("DELETE FROM blob_refs WHERE ref = ?", (ref,))
+            remaining = conn.execute(
+                "SELECT COUNT(*) FROM blob_refs WHERE sha256 = ?", (sha256,)
+            ).fetchone()[0]
+            if remaining:
+                return False
+            conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+            self.path(sha256).unlink(missing_ok=True)
+        return True
+
+    def sha256(self, ref: str) -> Optional[str]:
+        """Hash del contenido de una referencia"""
+        row = self._conn().execute("SELECT sha256 FROM blob_refs WHERE ref = ?", (ref,)).fetchone()
+        return row[0] if row else None
+
+    def gc(self, grace: float = 3600) -> Dict[str, int]:
+        """
+        Recoger lo que un proceso caído dejó a medias
+
+        Borra blobs sin referencias, archivos de blob que no están en el
+        índice y temporales de más de `grace` segundos.
+
+        Returns:
+            Archivos y bytes liberados
+        """
+        freed = {"files": 0, "bytes": 0}
+        cutoff = time.time() - grace
+
+        def remove(path: Path):
+            try:
+                size = path.stat().st_size
+                path.unlink()
+            except FileNotFoundError:
+                return
+            freed["files"] += 1
+            freed["bytes"] += size
+
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            orphans = [row[0] for row in conn.execute(
+                "SELECT sha256 FROM blobs WHERE created_at < ? AND sha256 NOT IN "
+                "(SELECT sha256 FROM blob_refs)",
+                (cutoff,)
+            )]
+            for sha256 in orphans:
+                conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+                remove(self.path(sha256))
+            known = {row[0] for row in conn.execute("SELECT sha256 FROM blobs")}
+            for shard in self.root.iterdir():
+                if len(shard.name) != 2 or not shard.is_dir():
+                    continue
+                for path in shard.iterdir():
+                    if path.name not in known and path.stat().st_mtime < cutoff:
+                        remove(path)
+
+        for path in self.tmp_dir.iterdir():
+            if path.stat().st_mtime < cutoff:
+                remove(path)
+        return freed
+
+    def stats(self) -> Dict:
+        """Blobs, referencias y bytes ahorrados por deduplicación"""
+        conn = self._conn()
+        blobs, stored = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+        ).fetchone()
+        refs, logical = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(b.size), 0) FROM blob_refs r "
+            "JOIN blobs b ON b.sha256 = r.sha256"
+        ).fetchone()
+        return {
+            "blobs": blobs,
+            "refs": refs,
+            "stored_bytes": stored,
+            "logical_bytes": logical,
+            "saved_bytes": logical - stored
+        }
+
+    def _conn(self) -> sqlite3.Connection:
+        """Conexión propia de cada hilo"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.root / 'blobs.db', timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
@@ -1,9 +1,102 @@
+import codecs
+import hashlib
+import json
 import os
 import shutil
-import zipfile
+import threading
+import time
 from pathlib import Path
 from fastapi import UploadFile
-from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from app.utils.blob_store import BlobStore, link_or_copy
+from app.utils.upload_sessions import UploadSessions
+from app.utils.zip_ingest import ZipIngestor
+
+
+# Bytes por bloque al recibir una subida
+UPLOAD_CHUNK = 1024 * 1024
+
+# Bytes iniciales que se examinan para reconocer el formato
+SNIFF_BYTES = 64 * 1024
+
+# Segundos entre escrituras del progreso de una ingesta ZIP
+INGEST_PROGRESS_INTERVAL = 1.0
+
+# Segundos sin progreso tras los que una ingesta en curso se da por
+# interrumpida (el proceso que la hacía se cayó)
+INGEST_STALE = float(os.getenv('ZIP_INGEST_STALE', '600'))
+
+
+def sniff_format(head: bytes) -> str:
+    """
+    Formato de un archivo por sus primeros bytes
+
+    Returns:
+        'zip', 'gzip', 'tmx', 'xml', 'text' o 'binary'
+    """
+    if head.startswith((b'PK\x03\x04', b'PK\x05\x06')):
+        return 'zip'
+    if head.startswith(b'\x1f\x8b'):
+        return 'gzip'
+
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        encoding = 'utf-16'
+    elif b'\x00' in head:
+        return 'binary'
+    else:
+        encoding = 'utf-8-sig'
+    # El bloque puede cortar un carácter multibyte: decodificar sin cerrar
+    try:
+        text = codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+    except UnicodeDecodeError:
+        # Texto en otra codificación de 8 bits (latin-1...)
+        text = head.decode('latin-1')
+
+    text = text.lstrip()
+    if text.startswith('<'):
+        return 'tmx' if '<tmx' in text else 'xml'
+    return 'text'
+
+
+class UploadSink:
+    """
+    Destino de una subida escrita por bloques
+
+    Calcula en la misma pasada el SHA-256, el tamaño y el formato
+    (sniff_format sobre los primeros SNIFF_BYTES), así nadie tiene que
+    volver a leer el archivo para deduplicar o cachear.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, 'wb')
+        self._digest = hashlib.sha256()
+        self._head = bytearray()
+        self.size = 0
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self._digest.update(chunk)
+        self.size += len(chunk)
+        if len(self._head) < SNIFF_BYTES:
+            self._head += chunk[:SNIFF_BYTES - len(self._head)]
+
+    def close(self) -> Dict:
+        """Cerrar el archivo y devolver path, sha256, size y format"""
+        self._file.close()
+        return {
+            "path": self.path,
+            "sha256": self._digest.hexdigest(),
+            "size": self.size,
+            "format": sniff_format(bytes(self._head))
+        }
+
+    def abort(self):
+        """Cerrar y borrar una subida incompleta"""
+        self._file.close()
+        self.path.unlink(missing_ok=True)
 
 
 class FileHandler:
@@ -14,17 +107,27 @@ class FileHandler:
         self.uploads_dir = self.data_dir / 'uploads'
         self.corpus_dir = self.data_dir / 'corpus'
         self.outputs_dir = self.data_dir / 'outputs'
+        self.cache_dir = self.data_dir / 'cache'
         
         # Crear directorios si no existen
-        for directory in [self.uploads_dir, self.corpus_dir, self.outputs_dir]:
+        for directory in [self.uploads_dir, self.corpus_dir, self.outputs_dir, self.cache_dir]:
             directory.mkdir(parents=True, exist_ok=True)
+        
+        # Contenido de las subidas, una vez por hash (uploads/ son hardlinks)
+        self.blob_store = BlobStore(self.data_dir / 'blobs')
+        
+        # Subidas reanudables por bloques (mismo sistema de ficheros que los blobs)
+        self.upload_sessions = UploadSessions(self.blob_store.root / 'sessions')
+        
+        # Extracción de corpus ZIP (límites y paralelismo por entorno)
+        self.zip_ingestor = ZipIngestor()
     
-    def save_upload(
+    async def save_upload(
         self, 
         file_id: str, 
         file: UploadFile, 
         file_type: str
-    ) -> Path:
+    ) -> Dict:
         """
         Guardar archivo subido
         
@@ -34,37 +137,223 @@ class FileHandler:
             file_type: Tipo (tmx, corpus)
             
         Returns:
-            Path del archivo guardado
+            Datos de la subida (ver save_stream)
+        """
+        async def chunks():
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK)
+                if not chunk:
+                    return
+                yield chunk
+        
+        return await self.save_stream(file_id, chunks(), file_type, file.filename)
+    
+    async def save_stream(
+        self,
+        file_id: str,
+        chunks: AsyncIterator[bytes],
+        file_type: str,
+        filename: str
+    ) -> Dict:
+        """
+        Guardar una subida a partir de sus bloques sin bloquear el event loop
+        
+        Cada bloque se escribe y se añade al hash en el pool de hilos. El
+        contenido acaba en el almacén de blobs (una copia por hash) y la
+        ruta de la subida es un hardlink al blob. Los datos de la subida se
+        guardan junto al archivo ({file_id}.upload.json) para reutilizar el
+        hash más tarde.
+        
+        Args:
+            file_id: ID único del archivo
+            chunks: Contenido por bloques
+            file_type: Tipo (tmx, corpus)
+            filename: Nombre original (da la extensión)
+            
+        Returns:
+            path, sha256, size, format (ver sniff_format) y deduplicated
+            (el contenido ya estaba en el almacén)
+        """
+        sink = await run_in_threadpool(UploadSink, self.blob_store.temp_path(file_id))
+        try:
+            async for chunk in chunks:
+                await run_in_threadpool(sink.write, chunk)
+        except BaseException:
+            await run_in_threadpool(sink.abort)
+            raise
+        info = await run_in_threadpool(sink.close)
+        return await run_in_threadpool(self._store_upload, file_id, file_type, filename, info)
+    
+    def finalize_upload(self, upload_id: str) -> Dict:
+        """
+        Finalizar una subida reanudable (ver UploadSessions)
+        
+        El archivo de la sesión se adopta en el almacén de blobs sin
+        copiarlo; el resultado es el mismo que el de save_stream y el ID de
+        la subida pasa a ser el del archivo.
+        
+        Args:
+            upload_id: ID de la sesión
+            
+        Returns:
+            path, sha256, size, format, deduplicated, file_type y filename
+        """
+        assembled = self.upload_sessions.assemble(upload_id)
+        info = {
+            "path": assembled["path"],
+            "sha256": assembled["sha256"],
+            "size": assembled["size"],
+            "format": sniff_format(assembled["head"])
+        }
+        try:
+            info = self._store_upload(upload_id, assembled["file_type"], assembled["filename"], info)
+        finally:
+            self.upload_sessions.remove(upload_id)
+        info["file_type"] = assembled["file_type"]
+        info["filename"] = assembled["filename"]
+        return info
+    
+    def _store_upload(self, file_id: str, file_type: str, filename: str, info: Dict) -> Dict:
+        """Adoptar una subida escrita en el almacén de blobs y guardar sus datos"""
+        target_dir = self._upload_dir(file_type)
+        target_dir.mkdir(parents=True, exist_ok=True)
+        file_path = target_dir / f"{file_id}{Path(filename).suffix}"
+        
+        info["deduplicated"] = self.blob_store.adopt(
+            info["path"], info["sha256"], f"{file_type}/{file_id}", file_path
+        )
+        info["path"] = file_path
+        
+        meta = {key: info[key] for key in ("sha256", "size", "format")}
+        with open(target_dir / f"{file_id}.upload.json", 'w', encoding='utf-8') as f:
+            json.dump({**meta, "filename": filename}, f, ensure_ascii=False)
+        
+        return info
+    
+    def upload_info(self, file_id: str, file_type: str) -> Optional[Dict]:
+        """Datos guardados de una subida (None si es anterior a guardarlos)"""
+        try:
+            with open(self._upload_dir(file_type) / f"{file_id}.upload.json", 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+    
+    def discard_upload(self, file_id: str, file_type: str, file_path: Path):
+        """Borrar una subida rechazada, sus datos y su referencia al blob"""
+        Path(file_path).unlink(missing_ok=True)
+        (self._upload_dir(file_type) / f"{file_id}.upload.json").unlink(missing_ok=True)
+        self.blob_store.release(f"{file_type}/{file_id}")
+    
+    def document_hashes(self, corpus_id: str) -> Optional[List[str]]:
         """
+        SHA-256 de los documentos de un corpus conocidos desde la subida
+        
+        Solo para corpus de un .txt (el único documento es la subida); None
+        si hay que calcularlos leyendo el corpus.
+        """
+        if not (self.uploads_dir / 'corpus' / f"{corpus_id}.txt").exists():
+            # Corpus ZIP: hashes calculados al extraer
+            report = self.ingest_report(corpus_id)
+            if report and report["status"] == 'completed' and "files" in report:
+                return [f["sha256"] for f in report["files"]]
+            return None
+        info = self.upload_info(corpus_id, 'corpus')
+        return [info["sha256"]] if info else None
+    
+    def _upload_dir(self, file_type: str) -> Path:
         if file_type == 'tmx':
-            target_dir = self.uploads_dir / 'tmx'
+            return self.uploads_dir / 'tmx'
         elif file_type == 'corpus':
-            target_dir = self.uploads_dir / 'corpus'
+            return self.uploads_dir / 'corpus'
         else:
             raise ValueError(f"Tipo de archivo no válido: {file_type}")
+    
+    def check_zip(self, zip_path: Path, corpus_id: str):
+        """
+        Revisar los límites de un ZIP antes de aceptarlo (solo lee su
+        directorio central) y dejar su corpus pendiente de extraer
         
-        target_dir.mkdir(parents=True, exist_ok=True)
+        Raises:
+            ZipLimitError: Si el ZIP no es válido o supera algún límite
+        """
+        self.zip_ingestor.check(zip_path, self.corpus_dir)
+        self._write_ingest_report(corpus_id, {"status": "processing", "done": 0})
+    
+    def extract_zip(
+        self,
+        zip_path: Path,
+        corpus_id: str,
+        on_progress: Callable[[int, int], None] = None
+    ) -> Dict:
+        """
+        Extraer archivo ZIP a directorio de corpus
         
-        # Determinar extensión
-        ext = Path(file.filename).suffix
-        file_path = target_dir / f"{file_id}{ext}"
+        El estado de la extracción se guarda en corpus/{corpus_id}.ingest.json
+        (processing, completed o failed) con el progreso y, al terminar, las
+        estadísticas de cada documento (ver ZipIngestor.ingest).
         
-        # Guardar archivo
-        with open(file_path, 'wb') as f:
-            shutil.copyfileobj(file.file, f)
+        Args:
+            zip_path: Archivo ZIP
+            corpus_id: ID del corpus
+            on_progress: Callback opcional (documentos hechos, total)
+            
+        Returns:
+            Informe de la extracción
+        """
+        last_write = [0.0]
+        lock = threading.Lock()
         
-        return file_path
+        def progress(done: int, total: int):
+            if on_progress:
+                on_progress(done, total)
+            # Llamado desde los hilos de la ingesta
+            with lock:
+                now = time.time()
+                if now - last_write[0] < INGEST_PROGRESS_INTERVAL:
+                    return
+                last_write[0] = now
+                self._write_ingest_report(
+                    corpus_id, {"status": "processing", "done": done, "total": total}
+                )
+        
+        self._write_ingest_report(corpus_id, {"status": "processing", "done": 0})
+        try:
+            stats = self.zip_ingestor.ingest(zip_path, self.corpus_dir / corpus_id, progress)
+        except Exception as e:
+            self._write_ingest_report(corpus_id, {"status": "failed", "error": str(e)})
+            raise
+        
+        report = {"status": "completed", **stats}
+        self._write_ingest_report(corpus_id, report)
+        return report
     
-    def extract_zip(self, zip_path: Path, corpus_id: str):
-        """Extraer archivo ZIP a directorio de corpus"""
-        extract_dir = self.corpus_dir / corpus_id
-        extract_dir.mkdir(parents=True, exist_ok=True)
+    def ingest_report(self, corpus_id: str) -> Optional[Dict]:
+        """
+        Estado de la extracción de un corpus ZIP
         
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            # Extraer solo archivos .txt
-            for file_info in zip_ref.filelist:
-                if file_info.filename.endswith('.txt'):
-                    zip_ref.extract(file_info, extract_dir)
+        Returns:
+            Informe (ver extract_zip), o None si el corpus no viene de un
+            ZIP o es anterior a los informes
+        """
+        path = self.ingest_report_path(corpus_id)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                report = json.load(f)
+        except FileNotFoundError:
+            return None
+        if report["status"] == 'processing' and time.time() - report["updated_at"] > INGEST_STALE:
+            return {**report, "status": "failed", "error": "Extracción interrumpida"}
+        return report
+    
+    def ingest_report_path(self, corpus_id: str) -> Path:
+        return self.corpus_dir / f"{corpus_id}.ingest.json"
+    
+    def _write_ingest_report(self, corpus_id: str, report: Dict):
+        path = self.ingest_report_path(corpus_id)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({**report, "updated_at": time.time()}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
     
     def get_corpus_path(self, corpus_id: str) -> Path:
         """Obtener ruta del corpus"""
@@ -76,9 +365,9 @@ class FileHandler:
         # Buscar archivo .txt directo
         txt_file = self.uploads_dir / 'corpus' / f"{corpus_id}.txt"
         if txt_file.exists():
-            # Crear directorio y copiar archivo
+            # Crear directorio y enlazar el archivo (sin copiar el contenido)
             corpus_dir.mkdir(parents=True, exist_ok=True)
-            shutil.copy(txt_file, corpus_dir / txt_file.name)
+            link_or_copy(txt_file, corpus_dir / txt_file.name)
             return corpus_dir
         
         raise FileNotFoundError(f"Corpus no encontrado: {corpus_id}")
@@ -91,17 +380,7 @@ class FileHandler:
             return self.corpus_dir / filename
         elif path_type == 'outputs':
             return self.outputs_dir / filename
+        elif path_type == 'cache':
+            return self.cache_dir / filename
         else:
             raise ValueError(f"Tipo de ruta no válido: {path_type}")
-    
-    def cleanup_old_files(self, days: int = 7):
-        """Limpiar archivos antiguos (opcional, para mantenimiento)"""
-        import time
-        current_time = time.time()
-        
-        for directory in [self.uploads_dir, self.corpus_dir, self.outputs_dir]:
-            for file_path in directory.rglob('*'):
-                if file_path.is_file():
-                    file_age = current_time - file_path.stat().st_mtime
-                    if file_age > (days * 86400):  # días a segundos
-                        file_path.unlink()
@@ -0,0 +1,118 @@
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator, Dict, Iterable, Iterator, List
+
+from fastapi.responses import StreamingResponse
+
+
+# Filas serializadas por bloque enviado al cliente
+ROWS_PER_CHUNK = 1000
+
+
+def csv_chunks(columns: List[str], rows: Iterable[Dict]) -> Iterator[bytes]:
+    """
+    CSV por bloques (UTF-8 con BOM, como lo abre Excel)
+
+    Args:
+        columns: Columnas en orden
+        rows: Filas como diccionarios (las claves ausentes quedan vacías)
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(columns)
+    yield buffer.getvalue().encode('utf-8-sig')
+    buffer.seek(0)
+    buffer.truncate()
+
+    for count, row in enumerate(rows, 1):
+        writer.writerow(['' if row.get(col) is None else row.get(col) for col in columns])
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def json_chunks(items: Iterable[Dict]) -> Iterator[bytes]:
+    """Array JSON por bloques (mismo formato que json.dump(items, indent=2))"""
+    parts = []
+    first = True
+    for item in items:
+        body = json.dumps(item, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+        parts.append(('[\n  ' if first else ',\n  ') + body)
+        first = False
+        if len(parts) == ROWS_PER_CHUNK:
+            yield ''.join(parts).encode('utf-8')
+            parts = []
+    parts.append('[]' if first else '\n]')
+    yield ''.join(parts).encode('utf-8')
+
+
+def ndjson_chunks(items: Iterable[Dict]) -> Iterator[bytes]:
+    """Un objeto JSON por línea (NDJSON)"""
+    lines = []
+    for item in items:
+        lines.append(json.dumps(item, ensure_ascii=False) + '\n')
+        if len(lines) == ROWS_PER_CHUNK:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Comprimir en gzip sobre la marcha"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def streaming_download(
+    chunks: Iterable[bytes],
+    filename: str,
+    media_type: str,
+    compress: bool = False
+) -> StreamingResponse:
+    """
+    Respuesta de descarga que se genera mientras se envía
+
+    Args:
+        chunks: Contenido por bloques
+        filename: Nombre del archivo descargado
+        media_type: Tipo MIME del contenido
+        compress: Enviar como .gz comprimido sobre la marcha
+
+    Returns:
+        StreamingResponse lista para devolver desde un endpoint
+    """
+    if compress:
+        chunks = gzip_chunks(chunks)
+        filename = f"{filename}.gz"
+        media_type = 'application/gzip'
+
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+def sse_message(event: str, data: Dict) -> bytes:
+    """Mensaje Server-Sent Events con datos JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+
+
+def sse_response(messages: AsyncIterator[bytes]) -> StreamingResponse:
+    """Respuesta text/event-stream sin caché ni buffer del proxy"""
+    return StreamingResponse(
+        messages,
+        media_type='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,59 @@
+import numpy as np
+from pathlib import Path
+from typing import Iterable, List
+
+
+class StringTable:
+    """
+    Tabla de cadenas en disco: un blob UTF-8 y un array de offsets
+
+    Ambos ficheros se abren con mmap, así que abrir la tabla es O(1)
+    y solo se decodifican las cadenas que se leen.
+    """
+
+    def __init__(self, base_path: Path):
+        base_path = Path(base_path)
+        self.offsets = np.load(f"{base_path}.offsets.npy", mmap_mode='r')
+        blob_path = Path(f"{base_path}.bin")
+        # np.memmap no admite ficheros vacíos
+        if blob_path.stat().st_size:
+            self.blob = np.memmap(blob_path, dtype=np.uint8, mode='r')
+        else:
+            self.blob = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx: int) -> str:
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return self.blob[start:end].tobytes().decode('utf-8')
+
+    def take(self, ids: Iterable[int]) -> List[str]:
+        """Decodificar varias cadenas por id (offsets leídos de forma vectorizada)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        starts = self.offsets[ids].tolist()
+        ends = self.offsets[ids + 1].tolist()
+        blob = memoryview(self.blob)
+        return [str(blob[start:end], 'utf-8') for start, end in zip(starts, ends)]
+
+    @staticmethod
+    def write(base_path: Path, strings: Iterable[str]) -> int:
+        """
+        Escribir una tabla de cadenas
+
+        Args:
+            base_path: Ruta base (sin extensión) de los ficheros
+            strings: Cadenas en orden de id
+
+        Returns:
+            Número de cadenas escritas
+        """
+        offsets = [0]
+        with open(f"{base_path}.bin", 'wb') as f:
+            for text in strings:
+                data = text.encode('utf-8')
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+
+        np.save(f"{base_path}.offsets.npy", np.asarray(offsets, dtype=np.int64))
+        return len(offsets) - 1
@@ -0,0 +1,65 @@
+from typing import Any, Dict
+
+
+# Nombre de propiedad de TermSuite -> campo en el JSON exportado ("props")
+JSON_FIELDS = {
+    'groupingKey': 'key',
+    'frequency': 'freq',
+    'documentFrequency': 'dFreq',
+    'specificity': 'spec',
+    'frequencyNorm': 'fNorm',
+    'generalFrequencyNorm': 'gfNorm',
+    'pattern': 'pattern',
+    'pilot': 'pilot',
+    'rank': 'rank'
+}
+
+
+def term_value(term: Dict, name: str, default: Any = None) -> Any:
+    """
+    Leer una propiedad de un término de TermSuite
+
+    Acepta tanto términos planos ({"groupingKey": ..., "frequency": ...})
+    como el formato JSON de TermSuite ({"props": {"key": ..., "freq": ...}}).
+
+    Args:
+        term: Término
+        name: Nombre de la propiedad (groupingKey, frequency, ...)
+        default: Valor si la propiedad no existe
+
+    Returns:
+        Valor de la propiedad
+    """
+    if name in term:
+        return term[name]
+    props = term.get('props')
+    if isinstance(props, dict):
+        return props.get(JSON_FIELDS.get(name, name), default)
+    return default
+
+
+def set_term_value(term: Dict, name: str, value: Any):
+    """Escribir una propiedad respetando el formato del término"""
+    props = term.get('props')
+    if isinstance(props, dict) and name not in term:
+        props[JSON_FIELDS.get(name, name)] = value
+    else:
+        term[name] = value
+
+
+def term_label(term: Dict) -> str:
+    """Texto legible del término (forma piloto, o la clave de agrupación)"""
+    if 'groupingKey' in term:
+        return term['groupingKey']
+    return term_value(term, 'pilot') or term_value(term, 'groupingKey', '')
+
+
+def term_words(term: Dict) -> str:
+    """Lemas de las palabras del término como texto"""
+    words = term.get('words', '')
+    if isinstance(words, list):
+        return ' '.join(
+            word.get('lemma', '') if isinstance(word, dict) else str(word)
+            for word in words
+        )
+    return words or ''
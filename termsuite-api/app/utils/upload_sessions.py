@@ -0,0 +1,382 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict
+
+
+# Tamaño de bloque por defecto y límites que puede pedir el cliente
+DEFAULT_CHUNK_MB = 8
+MIN_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Bytes por lectura al calcular el hash del archivo completo
+HASH_BLOCK = 4 * 1024 * 1024
+
+# Bytes iniciales que se devuelven para reconocer el formato
+HEAD_BYTES = 64 * 1024
+
+
+class ChunkWriter:
+    """
+    Escritura de un bloque en su posición del archivo de la sesión
+
+    Escribe con pwrite en su propio descriptor, así varios bloques de la
+    misma sesión se escriben a la vez sin pisarse. El bloque solo cuenta
+    como recibido al cerrarlo con el tamaño y el SHA-256 correctos.
+    """
+
+    def __init__(self, sessions: 'UploadSessions', upload_id: str, index: int, offset: int, length: int):
+        self.sessions = sessions
+        self.upload_id = upload_id
+        self.index = index
+        self.offset = offset
+        self.length = length
+        self.written = 0
+        self._digest = hashlib.sha256()
+        self._fd = os.open(sessions.part_path(upload_id), os.O_WRONLY)
+
+    def write(self, data: bytes):
+        if self.written + len(data) > self.length:
+            raise ValueError(f"El bloque {self.index} supera su tamaño ({self.length} bytes)")
+        view = memoryview(data)
+        while view:
+            # pwrite puede escribir menos de lo pedido
+            count = os.pwrite(self._fd, view, self.offset + self.written)
+            self.written += count
+            view = view[count:]
+        self._digest.update(data)
+
+    def close(self, sha256: str = None) -> Dict:
+        """
+        Cerrar y registrar el bloque
+
+        Args:
+            sha256: SHA-256 que declara el cliente (opcional)
+
+        Returns:
+            index, size y sha256 del bloque
+
+        Raises:
+            ValueError: Si el bloque está incompleto o su hash no coincide
+        """
+        os.close(self._fd)
+        if self.written != self.length:
+            raise ValueError(
+                f"Bloque {self.index} incompleto: {self.written} de {self.length} bytes"
+            )
+        digest = self._digest.hexdigest()
+        if sha256 and sha256.lower() != digest:
+            raise ValueError(f"El SHA-256 del bloque {self.index} no coincide")
+        self.sessions._record_chunk(self.upload_id, self.index, self.length, digest)
+        return {"index": self.index, "size": self.length, "sha256": digest}
+
+    def abort(self):
+        os.close(self._fd)
+
+
+class UploadSessions:
+    """
+    Subidas reanudables por bloques
+
+    Una sesión reserva al crearse un archivo del tamaño final
+    (`{root}/{id}.part`, con fallocate si el sistema lo permite) y cada
+    bloque se escribe directamente en su posición (índice × chunk_size),
+    en cualquier orden y en paralelo. Los bloques recibidos, con su
+    SHA-256, se guardan en `{root}/sessions.db`, así una subida cortada se
+    reanuda enviando solo los que faltan, aunque la API se haya reiniciado.
+    Al finalizar no hay que juntar nada: el archivo ya está completo y, al
+    estar en el mismo sistema de ficheros que el almacén de blobs, se
+    adopta con un rename.
+
+    Las sesiones sin actividad durante UPLOAD_SESSION_TTL_HOURS se borran.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS upload_sessions (
+            upload_id TEXT PRIMARY KEY,
+            file_type TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            chunk_size INTEGER NOT NULL,
+            sha256 TEXT,
+            status TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS upload_chunks (
+            upload_id TEXT NOT NULL,
+            idx INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            PRIMARY KEY (upload_id, idx)
+        )
+        """
+    )
+
+    def __init__(self, root: Path, ttl: float = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        if ttl is None:
+            ttl = float(os.getenv('UPLOAD_SESSION_TTL_HOURS', '24')) * 3600
+        self.ttl = ttl
+        self.default_chunk_size = int(
+            float(os.getenv('UPLOAD_CHUNK_MB', str(DEFAULT_CHUNK_MB))) * 1024 * 1024
+        )
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def part_path(self, upload_id: str) -> Path:
+        return self.root / f"{upload_id}.part"
+
+    def create(
+        self,
+        file_type: str,
+        filename: str,
+        size: int,
+        chunk_size: int = None,
+        sha256: str = None
+    ) -> Dict:
+        """
+        Abrir una sesión de subida
+
+        Args:
+            file_type: Tipo (tmx, corpus)
+            filename: Nombre original (da la extensión)
+            size: Tamaño total en bytes
+            chunk_size: Bytes por bloque (todos menos el último)
+            sha256: SHA-256 del archivo completo, si el cliente lo conoce
+                (se comprueba al finalizar)
+
+        Returns:
+            Estado de la sesión (ver status)
+        """
+        self.expire()
+        chunk_size = chunk_size or self.default_chunk_size
+        if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(
+                f"chunk_size debe estar entre {MIN_CHUNK_SIZE} y {MAX_CHUNK_SIZE} bytes"
+            )
+        if size <= 0:
+            raise ValueError("El archivo está vacío")
+        free = shutil.disk_usage(self.root).free
+        if size > free:
+            raise ValueError(
+                f"No hay espacio en disco para la subida "
+                f"({size // (1024 * 1024)} MB, libres {free // (1024 * 1024)} MB)"
+            )
+
+        upload_id = str(uuid.uuid4())
+        path = self.part_path(upload_id)
+        with open(path, 'wb') as f:
+            try:
+                # Reservar el espacio ya: sin ENOSPC a mitad de subida
+                os.posix_fallocate(f.fileno(), 0, size)
+            except (AttributeError, OSError):
+                f.truncate(size)
+
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO upload_sessions (upload_id, file_type, filename, size, chunk_size, "
+                "sha256, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, 'open', ?, ?)",
+                (upload_id, file_type, filename, size, chunk_size,
+                 sha256.lower() if sha256 else None, now, now)
+            )
+        return self.status(upload_id)
+
+    def status(self, upload_id: str) -> Dict:
+        """
+        Estado de una sesión
+
+        Returns:
+            upload_id, file_type, filename, size, chunk_size, chunks (total),
+            received (índices recibidos), received_bytes, status y expires_at
+
+        Raises:
+            FileNotFoundError: Si la sesión no existe o caducó
+        """
+        session = self._session(upload_id)
+        rows = self._conn().execute(
+            "SELECT idx, size FROM upload_chunks WHERE upload_id = ? ORDER BY idx", (upload_id,)
+        ).fetchall()
+        return {
+            "upload_id": upload_id,
+            "file_type": session["file_type"],
+            "filename": session["filename"],
+            "size": session["size"],
+            "chunk_size": session["chunk_size"],
+            "chunks": _chunk_count(session["size"], session["chunk_size"]),
+            "received": [row[0] for row in rows],
+            "received_bytes": sum(row[1] for row in rows),
+            "status": session["status"],
+            "expires_at": session["updated_at"] + self.ttl
+        }
+
+    def open_chunk(self, upload_id: str, index: int) -> ChunkWriter:
+        """
+        Preparar la escritura de un bloque (se puede repetir uno ya recibido)
+
+        Raises:
+            FileNotFoundError: Si la sesión no existe o caducó
+            ValueError: Si el índice no existe o la sesión ya se finaliza
+        """
+        session = self._session(upload_id)
+        if session["status"] != 'open':
+            raise ValueError("La subida ya se está finalizando")
+        chunks = _chunk_count(session["size"], session["chunk_size"])
+        if not 0 <= index < chunks:
+            raise ValueError(f"Bloque fuera de rango: {index} (la subida tiene {chunks})")
+        offset = index * session["chunk_size"]
+        length = min(session["chunk_size"], session["size"] - offset)
+        return ChunkWriter(self, upload_id, index, offset, length)
+
+    def assemble(self, upload_id: str) -> Dict:
+        """
+        Cerrar una sesión completa y calcular el hash del archivo
+
+        El archivo no se copia: se lee una vez para el SHA-256 y queda en
+        part_path para adoptarlo en el almacén de blobs.
+
+        Returns:
+            path, sha256, size, head (primeros bytes), file_type y filename
+
+        Raises:
+            FileNotFoundError: Si la sesión no existe o caducó
+            ValueError: Si faltan bloques o el hash no coincide con el declarado
+        """
+        session = self._session(upload_id)
+        chunks = _chunk_count(session["size"], session["chunk_size"])
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            received = conn.execute(
+                "SELECT COUNT(*) FROM upload_chunks WHERE upload_id = ?", (upload_id,)
+            ).fetchone()[0]
+            if received < chunks:
+                raise ValueError(f"Faltan {chunks - received} de {chunks} bloques")
+            updated = conn.execute(
+                "UPDATE upload_sessions SET status = 'finalizing', updated_at = ? "
+                "WHERE upload_id = ? AND status = 'open'",
+                (time.time(), upload_id)
+            ).rowcount
+            if not updated:
+                raise ValueError("La subida ya se está finalizando")
+
+        path = self.part_path(upload_id)
+        digest = hashlib.sha256()
+        head = b''
+        try:
+            with open(path, 'rb') as f:
+                while True:
+                    block = f.read(HASH_BLOCK)
+                    if not block:
+                        break
+                    if not head:
+                        head = block[:HEAD_BYTES]
+                    digest.update(block)
+        except BaseException:
+            # Se puede volver a intentar
+            with conn:
+                conn.execute(
+                    "UPDATE upload_sessions SET status = 'open' WHERE upload_id = ?", (upload_id,)
+                )
+            raise
+        sha256 = digest.hexdigest()
+
+        if session["sha256"] and session["sha256"] != sha256:
+            # Algún bloque se reescribió con otro contenido: empezar de nuevo
+            self.remove(upload_id)
+            raise ValueError("El SHA-256 del archivo no coincide con el declarado")
+        return {
+            "path": path,
+            "sha256": sha256,
+            "size": session["size"],
+            "head": head,
+            "file_type": session["file_type"],
+            "filename": session["filename"]
+        }
+
+    def remove(self, upload_id: str):
+        """Borrar una sesión y su archivo (si no se adoptó ya)"""
+        with self._conn() as conn:
+            conn.execute("DELETE FROM upload_chunks WHERE upload_id = ?", (upload_id,))
+            conn.execute("DELETE FROM upload_sessions WHERE upload_id = ?", (upload_id,))
+        self.part_path(upload_id).unlink(missing_ok=True)
+
+    def expire(self) -> int:
+        """
+        Borrar las sesiones sin actividad desde hace más de `ttl` segundos
+
+        Returns:
+            Sesiones borradas
+        """
+        expired = [row[0] for row in self._conn().execute(
+            "SELECT upload_id FROM upload_sessions WHERE updated_at < ?",
+            (time.time() - self.ttl,)
+        )]
+        for upload_id in expired:
+            self.remove(upload_id)
+        return len(expired)
+
+    def stats(self) -> Dict:
+        """Sesiones abiertas, bytes reservados y bytes recibidos"""
+        conn = self._conn()
+        sessions, reserved = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM upload_sessions"
+        ).fetchone()
+        received = conn.execute("SELECT COALESCE(SUM(size), 0) FROM upload_chunks").fetchone()[0]
+        return {"sessions": sessions, "reserved_bytes": reserved, "received_bytes": received}
+
+    def _session(self, upload_id: str) -> Dict:
+        row = self._conn().execute(
+            "SELECT file_type, filename, size, chunk_size, sha256, status, updated_at "
+            "FROM upload_sessions WHERE upload_id = ?",
+            (upload_id,)
+        ).fetchone()
+        if row is None or row[6] < time.time() - self.ttl:
+            raise FileNotFoundError(f"Subida no encontrada: {upload_id}")
+        keys = ("file_type", "filename", "size", "chunk_size", "sha256", "status", "updated_at")
+        return dict(zip(keys, row))
+
+    def _record_chunk(self, upload_id: str, index: int, size: int, sha256: str):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Si la sesión se finalizó o caducó mientras tanto, no cuenta
+            updated = conn.execute(
+                "UPDATE upload_sessions SET updated_at = ? WHERE upload_id = ? AND status = 'open'",
+                (time.time(), upload_id)
+            ).rowcount
+            if not updated:
+                raise ValueError("La subida ya no admite bloques")
+            conn.execute(
+                "INSERT OR REPLACE INTO upload_chunks (upload_id, idx, size, sha256) VALUES (?, ?, ?, ?)",
+                (upload_id, index, size, sha256)
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        """Conexión propia de cada hilo"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.root / 'sessions.db', timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+
+def _chunk_count(size: int, chunk_size: int) -> int:
+    return -(-size // chunk_size)
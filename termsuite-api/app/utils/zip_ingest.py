@@ -0,0 +1,326 @@
+import codecs
+import hashlib
+import os
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# Bytes por bloque al descomprimir un miembro
+MEMBER_CHUNK = 1024 * 1024
+
+# Bytes iniciales que se examinan para elegir la codificación
+ENCODING_SNIFF = 4096
+
+# Por debajo de este tamaño no se aplica el límite de compresión (un
+# texto pequeño y repetitivo se comprime mucho sin ser una bomba)
+RATIO_MIN_BYTES = 1024 * 1024
+
+# Carpetas y archivos que los compresores añaden y no son documentos
+IGNORED_PARTS = {'__MACOSX', 'Thumbs.db', 'desktop.ini'}
+
+
+class ZipLimitError(ValueError):
+    """El ZIP supera algún límite de ingesta"""
+
+
+def flat_name(member: str) -> Optional[str]:
+    """
+    Nombre plano de un miembro del ZIP ('a/b/c.txt' -> 'a__b__c.txt')
+
+    Returns:
+        Nombre, o None si el miembro no es un documento (carpetas de
+        sistema, archivos ocultos, sin extensión .txt)
+    """
+    parts = [
+        part for part in PurePosixPath(member.replace('\\', '/')).parts
+        if part not in ('', '.', '..', '/')
+    ]
+    if not parts or not parts[-1].lower().endswith('.txt'):
+        return None
+    if any(part in IGNORED_PARTS or part.startswith('.') for part in parts):
+        return None
+    return '__'.join(parts)
+
+
+def candidate_encodings(head: bytes) -> List[str]:
+    """Codificaciones a probar, en orden, según los primeros bytes"""
+    if head.startswith(codecs.BOM_UTF8):
+        return ['utf-8-sig']
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return ['utf-16']
+    # latin-1 decodifica cualquier byte: es el último recurso
+    return ['utf-8', 'cp1252', 'latin-1']
+
+
+class ZipIngestor:
+    """
+    Ingesta de corpus en ZIP
+
+    Antes de descomprimir nada se revisa el directorio central del ZIP
+    (número de miembros, tamaño descomprimido total, ratio de compresión
+    de cada miembro y espacio libre en disco), así se rechaza una bomba
+    sin tocar el disco. Los documentos .txt se descomprimen en paralelo
+    (cada hilo con su propio ZipFile; zlib suelta el GIL), con nombres
+    planos (`carpeta__doc.txt`) y convertidos a UTF-8. Los tamaños se
+    vuelven a comprobar al escribir, porque las cabeceras pueden mentir:
+    ningún miembro escribe más de lo que declara. Todo se escribe en un
+    directorio temporal que se renombra al terminar, así nadie ve un
+    corpus a medias.
+
+    Límites por entorno: ZIP_MAX_MEMBERS, ZIP_MAX_UNCOMPRESSED_MB,
+    ZIP_MAX_RATIO (0 = sin límite) y ZIP_INGEST_WORKERS hilos.
+    """
+
+    def __init__(
+        self,
+        max_members: int = None,
+        max_bytes: int = None,
+        max_ratio: float = None,
+        workers: int = None
+    ):
+        if max_members is None:
+            max_members = int(os.getenv('ZIP_MAX_MEMBERS', '20000'))
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('ZIP_MAX_UNCOMPRESSED_MB', '4096')) * 1024 * 1024)
+        if max_ratio is None:
+            max_ratio = float(os.getenv('ZIP_MAX_RATIO', '100'))
+        self.max_members = max_members
+        self.max_bytes = max_bytes
+        self.max_ratio = max_ratio
+        self.workers = workers or int(os.getenv('ZIP_INGEST_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+    def check(self, zip_path: Path, target_dir: Path = None) -> Tuple[List[Tuple[zipfile.ZipInfo, str]], List[Dict]]:
+        """
+        Revisar un ZIP por su directorio central, sin descomprimir
+
+        Args:
+            zip_path: Archivo ZIP
+            target_dir: Directorio de destino (para comprobar el espacio libre)
+
+        Returns:
+            (miembros a extraer con su nombre plano, miembros descartados
+            con el motivo)
+
+        Raises:
+            ZipLimitError: Si el ZIP no es válido o supera algún límite
+        """
+        try:
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                infos = [info for info in zip_ref.infolist() if not info.is_dir()]
+        except (zipfile.BadZipFile, OSError) as e:
+            raise ZipLimitError(f"ZIP no válido: {e}")
+
+        if self.max_members and len(infos) > self.max_members:
+            raise ZipLimitError(
+                f"El ZIP tiene {len(infos)} archivos (máximo {self.max_members})"
+            )
+
+        members = []
+        skipped = []
+        names = set()
+        total = 0
+        for info in infos:
+            name = flat_name(info.filename)
+            if name is None:
+                skipped.append({"source": info.filename, "reason": "not_txt"})
+                continue
+            if info.flag_bits & 0x1:
+                skipped.append({"source": info.filename, "reason": "encrypted"})
+                continue
+            if (
+                self.max_ratio and info.file_size > RATIO_MIN_BYTES
+                and info.file_size > self.max_ratio * max(info.compress_size, 1)
+            ):
+                raise ZipLimitError(
+                    f"Compresión sospechosa en {info.filename} "
+                    f"(ratio {info.file_size // max(info.compress_size, 1)}, máximo {self.max_ratio:g})"
+                )
+            # Dos rutas pueden aplanarse igual ('a/b.txt' y 'a__b.txt')
+            unique = name
+            suffix = 1
+            while unique.lower() in names:
+                unique = f"{name[:-4]}-{suffix}.txt"
+                suffix += 1
+            names.add(unique.lower())
+            members.append((info, unique))
+            total += info.file_size
+
+        if not members:
+            raise ZipLimitError("El ZIP no contiene documentos .txt")
+        if self.max_bytes and total > self.max_bytes:
+            raise ZipLimitError(
+                f"El ZIP ocupa {total // (1024 * 1024)} MB descomprimido "
+                f"(máximo {self.max_bytes // (1024 * 1024)} MB)"
+            )
+        if target_dir is not None:
+            free = shutil.disk_usage(_existing_parent(Path(target_dir))).free
+            if total > free:
+                raise ZipLimitError(
+                    f"No hay espacio en disco para descomprimir el ZIP "
+                    f"({total // (1024 * 1024)} MB, libres {free // (1024 * 1024)} MB)"
+                )
+        return members, skipped
+
+    def ingest(
+        self,
+        zip_path: Path,
+        target_dir: Path,
+        on_progress: Callable[[int, int], None] = None
+    ) -> Dict:
+        """
+        Extraer los documentos de un ZIP en un directorio de corpus
+
+        Args:
+            zip_path: Archivo ZIP
+            target_dir: Directorio del corpus (se crea al terminar)
+            on_progress: Callback opcional (documentos hechos, total)
+
+        Returns:
+            Estadísticas: documents, files (name, source, size, bytes,
+            encoding, sha256 de cada documento), skipped, bytes_in,
+            bytes_out, encodings y seconds
+
+        Raises:
+            ZipLimitError: Si el ZIP no es válido o supera algún límite
+        """
+        started = time.time()
+        target_dir = Path(target_dir)
+        members, skipped = self.check(zip_path, target_dir.parent)
+
+        work_dir = target_dir.with_name(f"{target_dir.name}.part")
+        shutil.rmtree(work_dir, ignore_errors=True)
+        work_dir.mkdir(parents=True)
+
+        abort = threading.Event()
+        local = threading.local()
+        opened: List[zipfile.ZipFile] = []
+        opened_lock = threading.Lock()
+        done = [0]
+        errors: List[BaseException] = []
+        lock = threading.Lock()
+
+        def extract(member: Tuple[zipfile.ZipInfo, str]) -> Dict:
+            if abort.is_set():
+                return {}
+            zip_ref = getattr(local, 'zip_ref', None)
+            if zip_ref is None:
+                zip_ref = local.zip_ref = zipfile.ZipFile(zip_path, 'r')
+                with opened_lock:
+                    opened.append(zip_ref)
+            info, name = member
+            try:
+                result = _transcode(zip_ref, info, work_dir / name, abort)
+            except Exception as e:
+                # Solo cuenta el primer error; los demás hilos se cancelan
+                with lock:
+                    if not abort.is_set():
+                        errors.append(e)
+                    abort.set()
+                return {}
+            with lock:
+                done[0] += 1
+                count = done[0]
+            if on_progress:
+                on_progress(count, len(members))
+            return {"name": name, "source": info.filename, **result}
+
+        try:
+            with ThreadPoolExecutor(
+                max_workers=max(1, min(self.workers, len(members))),
+                thread_name_prefix='zip-ingest'
+            ) as pool:
+                # De mayor a menor: los grandes no quedan para el final
+                ordered = sorted(members, key=lambda m: m[0].file_size, reverse=True)
+                files = [f for f in pool.map(extract, ordered) if f]
+            if errors:
+                raise errors[0]
+            shutil.rmtree(target_dir, ignore_errors=True)
+            os.replace(work_dir, target_dir)
+        except BaseException:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+        finally:
+            for zip_ref in opened:
+                zip_ref.close()
+
+        files.sort(key=lambda f: f["name"])
+        encodings: Dict[str, int] = {}
+        for f in files:
+            encodings[f["encoding"]] = encodings.get(f["encoding"], 0) + 1
+        return {
+            "documents": len(files),
+            "members": len(members) + len(skipped),
+            "skipped": skipped,
+            "bytes_in": sum(f["size"] for f in files),
+            "bytes_out": sum(f["bytes"] for f in files),
+            "encodings": encodings,
+            "seconds": round(time.time() - started, 3),
+            "files": files
+        }
+
+
+def _transcode(
+    zip_ref: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+    target: Path,
+    abort: threading.Event
+) -> Dict:
+    """
+    Descomprimir un miembro a UTF-8
+
+    Prueba las codificaciones de candidate_encodings: si una falla a mitad
+    del archivo, se vuelve a empezar con la siguiente. Ningún miembro
+    puede escribir más de lo que declara el directorio central (ya
+    revisado contra ZIP_MAX_UNCOMPRESSED_MB).
+
+    Returns:
+        size (bytes descomprimidos), bytes (UTF-8 escritos), encoding y sha256
+    """
+    with zip_ref.open(info) as src:
+        encodings = candidate_encodings(src.read(ENCODING_SNIFF))
+
+    for encoding in encodings:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        digest = hashlib.sha256()
+        size = 0
+        written = 0
+        try:
+            with zip_ref.open(info) as src, open(target, 'wb') as out:
+                while True:
+                    if abort.is_set():
+                        raise ZipLimitError("Ingesta cancelada")
+                    chunk = src.read(MEMBER_CHUNK)
+                    final = not chunk
+                    if chunk:
+                        size += len(chunk)
+                        if size > info.file_size:
+                            raise ZipLimitError(
+                                f"{info.filename} ocupa más de lo que declara el ZIP"
+                            )
+                    data = decoder.decode(chunk, final=final).encode('utf-8')
+                    out.write(data)
+                    digest.update(data)
+                    written += len(data)
+                    if final:
+                        break
+        except UnicodeDecodeError:
+            continue
+        return {
+            "size": size,
+            "bytes": written,
+            "encoding": encoding,
+            "sha256": digest.hexdigest()
+        }
+    # latin-1 siempre decodifica; solo se llega aquí con utf-16 inválido
+    raise ZipLimitError(f"No se pudo decodificar {info.filename} ({encodings[-1]})")
+
+
+def _existing_parent(path: Path) -> Path:
+    while not path.exists() and path != path.parent:
+        path = path.parent
+    return path
@@ -0,0 +1,194 @@
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+
+from typing import Callable, Dict, Optional
+
+from app.models import ExtractionRequest, JobStatus
+from app.services.job_queue import JobQueue
+from app.services.job_store import JobStore, MemoryJobStore, job_db_path
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionWorker:
+    """
+    Worker de extracción: procesa los trabajos que la API encola
+
+    Cada hilo reclama un trabajo de la cola, lo ejecuta con el mismo
+    pipeline que la API (TermSuite -> filtro TMX -> almacén -> Excel) y
+    renueva el alquiler mientras tanto. Se pueden arrancar tantos procesos
+    worker como se quiera sobre el mismo DATA_DIR.
+
+    Si el alquiler se pierde (otro worker pudo reclamar el trabajo) se
+    cancela la ejecución: se matan sus JVM y no se escribe el estado final.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        jobs: JobStore,
+        process: Callable[[str, ExtractionRequest, threading.Event], Optional[bool]],
+        concurrency: int = 1,
+        poll_interval: float = 1.0
+    ):
+        self.queue = queue
+        self.jobs = jobs
+        self.process = process
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self._stop = threading.Event()
+        self._abort = threading.Event()
+        self._lock = threading.Lock()
+        self._running: Dict[str, threading.Event] = {}
+
+    def run(self):
+        """Procesar trabajos hasta que se llame a stop()"""
+        threads = [
+            threading.Thread(
+                target=self._loop,
+                args=(f"{self.worker_id}-{i}",),
+                name=f"extraction-worker-{i}"
+            )
+            for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        logger.info("Worker %s esperando trabajos (%d hilos)", self.worker_id, self.concurrency)
+        for thread in threads:
+            thread.join()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    def stop(self):
+        """Dejar de reclamar trabajos; los que están en curso terminan"""
+        self._stop.set()
+
+    def abort(self):
+        """Parar también los trabajos en curso y devolverlos a la cola"""
+        self._stop.set()
+        self._abort.set()
+        with self._lock:
+            for cancel in self._running.values():
+                cancel.set()
+
+    def _loop(self, worker_id: str):
+        while not self._stop.is_set():
+            claimed = self.queue.claim(worker_id)
+            if claimed is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            job_id, payload, attempt = claimed
+            self._process(worker_id, job_id, payload, attempt)
+
+    def _process(self, worker_id: str, job_id: str, payload: dict, attempt: int):
+        if attempt > self.queue.max_attempts:
+            # Los workers anteriores murieron sin terminarlo
+            self.jobs.update(
+                job_id,
+                status=JobStatus.FAILED,
+                error=f"Abandonado tras {attempt - 1} intentos sin terminar",
+                message="Error: el worker se detuvo durante la extracción"
+            )
+            self.queue.complete(job_id, worker_id)
+            return
+
+        if attempt > 1:
+            logger.warning("Reintentando %s (intento %d)", job_id, attempt)
+        logger.info("Procesando %s en %s", job_id, worker_id)
+
+        done = threading.Event()
+        cancel = threading.Event()
+        with self._lock:
+            self._running[job_id] = cancel
+            if self._abort.is_set():
+                cancel.set()
+
+        def heartbeat():
+            while not done.wait(self.queue.visibility_timeout / 3):
+                if not self.queue.heartbeat(job_id, worker_id):
+                    logger.warning("Alquiler de %s perdido, se cancela", job_id)
+                    cancel.set()
+                    return
+
+        beat = threading.Thread(target=heartbeat, name=f"heartbeat-{job_id}", daemon=True)
+        beat.start()
+        finished = True
+        try:
+            finished = self.process(job_id, ExtractionRequest(**payload), cancel) is not False
+        finally:
+            done.set()
+            beat.join()
+            with self._lock:
+                self._running.pop(job_id, None)
+            if not finished and self._abort.is_set():
+                # Sin terminar por la parada: que lo reclame otro worker ya
+                logger.info("Devolviendo %s a la cola", job_id)
+                self.jobs.update(job_id, status=JobStatus.PENDING, progress=0, message="Trabajo en cola")
+                self.queue.release(job_id, worker_id)
+            else:
+                self.queue.complete(job_id, worker_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Worker de extracción para JOB_RUNNER=queue"
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=int(os.getenv('WORKER_CONCURRENCY', '1')),
+        help="Extracciones simultáneas en este proceso (WORKER_CONCURRENCY)"
+    )
+    parser.add_argument(
+        '--poll-interval',
+        type=float,
+        default=float(os.getenv('WORKER_POLL_INTERVAL', '1.0')),
+        help="Segundos entre consultas a la cola vacía (WORKER_POLL_INTERVAL)"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    # Aquí y no al importar el módulo: los procesos spawn del pool de
+    # duplicados lo reimportan como __mp_main__ y no deben crear los servicios
+    from app.pipeline import deduplicator, file_handler, jobs, process_extraction, termsuite_service
+
+    if isinstance(jobs, MemoryJobStore):
+        raise SystemExit("El worker necesita un estado compartido con la API (JOB_STORE=sqlite)")
+
+    worker = ExtractionWorker(
+        JobQueue(job_db_path(file_handler.data_dir)),
+        jobs,
+        process_extraction,
+        concurrency=args.concurrency,
+        poll_interval=args.poll_interval
+    )
+    # Primera señal: terminar lo que está en curso; segunda: cancelarlo y
+    # devolverlo a la cola
+    def on_signal(*_):
+        if worker.stopping:
+            worker.abort()
+        else:
+            worker.stop()
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    try:
+        worker.run()
+    finally:
+        deduplicator.shutdown()
+        termsuite_service.shutdown()
+        jobs.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,11 @@
 Cliente de ejemplo para TermSuite API
 Muestra cómo usar la API desde Python
 """
+import hashlib
+import json
 import requests
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 
@@ -33,30 +36,111 @@ class TermSuiteClient:
         response.raise_for_status()
         return response.json()['file_id']
     
-    def upload_corpus(self, corpus_path: str) -> str:
-        """Subir corpus (txt o zip)"""
+    def upload_corpus(self, corpus_path: str, timeout: int = 600) -> str:
+        """Subir corpus (txt o zip); con un ZIP espera a que se extraiga"""
         with open(corpus_path, 'rb') as f:
             response = requests.post(
                 f"{self.base_url}/api/upload-corpus",
                 files={'file': f}
             )
         response.raise_for_status()
-        return response.json()['file_id']
+        data = response.json()
+        if data.get('ingest_status') == 'processing':
+            self.wait_for_ingest(data['file_id'], timeout)
+        return data['file_id']
+    
+    def wait_for_ingest(self, corpus_id: str, timeout: int = 600):
+        """Esperar a que se extraigan los documentos de un corpus ZIP"""
+        start_time = time.time()
+        while time.time() - start_time < timeout:
+            response = requests.get(
+                f"{self.base_url}/api/corpus/{corpus_id}/ingest",
+                params={'files': 'false'}
+            )
+            response.raise_for_status()
+            report = response.json()
+            if report['status'] == 'completed':
+                return
+            if report['status'] == 'failed':
+                raise Exception(f"Extracción del ZIP fallida: {report['error']}")
+            time.sleep(1)
+        raise TimeoutError(f"El ZIP no se extrajo en {timeout} segundos")
+    
+    def upload_resumable(
+        self,
+        path: str,
+        file_type: str,
+        upload_id: str = None,
+        workers: int = 4,
+        language: str = None
+    ) -> str:
+        """
+        Subir un archivo grande por bloques en paralelo
+        
+        Si se corta, volver a llamar con el mismo upload_id envía solo los
+        bloques que faltan.
+        
+        Args:
+            path: Ruta al archivo (.tmx, .txt o .zip)
+            file_type: 'tmx' o 'corpus'
+            upload_id: Subida a reanudar (None = empezar una nueva)
+            workers: Bloques enviados a la vez
+            language: Solo TMX: idioma del que informar
+        """
+        size = Path(path).stat().st_size
+        if upload_id is None:
+            response = requests.post(
+                f"{self.base_url}/api/uploads",
+                json={'file_type': file_type, 'filename': Path(path).name, 'size': size}
+            )
+            response.raise_for_status()
+            upload_id = response.json()['upload_id']
+            print(f"Subida {upload_id}")
+        
+        response = requests.get(f"{self.base_url}/api/uploads/{upload_id}")
+        response.raise_for_status()
+        session = response.json()
+        chunk_size = session['chunk_size']
+        missing = [i for i in range(session['chunks']) if i not in set(session['received'])]
+        
+        def send(index: int):
+            with open(path, 'rb') as f:
+                f.seek(index * chunk_size)
+                data = f.read(chunk_size)
+            response = requests.put(
+                f"{self.base_url}/api/uploads/{upload_id}/chunks/{index}",
+                data=data,
+                headers={'X-Chunk-SHA256': hashlib.sha256(data).hexdigest()}
+            )
+            response.raise_for_status()
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(send, missing))
+        
+        params = {'language': language} if language else {}
+        response = requests.post(f"{self.base_url}/api/uploads/{upload_id}/complete", params=params)
+        response.raise_for_status()
+        data = response.json()
+        if data.get('ingest_status') == 'processing':
+            self.wait_for_ingest(data['file_id'])
+        return data['file_id']
     
     def extract_terms(
         self,
         corpus_id: str,
         language: str = 'en',
         min_frequency: int = 2,
-        tmx_id: str = None
+        tmx_id: str = None,
+        dedup: bool = None
     ) -> str:
-        """Iniciar extracción de términos"""
+        """Iniciar extracción de términos (dedup: eliminar documentos duplicados antes)"""
         payload = {
             'corpus_id': corpus_id,
             'language': language,
             'min_frequency': min_frequency,
             'use_tmx': tmx_id is not None,
-            'tmx_id': tmx_id
+            'tmx_id': tmx_id,
+            'dedup': dedup
         }
         response = requests.post(
             f"{self.base_url}/api/extract",
@@ -71,10 +155,31 @@ class TermSuiteClient:
         response.raise_for_status()
         return response.json()
     
+    def watch_status(self, job_id: str, timeout: int = 600):
+        """Recibir los cambios de estado según ocurren (Server-Sent Events)"""
+        with requests.get(
+            f"{self.base_url}/api/jobs/{job_id}/events", stream=True, timeout=timeout
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.startswith('data:'):
+                    yield json.loads(line[5:])
+    
     def wait_for_completion(self, job_id: str, timeout: int = 600) -> bool:
-        """Esperar a que termine el trabajo"""
+        """Esperar a que termine el trabajo (eventos, o consultas si no hay)"""
         start_time = time.time()
         
+        try:
+            for status in self.watch_status(job_id, timeout):
+                print(f"Estado: {status['status']} ({status['progress']}%)")
+                
+                if status['status'] == 'completed':
+                    return True
+                elif status['status'] == 'failed':
+                    raise Exception(f"Trabajo falló: {status.get('error')}")
+        except requests.RequestException:
+            pass
+        
         while time.time() - start_time < timeout:
             status = self.get_status(job_id)
             
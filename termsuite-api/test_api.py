@@ -2,6 +2,7 @@
 """
 Script de prueba para TermSuite API
 """
+import json
 import requests
 import time
 import sys
@@ -58,13 +59,27 @@ def test_upload_corpus(corpus_file: str):
             files={'file': f}
         )
     
-    if response.status_code == 200:
-        data = response.json()
-        print(f"✅ Corpus subido: {data['file_id']}")
-        return data['file_id']
-    else:
+    if response.status_code != 200:
         print(f"❌ Error: {response.text}")
         return None
+    
+    data = response.json()
+    print(f"✅ Corpus subido: {data['file_id']}")
+    if data.get('ingest_status') != 'processing':
+        return data['file_id']
+    
+    # ZIP: esperar a que se extraigan los documentos
+    while True:
+        time.sleep(1)
+        report = requests.get(f"{BASE_URL}/api/corpus/{data['file_id']}/ingest").json()
+        if report['status'] == 'processing':
+            continue
+        if report['status'] == 'failed':
+            print(f"❌ Extracción del ZIP fallida: {report['error']}")
+            return None
+        print(f"   {report['documents']} documentos, {report['bytes_out']} bytes UTF-8, "
+              f"codificaciones: {report['encodings']}, {len(report['skipped'])} descartados")
+        return data['file_id']
 
 
 def test_extract(corpus_id: str, tmx_id: str = None):
@@ -94,27 +109,55 @@ def test_extract(corpus_id: str, tmx_id: str = None):
         return None
 
 
+def print_status(data: dict):
+    """Mostrar un estado; True/False si el trabajo terminó, None si sigue"""
+    status = data['status']
+    print(f"   Estado: {status} ({data['progress']}%) - {data['message']}")
+    
+    if status == 'completed':
+        print(f"✅ Trabajo completado")
+        return True
+    elif status == 'failed':
+        print(f"❌ Trabajo falló: {data.get('error')}")
+        return False
+    return None
+
+
+def test_events(job_id: str):
+    """Probar el flujo de eventos del trabajo (Server-Sent Events)"""
+    print(f"\n📡 Escuchando eventos del trabajo...")
+    
+    try:
+        with requests.get(f"{BASE_URL}/api/jobs/{job_id}/events", stream=True, timeout=600) as response:
+            if response.status_code != 200:
+                print(f"❌ Error: {response.text}")
+                return None
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.startswith('data:'):
+                    result = print_status(json.loads(line[5:]))
+                    if result is not None:
+                        return result
+    except requests.RequestException as e:
+        print(f"⚠️  Flujo de eventos interrumpido: {e}")
+    return None
+
+
 def test_status(job_id: str, wait: bool = True):
-    """Probar consulta de estado"""
+    """Probar consulta de estado (eventos y, si fallan, consultas periódicas)"""
+    if wait:
+        result = test_events(job_id)
+        if result is not None:
+            return result
+    
     print(f"\n🔄 Consultando estado del trabajo...")
     
     while True:
         response = requests.get(f"{BASE_URL}/api/status/{job_id}")
         
         if response.status_code == 200:
-            data = response.json()
-            status = data['status']
-            progress = data['progress']
-            message = data['message']
-            
-            print(f"   Estado: {status} ({progress}%) - {message}")
-            
-            if status == 'completed':
-                print(f"✅ Trabajo completado")
-                return True
-            elif status == 'failed':
-                print(f"❌ Trabajo falló: {data.get('error')}")
-                return False
+            result = print_status(response.json())
+            if result is not None:
+                return result
             elif not wait:
                 return None
             